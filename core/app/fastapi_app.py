@@ -1,24 +1,129 @@
+import asyncio
 import os
-import tempfile
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from src.inference.batcher import MicroBatcher
+from src.inference.cache import cache_from_env
+from src.inference.pool import QueueFullError, pool_from_env
 from src.inference.predictor import Predictor
-from src.utils.github_push import PushResult, push_pending_clip
+from src.inference.stream import ENCODINGS, StreamSession, decode_chunk
+from src.preprocess.decode import AudioDecodeError
+from src.utils.contribution_queue import ContributionQueue, ContributionWorker, queue_contribution
+from src.utils.fingerprint_index import FingerprintIndex
+from src.utils import metrics
+from src.utils.github_push import PushResult
+from src.utils.upload_limits import BodySizeLimitMiddleware
 
-app = FastAPI(title="CheetahSense API", version="0.1.0")
+# Workers pick up a rewritten checkpoint within this many seconds, without a restart.
+# The checkpoint is read at startup by the warm-up below (or by the first request), not on import.
+predictor = Predictor(watch_interval=float(os.getenv("CHECKPOINT_WATCH_INTERVAL", "2")), lazy=True)
+inference_pool = pool_from_env(predictor)
+# Checked in the handler rather than inside Predictor so hits skip the pool queue
+# and process workers share one cache.
+result_cache = cache_from_env(watch_path=predictor.checkpoint_path)
 
-predictor = Predictor()
+
+# Contributions are spooled to SQLite and pushed in batches by a background thread,
+# so /upload never waits on GitHub. Both are created on first use. Under app.serve
+# every worker enqueues but only slot 0 flushes (CONTRIB_FLUSH is cleared in the
+# others). During a rolling restart the old and new slot-0 workers both flush for a
+# while; ContributionQueue.next_batch claims rows atomically, so each row is pushed once.
+CONTRIB_QUEUE_PATH = Path(os.getenv("CONTRIB_QUEUE_PATH", "data/contributions.sqlite3"))
+CONTRIB_FLUSH = True
+_contribution_queue: Optional[ContributionQueue] = None
+_contribution_worker: Optional[ContributionWorker] = None
+
+
+def _contributions() -> tuple[ContributionQueue, Optional[ContributionWorker]]:
+    global _contribution_queue, _contribution_worker
+    if _contribution_queue is None:
+        _contribution_queue = ContributionQueue(CONTRIB_QUEUE_PATH)
+    if CONTRIB_FLUSH and _contribution_worker is None:
+        _contribution_worker = ContributionWorker(
+            _contribution_queue,
+            batch_size=int(os.getenv("CONTRIB_BATCH_SIZE", "50")),
+            interval=float(os.getenv("CONTRIB_FLUSH_INTERVAL", "5")),
+            fingerprints=_fingerprints(),
+        )
+    return _contribution_queue, _contribution_worker
+
+
+# Contributions are fingerprinted and checked against everything already contributed
+# (src/utils/fingerprint_index.py), so a re-upload of the same clip isn't pushed again.
+# `python -m scripts.build_fingerprint_index` indexes an existing pending/ checkout.
+FINGERPRINT_INDEX_DIR = Path(os.getenv("FINGERPRINT_INDEX_DIR", "data/fingerprints"))
+DEDUP_CONTRIBUTIONS = os.getenv("DEDUP_CONTRIBUTIONS", "1") != "0"
+_fingerprint_index: Optional[FingerprintIndex] = None
+
+
+def _fingerprints() -> Optional[FingerprintIndex]:
+    global _fingerprint_index
+    if DEDUP_CONTRIBUTIONS and _fingerprint_index is None:
+        _fingerprint_index = FingerprintIndex(FINGERPRINT_INDEX_DIR)
+    return _fingerprint_index
+
+
+# Score synthetic clips before accepting traffic, so the first requests after a
+# (cold) start aren't the slow ones. /ready answers 503 until this is done.
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+_warm_up_seconds: Optional[float] = None
+_ready = False
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global _warm_up_seconds, _ready
+    if WARM_UP:
+        start = time.perf_counter()
+        predictor.warm_up()
+        await inference_pool.warm_up()
+        _warm_up_seconds = time.perf_counter() - start
+        # Keep the synthetic clips out of the latency histograms.
+        metrics.reset()
+    if CONTRIB_FLUSH and CONTRIB_QUEUE_PATH.exists():
+        # Resume flushing anything left over from a previous run.
+        _contributions()[1].start()
+    _ready = True
+    yield
+    _ready = False
+    if _contribution_worker is not None:
+        _contribution_worker.stop()
+    inference_pool.shutdown()
+
+
+app = FastAPI(title="CheetahSense API", version="0.1.0", lifespan=lifespan)
 
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "64"))
+# Room for the multipart boundaries, headers and form fields around the file(s).
+MULTIPART_OVERHEAD = 64 * 1024
 CONTRIB_THRESHOLD = float(os.getenv("CONTRIB_THRESHOLD", "0.85"))
-UPLOAD_PREFIX = "cheetahsense_upload_"
+# /stream: hops a connection may fall behind before older windows are dropped,
+# the largest accepted PCM message, and the per-process connection cap.
+STREAM_MAX_LAG_HOPS = int(os.getenv("STREAM_MAX_LAG_HOPS", "4"))
+STREAM_MAX_CHUNK_BYTES = int(os.getenv("STREAM_MAX_CHUNK_BYTES", str(1024 * 1024)))
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", "512"))
+_stream_connections = 0
 ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",")]
 
+# Oversized bodies are refused while they stream in (413), rather than after being
+# spooled in full. Inside CORS so browsers can read the error.
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/upload": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/timeline": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/upload/batch": MAX_BATCH_FILES * MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+    },
+    detail="File too large (>5MB).",
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -26,11 +131,134 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so Server-Timing's total covers the whole request.
+app.add_middleware(metrics.ServerTimingMiddleware)
+
+
+@app.exception_handler(AudioDecodeError)
+async def audio_decode_error(_request, exc: AudioDecodeError):
+    return JSONResponse(status_code=415, content={"detail": str(exc)})
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "threshold": CONTRIB_THRESHOLD}
+    return {
+        "status": "ok",
+        "threshold": CONTRIB_THRESHOLD,
+        "checkpoint": {
+            "path": str(predictor.checkpoint_path),
+            "id": predictor.checkpoint_id,
+            "members": getattr(predictor.model, "num_members", 1),
+        },
+        "pool": {
+            "kind": inference_pool.kind,
+            "workers": inference_pool.workers,
+            "in_flight": inference_pool.in_flight,
+            "capacity": inference_pool.capacity,
+        },
+        "upload_batching": upload_batcher.stats() if upload_batcher else None,
+        "cache": result_cache.stats() if result_cache else None,
+        "contributions": _contribution_worker.stats() if _contribution_worker else None,
+        "fingerprints": _fingerprint_index.stats() if _fingerprint_index else None,
+        "streams": _stream_connections,
+        "warm_up_seconds": _warm_up_seconds,
+        "ready": _ready,
+        "pid": os.getpid(),
+    }
+
+
+@app.get("/ready")
+def ready():
+    # Readiness probe: false until startup (including warm-up) has finished and again
+    # once shutdown begins, so a load balancer only routes to warm workers.
+    if not _ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Stage latency histograms (see src/utils/metrics.py) and service gauges in the
+    Prometheus text format. Each server process reports its own.
+    """
+    gauges = {
+        "pool_in_flight": inference_pool.in_flight,
+        "pool_capacity": inference_pool.capacity,
+        "streams": _stream_connections,
+    }
+    counters = {}
+    if upload_batcher is not None:
+        gauges["upload_batch_pending"] = upload_batcher.pending
+        counters.update(upload_batches=upload_batcher.batches, upload_batch_items=upload_batcher.items)
+    if result_cache is not None:
+        stats = result_cache.stats()
+        gauges["cache_entries"] = stats["entries"]
+        counters.update(cache_hits=stats["hits"], cache_misses=stats["misses"])
+    if _contribution_worker is not None:
+        gauges["contribution_queue_depth"] = _contribution_worker.queue.depth()
+    return PlainTextResponse(metrics.render_prometheus(gauges, counters), media_type="text/plain; version=0.0.4")
+
+
+async def _run_inference(method: str, *args):
+    try:
+        return await inference_pool.run(method, *args)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail="Inference queue full; retry later.") from exc
+
+
+async def _score_uploads(payloads: List[bytes]) -> List:
+    try:
+        return await inference_pool.run("predict_batch", payloads)
+    except QueueFullError:
+        raise
+    except Exception:  # noqa: BLE001
+        if len(payloads) == 1:
+            raise
+    # One unreadable clip fails predict_batch for all of them; score them one by one
+    # so only its own request gets the error.
+    singles = [inference_pool.run("predict_batch", [payload]) for payload in payloads]
+    return [result if isinstance(result, BaseException) else result[0] for result in await asyncio.gather(*singles, return_exceptions=True)]
+
+
+# Concurrent single-clip /upload requests are scored together: one predict_batch (one
+# pool task, one feature matrix, one matmul/softmax) per batch. A request is sent as
+# soon as a pool worker is idle; while all are busy, requests wait up to
+# UPLOAD_BATCH_WAIT_MS for others to join, up to UPLOAD_BATCH_MAX_SIZE per batch.
+# UPLOAD_BATCH_MAX_SIZE=1 turns batching off.
+UPLOAD_BATCH_MAX_SIZE = int(os.getenv("UPLOAD_BATCH_MAX_SIZE", "16"))
+UPLOAD_BATCH_WAIT_MS = float(os.getenv("UPLOAD_BATCH_WAIT_MS", "2"))
+upload_batcher = (
+    MicroBatcher(
+        _score_uploads,
+        max_batch_size=UPLOAD_BATCH_MAX_SIZE,
+        max_wait=UPLOAD_BATCH_WAIT_MS / 1000,
+        max_in_flight=1 if inference_pool.kind == "inline" else inference_pool.workers,
+    )
+    if UPLOAD_BATCH_MAX_SIZE > 1
+    else None
+)
+
+
+async def _infer_upload(payload: bytes) -> dict:
+    if upload_batcher is None:
+        return await _run_inference("predict_from_bytes", payload)
+    try:
+        return await upload_batcher.submit(payload)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail="Inference queue full; retry later.") from exc
+
+
+async def _predict_upload(payload: bytes) -> dict:
+    if result_cache is None:
+        return await _infer_upload(payload)
+    key = result_cache.key(payload, predictor.checkpoint_id)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+    inference = await _infer_upload(payload)
+    result_cache.put(key, inference)
+    return inference
 
 
 @app.post("/upload")
@@ -42,61 +270,204 @@ async def upload(
     notes: Optional[str] = Form(None),
 ):
     contribution_result = PushResult(status="skipped", url=None, message="Contribution not requested.")
-    temp_path: Optional[Path] = None
 
-    try:
+    with metrics.stage("upload.read"):
         payload = await file.read()
-        if not payload:
-            raise HTTPException(status_code=400, detail="Empty upload.")
-        if len(payload) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File too large (>5MB).")
+    if not payload:
+        raise HTTPException(status_code=400, detail="Empty upload.")
+    if len(payload) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large (>5MB).")
 
-        suffix = Path(file.filename or "upload.bin").suffix or ".bin"
-        with tempfile.NamedTemporaryFile(delete=False, prefix=UPLOAD_PREFIX, suffix=suffix) as tmp:
-            temp_path = Path(tmp.name)
-            tmp.write(payload)
+    # Includes any wait for a pool worker; the predictor's own stages are nested inside.
+    with metrics.stage("upload.inference"):
+        inference = await _predict_upload(payload)
 
-        inference = predictor.predict_from_file(temp_path)
-
-        if contribute:
-            if inference["confidence"] < CONTRIB_THRESHOLD:
-                try:
-                    contribution_result = push_pending_clip(
-                        file_path=temp_path,
+    if contribute:
+        if inference["confidence"] < CONTRIB_THRESHOLD:
+            try:
+                queue, worker = _contributions()
+                fingerprints = _fingerprints()
+                fingerprint = await _run_inference("fingerprint", payload) if fingerprints is not None else None
+                with metrics.stage("upload.contribute"):
+                    contribution_result = queue_contribution(
+                        queue,
+                        worker,
+                        content=payload,
+                        filename=file.filename,
                         contributor=contributor,
                         provided_label=label,
                         notes=notes,
                         predicted_label=inference["label"],
                         confidence=inference["confidence"],
+                        fingerprints=fingerprints,
+                        fingerprint=fingerprint,
                     )
-                except Exception as exc:  # noqa: BLE001
-                    contribution_result = PushResult(
-                        status="error",
-                        url=None,
-                        message=f"Contribution failed: {exc}",
-                    )
-            else:
+            except Exception as exc:  # noqa: BLE001
                 contribution_result = PushResult(
-                    status="skipped",
+                    status="error",
                     url=None,
-                    message=f"Confidence {inference['confidence']:.2f} above threshold {CONTRIB_THRESHOLD:.2f}; not contributed.",
+                    message=f"Contribution failed: {exc}",
                 )
+        else:
+            contribution_result = PushResult(
+                status="skipped",
+                url=None,
+                message=f"Confidence {inference['confidence']:.2f} above threshold {CONTRIB_THRESHOLD:.2f}; not contributed.",
+            )
+
+    response = {
+        "label": inference["label"],
+        "probs": inference["probs"],
+        "confidence": inference["confidence"],
+        "contribution": contribution_result.to_dict(),
+    }
+    return JSONResponse(content=response)
+
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files (>{MAX_BATCH_FILES}).")
+    payloads: List[bytes] = []
+    for upload_file in files:
+        payload = await upload_file.read()
+        if not payload:
+            raise HTTPException(status_code=400, detail=f"Empty upload: {upload_file.filename}.")
+        if len(payload) > MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File too large (>5MB): {upload_file.filename}.")
+        payloads.append(payload)
 
-        response = {
+    inferences = await _run_inference("predict_batch", payloads)
+    results = [
+        {
+            "filename": upload_file.filename,
             "label": inference["label"],
             "probs": inference["probs"],
             "confidence": inference["confidence"],
-            "contribution": contribution_result.to_dict(),
         }
-        return JSONResponse(content=response)
+        for upload_file, inference in zip(files, inferences)
+    ]
+    return JSONResponse(content={"results": results})
+
+
+@app.post("/timeline")
+async def timeline(
+    file: UploadFile = File(...),
+    window: float = Form(1.0),
+    hop: float = Form(0.5),
+):
+    payload = await file.read()
+    if not payload:
+        raise HTTPException(status_code=400, detail="Empty upload.")
+    if len(payload) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large (>5MB).")
+    if window <= 0 or hop <= 0:
+        raise HTTPException(status_code=400, detail="window and hop must be positive.")
+
+    result = await _run_inference("predict_timeline", payload, window, hop)
+    return JSONResponse(content=result)
+
+
+async def _stream_predictions(websocket: WebSocket, session: StreamSession, ready: asyncio.Event):
+    # Scores the newest complete window whenever audio arrives. Windows that pile up
+    # while a prediction or send is in flight, or that the pool rejects, are dropped.
+    while True:
+        await ready.wait()
+        ready.clear()
+        while (item := session.next_window()) is not None:
+            index, window = item
+            completed_at = session.completed_at
+            try:
+                inference = (await inference_pool.run("predict_batch", [window], session.sample_rate))[0]
+            except QueueFullError:
+                session.skip()
+                continue
+            start = index * session.hop / session.sample_rate
+            await websocket.send_json(
+                {
+                    "type": "prediction",
+                    "index": index,
+                    "start": start,
+                    "end": start + session.window / session.sample_rate,
+                    "label": inference["label"],
+                    "probs": inference["probs"],
+                    "confidence": inference["confidence"],
+                    "dropped": session.dropped,
+                    "latency_ms": (time.monotonic() - completed_at) * 1000,
+                }
+            )
+
+
+@app.websocket("/stream")
+async def stream(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    encoding: str = "s16le",
+    window: float = 1.0,
+    hop: float = 0.5,
+):
+    """
+    Live scoring. Send binary messages of mono PCM (`encoding` s16le or f32le at
+    `sample_rate`); receive a JSON prediction for each `hop` seconds of audio once
+    `window` seconds have arrived.
+    """
+    global _stream_connections
+    if encoding not in ENCODINGS or sample_rate <= 0 or window <= 0 or hop <= 0:
+        await websocket.close(code=1008, reason=f"Need sample_rate, window, hop > 0 and encoding in {sorted(ENCODINGS)}.")
+        return
+    if _stream_connections >= STREAM_MAX_CONNECTIONS:
+        await websocket.close(code=1013, reason="Too many streams; retry later.")
+        return
+
+    await websocket.accept()
+    session = StreamSession(sample_rate, window, hop, max_lag_hops=max(STREAM_MAX_LAG_HOPS, 1))
+    await websocket.send_json(
+        {
+            "type": "config",
+            "sample_rate": sample_rate,
+            "encoding": encoding,
+            "window": session.window / sample_rate,
+            "hop": session.hop / sample_rate,
+            "labels": predictor.labels,
+        }
+    )
+    ready = asyncio.Event()
+    sender = asyncio.create_task(_stream_predictions(websocket, session, ready))
+    _stream_connections += 1
+    try:
+        while not sender.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            payload = message.get("bytes")
+            if payload is None:
+                continue
+            if len(payload) > STREAM_MAX_CHUNK_BYTES:
+                await websocket.close(code=1009, reason=f"Chunks are limited to {STREAM_MAX_CHUNK_BYTES} bytes.")
+                break
+            try:
+                samples = decode_chunk(payload, encoding)
+            except ValueError as exc:
+                await websocket.close(code=1007, reason=str(exc))
+                break
+            if session.push(samples):
+                ready.set()
     finally:
-        if temp_path and temp_path.exists():
-            temp_path.unlink(missing_ok=True)
+        _stream_connections -= 1
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
 
 
 if __name__ == "__main__":
-    host = os.getenv("UVICORN_HOST", "0.0.0.0")
-    port = int(os.getenv("UVICORN_PORT", "8000"))
-    import uvicorn
+    # Development server with auto-reload; SERVER_WORKERS=N switches to the pre-fork
+    # production server (app/serve.py).
+    if int(os.getenv("SERVER_WORKERS", "0")) > 0:
+        from app.serve import main
+
+        main()
+    else:
+        host = os.getenv("UVICORN_HOST", "0.0.0.0")
+        port = int(os.getenv("UVICORN_PORT", "8000"))
+        import uvicorn
 
-    uvicorn.run("app.fastapi_app:app", host=host, port=port, reload=True)
+        uvicorn.run("app.fastapi_app:app", host=host, port=port, reload=True)
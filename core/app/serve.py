@@ -0,0 +1,86 @@
+"""
+Production server: pre-forked uvicorn workers sharing one preloaded model.
+
+The parent imports the API, loads the checkpoint and runs Predictor.warm_up() (which
+builds the resample filters, windows, filterbanks and FFT plans), then forks
+SERVER_WORKERS workers on one listening socket. Workers share those pages
+copy-on-write instead of each building its own Predictor. Each worker serves once its
+own startup warm-up is done (/ready is 503 until then).
+
+The parent watches the checkpoint rather than every worker: when it changes, the
+parent loads and warms the new one and replaces the workers one at a time, each new
+worker ready before the old one drains. `kill -HUP <parent>` does the same on demand.
+
+Run from core/:
+    python -m app.serve --workers 4 --port 8000
+    SERVER_WORKERS=4 python -m app.fastapi_app
+"""
+import argparse
+import asyncio
+import os
+import socket
+from typing import Callable
+
+from app import fastapi_app
+from src.utils.prefork import PreforkServer, bind_socket
+
+
+def preload() -> None:
+    predictor = fastapi_app.predictor
+    predictor.warm_up()
+    # The parent checks the checkpoint for all workers (reload below); each worker
+    # hot-reloading on its own would give it a private copy of the model.
+    predictor.watch_interval = None
+
+
+def reload() -> bool:
+    if not fastapi_app.predictor.reload_if_changed():
+        return False
+    fastapi_app.predictor.warm_up()
+    return True
+
+
+def serve(sock: socket.socket, slot: int, ready: Callable[[], None], log_level: str = "warning", graceful_timeout: float = 30.0) -> None:
+    import uvicorn
+
+    # One worker flushes the contribution queue; the others only enqueue.
+    fastapi_app.CONTRIB_FLUSH = slot == 0
+    config = uvicorn.Config(fastapi_app.app, log_level=log_level, timeout_graceful_shutdown=graceful_timeout)
+    server = uvicorn.Server(config)
+
+    async def run():
+        serving = asyncio.ensure_future(server.serve(sockets=[sock]))
+        # `started` is set after the lifespan startup (warm-up) completes.
+        while not server.started and not serving.done():
+            await asyncio.sleep(0.01)
+        if server.started:
+            ready()
+        await serving
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("UVICORN_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("UVICORN_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "0")), help="0 = one per CPU.")
+    parser.add_argument("--check-interval", type=float, default=float(os.getenv("CHECKPOINT_WATCH_INTERVAL", "2")))
+    parser.add_argument("--graceful-timeout", type=float, default=30.0, help="Seconds a retiring worker may take to drain.")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    server = PreforkServer(
+        lambda sock, slot, ready: serve(sock, slot, ready, args.log_level, args.graceful_timeout),
+        bind_socket(args.host, args.port),
+        workers=args.workers or os.cpu_count() or 1,
+        preload=preload,
+        reload=reload,
+        check_interval=args.check_interval,
+        graceful_timeout=args.graceful_timeout,
+    )
+    server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,43 @@
-import io
 import os
 import tempfile
 from pathlib import Path
 
-import requests
 import streamlit as st
 
-from src.inference.predictor import Predictor
-from src.utils.github_push import push_pending_clip
+from src.client.api import ApiError, CheetahSenseClient
+from src.inference.cache import cache_from_env
+from src.inference.predictor import DEFAULT_CHECKPOINT_PATH, Predictor
+from src.preprocess.decode import AudioDecodeError
 
 API_URL = os.getenv("CHEETAHSENSE_API", "http://localhost:8000/upload")
-predictor = Predictor()
 MAX_FILE_SIZE = 5 * 1024 * 1024  # keep in sync with API
 
+
+# Streamlit re-runs this script on every interaction; the predictor (checkpoint, result
+# cache, warmed-up filters) is built once per server process and shared by all sessions.
+@st.cache_resource(show_spinner="Loading model...")
+def get_predictor() -> Predictor:
+    predictor = Predictor(cache=cache_from_env(watch_path=DEFAULT_CHECKPOINT_PATH), lazy=True)
+    predictor.warm_up()
+    return predictor
+
+
+# One client per server process: its keep-alive connections outlive the script re-runs.
+@st.cache_resource
+def get_client() -> CheetahSenseClient:
+    return CheetahSenseClient(API_URL.removesuffix("/upload"))
+
+
 st.set_page_config(page_title="CheetahSense", page_icon="🐆", layout="centered")
 st.title("CheetahSense — Vocalization → Intent")
 
 st.markdown("Uploads are processed ephemerally. Contributions are opt-in and gated by a confidence threshold.")
+# Load on the first page view rather than on the first submit.
+get_predictor()
 
 
-def run_local_inference(file_bytes: bytes, suffix: str):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix="cheetahsense_streamlit_") as tmp:
-        tmp.write(file_bytes)
-        tmp_path = Path(tmp.name)
-    try:
-        result = predictor.predict_from_file(tmp_path)
-    finally:
-        tmp_path.unlink(missing_ok=True)
-    return result
+def run_local_inference(file_bytes: bytes):
+    return get_predictor().predict_from_bytes(file_bytes)
 
 
 with st.form("upload_form"):
@@ -48,29 +58,38 @@ if submitted:
             st.error("File too large (>5MB).")
         else:
             if use_api:
-                files = {"file": (uploaded.name, io.BytesIO(data), uploaded.type)}
-                form = {
-                    "contribute": str(contribute).lower(),
-                    "contributor": contributor,
-                    "label": label,
-                    "notes": notes,
-                }
-                resp = requests.post(API_URL, files=files, data=form, timeout=30)
-                if resp.ok:
-                    output = resp.json()
-                else:
-                    st.error(f"API error: {resp.text}")
+                try:
+                    output = get_client().upload(
+                        data,
+                        filename=uploaded.name,
+                        content_type=uploaded.type,
+                        contribute=contribute,
+                        contributor=contributor,
+                        label=label,
+                        notes=notes,
+                    )
+                except (ApiError, OSError) as exc:
+                    st.error(f"API error: {exc}")
                     output = None
             else:
-                output = run_local_inference(data, Path(uploaded.name).suffix or ".bin")
-                output = {
-                    "label": output["label"],
-                    "probs": output["probs"],
-                    "confidence": output["confidence"],
-                    "contribution": {"status": "skipped", "url": None, "message": "Local inference only."},
-                }
-                if contribute and output["confidence"] < float(os.getenv("CONTRIB_THRESHOLD", "0.85")):
+                # WAV decodes natively; MP3/FLAC/OGG need soundfile, and MP4/M4A (AAC) aren't supported by it.
+                try:
+                    output = run_local_inference(data)
+                except AudioDecodeError as exc:
+                    st.error(f"Could not decode {uploaded.name}: {exc}")
+                    output = None
+                if output:
+                    output = {
+                        "label": output["label"],
+                        "probs": output["probs"],
+                        "confidence": output["confidence"],
+                        "contribution": {"status": "skipped", "url": None, "message": "Local inference only."},
+                    }
+                if output and contribute and output["confidence"] < float(os.getenv("CONTRIB_THRESHOLD", "0.85")):
+                    from src.utils.github_push import push_pending_clip
+
                     try:
+                        # Disk is only touched here, because push_pending_clip uploads from a file.
                         with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded.name).suffix) as tmp:
                             tmp.write(data)
                             temp_path = Path(tmp.name)
@@ -1,18 +1,26 @@
-import json
+import argparse
 from pathlib import Path
 
 from src.inference.predictor import DEFAULT_BIAS, DEFAULT_LABELS, DEFAULT_WEIGHTS
+from src.models.checkpoint import BINARY_SUFFIX, make_checkpoint, save_binary, save_json
 
 CHECKPOINT_DIR = Path("models/checkpoints")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Write the default weights as a checkpoint.")
+    parser.add_argument("--format", choices=["json", "binary", "both"], default="json")
+    args = parser.parse_args()
+
     CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
-    payload = {"labels": DEFAULT_LABELS, "weights": DEFAULT_WEIGHTS.tolist(), "bias": DEFAULT_BIAS.tolist()}
+    checkpoint = make_checkpoint(DEFAULT_LABELS, DEFAULT_WEIGHTS, DEFAULT_BIAS)
     path = CHECKPOINT_DIR / "trained_weights.json"
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-    print(f"Placeholder checkpoint written to {path}")
+    if args.format in ("json", "both"):
+        save_json(path, checkpoint)
+        print(f"Placeholder checkpoint written to {path}")
+    if args.format in ("binary", "both"):
+        save_binary(path.with_suffix(BINARY_SUFFIX), checkpoint)
+        print(f"Placeholder checkpoint written to {path.with_suffix(BINARY_SUFFIX)}")
 
 
 if __name__ == "__main__":
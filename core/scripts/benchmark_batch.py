@@ -0,0 +1,54 @@
+"""
+Clips/sec for Predictor.predict_from_file in a loop vs Predictor.predict_batch.
+
+Run from core/: python -m scripts.benchmark_batch
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from src.inference.predictor import Predictor
+
+
+def write_clips(out_dir: Path, count: int, sr: int = 16000, duration: float = 0.6) -> list[Path]:
+    rng = np.random.default_rng(0)
+    t = np.linspace(0, duration, int(sr * duration), endpoint=False)
+    paths = []
+    for i in range(count):
+        freq = rng.uniform(150.0, 2000.0)
+        wave = 0.5 * np.sin(2 * np.pi * freq * t) + 0.02 * rng.normal(size=t.shape)
+        path = out_dir / f"clip_{i}.wav"
+        wavfile.write(path, sr, wave.astype(np.float32))
+        paths.append(path)
+    return paths
+
+
+def _rate(count: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 1024])
+    args = parser.parse_args()
+
+    predictor = Predictor()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_clips(Path(tmp), max(args.sizes))
+        predictor.predict_batch(paths[:1])  # warm-up
+        print(f"{'N':>6} {'loop clips/s':>14} {'batch clips/s':>14}")
+        for n in args.sizes:
+            subset = paths[:n]
+            loop = _rate(n, lambda: [predictor.predict_from_file(p) for p in subset])
+            batch = _rate(n, lambda: predictor.predict_batch(subset))
+            print(f"{n:>6} {loop:>14.1f} {batch:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
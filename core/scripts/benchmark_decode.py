@@ -0,0 +1,134 @@
+"""
+Decode time and peak memory of load_audio_mono (memory-mapped / zero-copy WAV, one
+float32 buffer) against the previous path (wavfile.read into memory, then downmix,
+scale and normalize as separate copies). No resampling, so only decoding is compared.
+
+Peak RSS is measured in a fresh interpreter per case: the growth of the high-water
+mark over the RSS just before the call (the payload itself is already resident for
+`bytes` cases). Heap is tracemalloc's peak for the call, which counts numpy buffers but
+not mapped file pages.
+
+Run from core/: python -m scripts.benchmark_decode --durations 10 60 300
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from src.preprocess.audio_preprocess import load_audio_mono
+
+# (label, sample rate, channels, dtype)
+FORMATS = [
+    ("16k mono int16", 16000, 1, "int16"),
+    ("44.1k stereo int16", 44100, 2, "int16"),
+    ("48k stereo float32", 48000, 2, "float32"),
+]
+
+
+def previous_load(source, target_sr: int):
+    # load_audio_mono before the decode layer, kept here for comparison.
+    import io
+
+    sr, data = wavfile.read(io.BytesIO(source) if isinstance(source, bytes) else source)
+    if data.ndim > 1:
+        data = np.mean(data, axis=1, dtype=np.float32)
+    if np.issubdtype(data.dtype, np.integer):
+        data = np.multiply(data, np.float32(1.0 / (np.iinfo(data.dtype).max + 1)), dtype=np.float32)
+    data = data.astype(np.float32, copy=False)
+    peak = np.max(np.abs(data)) + 1e-9
+    return sr, (data / np.float32(peak)).astype(np.float32, copy=False)
+
+
+LOADERS = {"previous": previous_load, "current": lambda source, target_sr: load_audio_mono(source, target_sr=target_sr)}
+
+_CHILD = r"""
+import json, sys
+from pathlib import Path
+from scripts.benchmark_decode import LOADERS
+
+
+def status(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":")) / 1e3
+
+
+loader, kind, path, sr = sys.argv[1], sys.argv[2], Path(sys.argv[3]), int(sys.argv[4])
+source = path.read_bytes() if kind == "bytes" else path
+LOADERS[loader](source, sr)  # imports and first-call costs out of the way
+try:
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")  # reset VmHWM to the current RSS
+except OSError:
+    pass
+before = status("VmRSS")
+LOADERS[loader](source, sr)
+print(json.dumps({"rss_growth_mb": status("VmHWM") - before}))
+"""
+
+
+def child_rss(loader: str, kind: str, path: Path, sr: int) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, loader, kind, str(path), str(sr)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "METRICS_ENABLED": "0"},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])["rss_growth_mb"]
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def heap_peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[10.0, 60.0, 300.0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--no-rss", action="store_true", help="Skip the per-case subprocess RSS runs.")
+    args = parser.parse_args()
+
+    print(f"{'clip':<28} {'source':<6} {'loader':<9} {'ms':>9} {'heap MB':>9} {'RSS MB':>8}")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, sr, channels, dtype in FORMATS:
+            for duration in args.durations:
+                wave = rng.uniform(-0.5, 0.5, size=(int(sr * duration), channels)).astype(np.float32)
+                pcm = (wave * 32767).astype(dtype) if dtype == "int16" else wave
+                path = Path(tmp) / "clip.wav"
+                wavfile.write(path, sr, pcm[:, 0] if channels == 1 else pcm)
+                payload = path.read_bytes()
+                name = f"{label} {duration:g}s"
+                for kind, source in (("path", path), ("bytes", payload)):
+                    for loader, fn in LOADERS.items():
+                        seconds = _best_of(lambda: fn(source, sr), args.repeats)
+                        heap = heap_peak_mb(lambda: fn(source, sr))
+                        rss = child_rss(loader, kind, path, sr) if not args.no_rss else float("nan")
+                        print(f"{name:<28} {kind:<6} {loader:<9} {seconds * 1e3:>9.2f} {heap:>9.1f} {rss:>8.1f}")
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Cost of serving an ensemble: ms per clip for predict_batch as members are added,
+against running one Predictor per member, plus the scoring-only marginal cost per member.
+
+Run from core/: python -m scripts.benchmark_ensemble
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.benchmark_batch import write_clips
+from src.features.spectral import EmbeddingConfig
+from src.inference.predictor import Predictor
+from src.models.checkpoint import make_checkpoint, save_json
+from src.models.ensemble import save_manifest
+from src.models.fusion_model import RuleBasedFusionModel
+
+LABELS = ["resting", "hunting", "distress"]
+
+
+def _best_of(repeats: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--mode", choices=["basic", "logmel", "mfcc"], default="mfcc")
+    parser.add_argument("--fusion", choices=["mean", "log_mean"], default="log_mean")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    config = EmbeddingConfig(mode=args.mode)
+    features = config.to_dict() if args.mode != "basic" else None
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        clips = write_clips(tmp, args.clips)
+        payloads = [path.read_bytes() for path in clips]
+        member_paths = []
+        for i in range(max(args.members)):
+            path = tmp / f"member_{i}.json"
+            save_json(path, make_checkpoint(LABELS, rng.normal(size=(3, config.dim)), rng.normal(size=3), features=features))
+            member_paths.append(path)
+
+        single = Predictor(member_paths[0])
+        single.predict_batch(payloads[:1])  # warm-up
+        base = _best_of(args.repeats, lambda: single.predict_batch(payloads)) / args.clips
+        vectors = {config: rng.normal(size=(args.clips, config.dim)).astype(np.float32)}
+        print(f"single model: {base * 1000:.3f} ms/clip ({args.mode} features, {args.clips} clips)")
+        print(f"{'members':>8} {'ensemble ms/clip':>17} {'separate ms/clip':>17} {'scoring us/clip/member':>23}")
+        for m in args.members:
+            manifest = tmp / f"ensemble_{m}.json"
+            save_manifest(manifest, [p.name for p in member_paths[:m]], RuleBasedFusionModel(m, args.fusion))
+            ensemble = Predictor(manifest)
+            ensemble_time = _best_of(args.repeats, lambda: ensemble.predict_batch(payloads)) / args.clips
+            separate = [Predictor(p) for p in member_paths[:m]]
+            separate_time = _best_of(1, lambda: [pred.predict_batch(payloads) for pred in separate]) / args.clips
+            scoring = _best_of(args.repeats, lambda: ensemble.model.predict_proba(vectors)) / args.clips / m
+            print(f"{m:>8} {ensemble_time * 1000:>17.3f} {separate_time * 1000:>17.3f} {scoring * 1e6:>23.3f}")
+
+
+if __name__ == "__main__":
+    main()
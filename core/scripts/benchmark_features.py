@@ -0,0 +1,88 @@
+"""
+Extraction speed of each feature mode, and of the vectorized log-mel path against
+a per-frame loop that rebuilds the window and mel filterbank as it goes.
+Also times timeline windows pooled from one frame pass against extracting each window.
+
+Run from core/: python -m scripts.benchmark_features
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.features.audio_embeddings import frame_starts
+from src.features.spectral import (
+    FEATURE_MODES,
+    EmbeddingConfig,
+    dct_matrix,
+    extract_embedding,
+    hann_window,
+    mel_filterbank,
+    pool_frames,
+    windowed_embeddings,
+)
+from src.preprocess.audio_preprocess import normalize_audio
+
+
+def per_frame_loop(waveform: np.ndarray, sr: int, config: EmbeddingConfig) -> np.ndarray:
+    rows = []
+    for start in range(0, len(waveform) - config.n_fft + 1, config.hop):
+        hann_window.cache_clear()
+        mel_filterbank.cache_clear()
+        frame = waveform[start : start + config.n_fft] * hann_window(config.n_fft)
+        power = np.abs(np.fft.rfft(frame)) ** 2
+        values = np.log(power @ mel_filterbank(sr, config.n_fft, config.n_mels) + 1e-10)
+        if config.mode == "mfcc":
+            values = values @ dct_matrix(config.n_mels, config.n_mfcc)
+        rows.append(values)
+    return pool_frames(np.stack(rows))
+
+
+def _best_of(repeats: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--sr", type=int, default=16000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(args.sr * args.seconds)) / args.sr
+    wave = normalize_audio(np.sin(2 * np.pi * 440 * t) + 0.3 * rng.normal(size=len(t))).astype(np.float32)
+
+    print(f"{'mode':>8} {'dim':>5} {'x realtime':>11}")
+    for mode in FEATURE_MODES:
+        config = EmbeddingConfig(mode=mode)
+        elapsed = _best_of(args.repeats, lambda: extract_embedding(wave, args.sr, config))
+        print(f"{mode:>8} {config.dim:>5} {args.seconds / elapsed:>11.0f}")
+
+    for mode in ("logmel", "mfcc"):
+        config = EmbeddingConfig(mode=mode)
+        assert np.allclose(per_frame_loop(wave, args.sr, config), extract_embedding(wave, args.sr, config), atol=1e-3)
+        loop = _best_of(1, lambda: per_frame_loop(wave, args.sr, config))
+        vectorized = _best_of(args.repeats, lambda: extract_embedding(wave, args.sr, config))
+        print(f"{mode}: per-frame loop {loop * 1000:.0f}ms, vectorized {vectorized * 1000:.1f}ms ({loop / vectorized:.0f}x)")
+
+    config = EmbeddingConfig(mode="mfcc")
+    window, hop = args.sr, args.sr // 2
+    starts = frame_starts(len(wave), window, hop)
+    per_window = _best_of(
+        args.repeats, lambda: [extract_embedding(wave[s : s + window], args.sr, config) for s in starts]
+    )
+    pooled = _best_of(args.repeats, lambda: windowed_embeddings(wave, args.sr, config, window, hop))
+    print(
+        f"timeline ({len(starts)} windows): per-window {per_window * 1000:.1f}ms, "
+        f"pooled {pooled * 1000:.1f}ms ({per_window / pooled:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Fingerprinting and FingerprintIndex throughput: fingerprints per second on synthetic
+clips, then an index of --clips synthetic fingerprints (random landmark hashes, as
+many per clip as a real clip of --clip-seconds gets) for add / compact / reopen times,
+disk size and lookup latency. A "hit" queries a perturbed subset of an indexed
+clip's hashes (half kept, plus as many unrelated ones, all shifted in time); a "miss"
+queries a fresh random fingerprint. Last, --incremental clips are added to the large
+index and compacted, as a sync after a day of contributions would.
+
+Run from core/: python -m scripts.benchmark_fingerprint --clips 1000000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.features.fingerprint import FAN_OUT, MAX_DT, N_FFT, PEAKS_PER_SECOND, _DT_BITS, _FREQ_BITS, fingerprint
+from src.utils.fingerprint_index import FingerprintIndex
+
+_BINS = N_FFT // 2 + 1
+
+
+def random_fingerprint(rng: np.random.Generator, n: int, frames: int):
+    f1 = rng.integers(0, _BINS, n, dtype=np.uint32)
+    f2 = rng.integers(0, _BINS, n, dtype=np.uint32)
+    dt = rng.integers(1, MAX_DT + 1, n, dtype=np.uint32)
+    hashes = (f1 << (_FREQ_BITS + _DT_BITS)) | (f2 << _DT_BITS) | dt
+    return hashes, rng.integers(0, frames, n, dtype=np.uint16)
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _disk_mb(directory: Path) -> float:
+    return sum(p.stat().st_size for p in directory.rglob("*") if p.is_file()) / 1e6
+
+
+def _latencies(index: FingerprintIndex, queries) -> np.ndarray:
+    out = []
+    for hashes, anchors in queries:
+        start = time.perf_counter()
+        index.find_duplicate(hashes, anchors)
+        out.append(time.perf_counter() - start)
+    return np.array(out) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=1_000_000)
+    parser.add_argument("--clip-seconds", type=float, default=2.0)
+    parser.add_argument("--batch", type=int, default=10_000, help="Clips per add_many call while building.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--incremental", type=int, default=1000)
+    parser.add_argument("--dir", type=Path, default=None, help="Where to build the index (default: a temp dir).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sr = 16000
+    t = np.arange(int(sr * args.clip_seconds)) / sr
+    clips = [
+        (0.5 * np.sin(2 * np.pi * rng.uniform(200, 2000) * t * (1 + rng.uniform(-0.3, 0.3) * t)) + rng.normal(0, 0.02, len(t))).astype(np.float32)
+        for _ in range(20)
+    ]
+    per_clip = _best_of(lambda: [fingerprint(c, sr) for c in clips], 3) / len(clips)
+    hashes_per_clip = int(np.mean([len(fingerprint(c, sr)[0]) for c in clips]))
+    print(f"fingerprint      {per_clip * 1e3:.2f} ms / {args.clip_seconds:g}s clip ({1 / per_clip:.0f} clips/sec/core), ~{hashes_per_clip} hashes/clip")
+    # Synthetic tones are sparser than real calls; index at least the nominal rate.
+    hashes_per_clip = max(hashes_per_clip, int(args.clip_seconds * PEAKS_PER_SECOND * FAN_OUT))
+    frames = int(args.clip_seconds * sr) // 256
+
+    directory = Path(args.dir or tempfile.mkdtemp(prefix="fpindex-"))
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        index = FingerprintIndex(directory)
+        kept = {}
+        probe_ids = set(rng.choice(args.clips, size=min(args.queries, args.clips), replace=False).tolist())
+        add_seconds = 0.0
+        for first in range(0, args.clips, args.batch):
+            batch = []
+            for i in range(first, min(first + args.batch, args.clips)):
+                hashes, anchors = random_fingerprint(rng, hashes_per_clip, frames)
+                batch.append((f"pending/clip_{i:07d}.wav", (i, i), hashes, anchors))
+                if i in probe_ids:
+                    kept[i] = (hashes, anchors)
+            start = time.perf_counter()
+            index.add_many(batch)
+            add_seconds += time.perf_counter() - start
+        print(f"add (log)        {args.clips} clips in {add_seconds:.1f}s ({args.clips / add_seconds:.0f} clips/sec), log {_disk_mb(directory):.0f} MB")
+
+        start = time.perf_counter()
+        index.compact()
+        compact_seconds = time.perf_counter() - start
+        stats = index.stats()
+        print(f"compact          {compact_seconds:.1f}s -> {stats['hashes']} hashes, {_disk_mb(directory):.0f} MB on disk")
+        index.close()
+
+        start = time.perf_counter()
+        index = FingerprintIndex(directory)
+        print(f"reopen           {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        hits = []
+        for hashes, anchors in kept.values():
+            keep = rng.random(len(hashes)) < 0.5
+            noise_h, noise_a = random_fingerprint(rng, int(keep.sum()), frames)
+            hits.append((np.concatenate([hashes[keep], noise_h]), np.concatenate([(anchors[keep] + 7), noise_a]).astype(np.uint16)))
+        misses = [random_fingerprint(rng, hashes_per_clip, frames) for _ in range(len(hits))]
+        _latencies(index, hits[:20])  # page in what the first queries touch
+        for label, queries in (("hit", hits), ("miss", misses)):
+            ms = _latencies(index, queries)
+            found = sum(index.find_duplicate(h, a) is not None for h, a in queries)
+            print(f"lookup {label:<9} p50 {np.percentile(ms, 50):.3f} ms  p99 {np.percentile(ms, 99):.3f} ms  flagged {found}/{len(queries)}")
+
+        start = time.perf_counter()
+        index.add_many(
+            (f"pending/new_{i:05d}.wav", (i, i), *random_fingerprint(rng, hashes_per_clip, frames)) for i in range(args.incremental)
+        )
+        added = time.perf_counter() - start
+        ms = _latencies(index, misses[:200])
+        print(f"lookup w/ log    p50 {np.percentile(ms, 50):.3f} ms  ({args.incremental} clips in the log)")
+        start = time.perf_counter()
+        index.compact()
+        print(f"incremental      +{args.incremental} clips: add {added * 1e3:.0f} ms, compact {time.perf_counter() - start:.1f}s")
+        index.close()
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
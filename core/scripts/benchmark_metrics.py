@@ -0,0 +1,69 @@
+"""
+Overhead of the per-stage timing hooks: Predictor.predict_from_file with
+METRICS_ENABLED off vs on, interleaved, plus the cost of one stage() block and the
+overhead it implies (stages per call x cost per stage).
+
+Run from core/: python -m scripts.benchmark_metrics --durations 0.25 1 5
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from scripts.generate_synthetic_data import synth_wave
+from src.inference.predictor import Predictor
+from src.utils import metrics
+
+
+def _best_of(fn, repeats: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[0.25, 1.0, 5.0])
+    parser.add_argument("--sr", type=int, default=44100, help="Clip sample rate (resampled to 16 kHz).")
+    parser.add_argument("--repeats", type=int, default=15)
+    args = parser.parse_args()
+
+    number = 100000
+    metrics.set_enabled(True)
+    on = _best_of(lambda: metrics.stage("bench").__enter__().__exit__(None, None, None), 5, number)
+    metrics.set_enabled(False)
+    off = _best_of(lambda: metrics.stage("bench").__enter__().__exit__(None, None, None), 5, number)
+    print(f"one stage(): {on * 1e9:.0f} ns enabled, {off * 1e9:.0f} ns disabled\n")
+
+    predictor = Predictor()
+    print(f"{'clip s':>7} {'off ms':>9} {'on ms':>9} {'measured':>9} {'stages':>7} {'estimate':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            path = Path(tmp) / f"clip_{duration:g}.wav"
+            wavfile.write(path, args.sr, (synth_wave(440.0, args.sr, duration) * 32767).astype(np.int16))
+            number = max(int(0.05 / (duration * 2e-3)), 1)
+            # Alternate the two settings so drift in machine load hits both equally.
+            best = {False: float("inf"), True: float("inf")}
+            for i in range(args.repeats):
+                for enabled in ((False, True) if i % 2 else (True, False)):
+                    metrics.set_enabled(enabled)
+                    best[enabled] = min(best[enabled], _best_of(lambda: predictor.predict_from_file(path), 1, number))
+            # The end-to-end difference is usually within noise; stages x per-stage cost is not.
+            with metrics.collect_timings() as timings:
+                predictor.predict_from_file(path)
+            estimate = len(timings) * (on - off) / best[False]
+            print(
+                f"{duration:>7g} {best[False] * 1e3:>9.3f} {best[True] * 1e3:>9.3f} {best[True] / best[False] - 1:>+9.2%} "
+                f"{len(timings):>7} {estimate:>+9.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
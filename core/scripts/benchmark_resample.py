@@ -0,0 +1,71 @@
+"""
+Throughput and SNR of the cached polyphase resampler against the previous
+`resample_poly(data, target_sr, sr)` path, for int16 stereo input at common rates.
+
+Run from core/: python -m scripts.benchmark_resample
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy import signal
+
+from src.preprocess.audio_preprocess import normalize_audio
+from src.preprocess.decode import pcm_to_float32
+from src.preprocess.resample import QUALITIES, resample
+
+RATES = [8000, 22050, 44100, 48000]
+
+
+def legacy(data: np.ndarray, sr: int, target_sr: int) -> np.ndarray:
+    mono = np.mean(data, axis=1).astype(np.float32)
+    return normalize_audio(signal.resample_poly(mono, target_sr, sr))
+
+
+def current(data: np.ndarray, sr: int, target_sr: int, quality: str) -> np.ndarray:
+    return normalize_audio(resample(pcm_to_float32(data), sr, target_sr, quality))
+
+
+def snr_db(reference: np.ndarray, estimate: np.ndarray) -> float:
+    noise = np.sum((reference.astype(np.float64) - estimate) ** 2)
+    if noise == 0:
+        return float("inf")
+    return float(10 * np.log10(np.sum(reference.astype(np.float64) ** 2) / noise))
+
+
+def _best_of(repeats: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--target-sr", type=int, default=16000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'src sr':>7} {'mode':>8} {'Msamples/s':>11} {'SNR dB':>8}")
+    for sr in RATES:
+        n = int(sr * args.seconds)
+        t = np.arange(n) / sr
+        tone = 0.4 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 2500 * t)
+        stereo = np.stack([tone, tone], axis=1) + 0.01 * rng.normal(size=(n, 2))
+        data = (stereo * 32767).astype(np.int16)
+
+        reference = legacy(data, sr, args.target_sr)
+        elapsed = _best_of(args.repeats, lambda: legacy(data, sr, args.target_sr))
+        print(f"{sr:>7} {'legacy':>8} {n / elapsed / 1e6:>11.2f} {'-':>8}")
+        for quality in QUALITIES:
+            output = current(data, sr, args.target_sr, quality)
+            elapsed = _best_of(args.repeats, lambda: current(data, sr, args.target_sr, quality))
+            print(f"{sr:>7} {quality:>8} {n / elapsed / 1e6:>11.2f} {snr_db(reference, output):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
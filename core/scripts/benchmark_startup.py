@@ -0,0 +1,135 @@
+"""
+Cold-start cost of the entry points, each measured in a fresh interpreter: import time,
+warm-up time, and time to the first and second prediction. `ready` is import +
+warm-up + first prediction.
+
+  api        import app.fastapi_app, then predict through its predictor
+  api+warm   the same, running Predictor.warm_up() first (what the API's startup does)
+  predictor  import src.inference.predictor and build a Predictor directly
+
+Run from core/: python -m scripts.benchmark_startup --runs 5
+benchmark_suite includes these as startup/* cases, so --compare tracks them too.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+TARGETS = ("api", "api+warm", "predictor")
+
+_CHILD = r"""
+import io, json, resource, sys, time
+start = time.perf_counter()
+
+
+def peak_rss_mb():
+    # ru_maxrss survives fork+exec on Linux, so it would report the parent's peak.
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1e3
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+target = sys.argv[1]
+if target.startswith("api"):
+    from app import fastapi_app
+    predictor = fastapi_app.predictor
+else:
+    from src.inference.predictor import Predictor
+    predictor = Predictor()
+imported = time.perf_counter()
+if target.endswith("+warm"):
+    predictor.warm_up()
+warmed = time.perf_counter()
+
+# Built with the stdlib so the clip itself doesn't import numpy/scipy ahead of the prediction.
+import array, math, wave
+buffer = io.BytesIO()
+with wave.open(buffer, "wb") as w:
+    w.setnchannels(1)
+    w.setsampwidth(2)
+    w.setframerate(44100)
+    w.writeframes(array.array("h", (int(16000 * math.sin(i * 0.0627)) for i in range(44100))).tobytes())
+payload = buffer.getvalue()
+t0 = time.perf_counter()
+predictor.predict_from_bytes(payload)
+t1 = time.perf_counter()
+predictor.predict_from_bytes(payload)
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "warm_up_ms": (warmed - imported) * 1000,
+    "first_prediction_ms": (t1 - t0) * 1000,
+    "second_prediction_ms": (t2 - t1) * 1000,
+    "ready_ms": (warmed - start + t1 - t0) * 1000,
+    "max_rss_mb": peak_rss_mb(),
+}))
+"""
+
+
+def run_child(target: str) -> Dict[str, float]:
+    # RESULT_CACHE_SIZE=0 so the second prediction is not a cache hit.
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, target],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "RESULT_CACHE_SIZE": "0"},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(target: str, runs: int) -> List[Dict[str, float]]:
+    run_child(target)  # first run pays for cold disk caches and .pyc compilation
+    return [run_child(target) for _ in range(runs)]
+
+
+def as_suite_results(runs: int, only: str = "") -> Dict[str, Dict]:
+    """
+    startup/<target>/<import|ready> entries in benchmark_suite's result schema (times in
+    ms, child max RSS as peak_mb), limited to names containing `only`.
+    """
+    results = {}
+    for target in TARGETS:
+        names = {metric: f"startup/{target}/{metric[:-3]}" for metric in ("import_ms", "ready_ms")}
+        names = {metric: name for metric, name in names.items() if only in name}
+        if not names:
+            continue
+        samples = measure_startup(target, runs)
+        for metric, name in names.items():
+            values = np.array([s[metric] for s in samples])
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            results[name] = {
+                "iterations": runs,
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(p50),
+                "p90_ms": float(p90),
+                "p99_ms": float(p99),
+                "calls_per_sec": 1000.0 / float(values.mean()),
+                "audio_x_realtime": 0.0,
+                "peak_mb": float(np.median([s["max_rss_mb"] for s in samples])),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    args = parser.parse_args()
+
+    columns = ("import_ms", "warm_up_ms", "first_prediction_ms", "second_prediction_ms", "ready_ms", "max_rss_mb")
+    print(f"{'target':<10} " + " ".join(f"{c.replace('_ms', ' ms').replace('_mb', ' MB'):>20}" for c in columns))
+    for target in args.targets:
+        samples = measure_startup(target, args.runs)
+        medians = {c: float(np.median([s[c] for s in samples])) for c in columns}
+        print(f"{target:<10} " + " ".join(f"{medians[c]:>20.1f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
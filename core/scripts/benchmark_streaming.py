@@ -0,0 +1,58 @@
+"""
+Peak memory and throughput of whole-file vs streaming feature extraction.
+
+Run from core/: python -m scripts.benchmark_streaming --minutes 1 5 20
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from src.features.audio_embeddings import compute_features, compute_features_streaming
+from src.preprocess.audio_preprocess import iter_audio_blocks, load_audio_mono
+
+
+def write_long_wav(path: Path, minutes: float, sr: int) -> None:
+    n = int(minutes * 60 * sr)
+    t = np.arange(n, dtype=np.float32) / sr
+    wave = 0.5 * np.sin(2 * np.pi * 440.0 * t) + 0.01 * np.random.default_rng(0).standard_normal(n, dtype=np.float32)
+    wavfile.write(path, sr, (wave * 32767).astype(np.int16))
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1.0, 5.0])
+    parser.add_argument("--sr", type=int, default=44100, help="Source sample rate (resampled to 16 kHz).")
+    parser.add_argument("--block-size", type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'mode':>10} {'peak MB':>10} {'audio s/s':>10}")
+    for minutes in args.minutes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "long.wav"
+            write_long_wav(path, minutes, args.sr)
+            runs = {
+                "whole": lambda: compute_features(*reversed(load_audio_mono(path))),
+                "streaming": lambda: compute_features_streaming(iter_audio_blocks(path, 16000, args.block_size), 16000),
+            }
+            for mode, fn in runs.items():
+                _, elapsed, peak_mb = _measure(fn)
+                print(f"{minutes:>8.1f} {mode:>10} {peak_mb:>10.1f} {minutes * 60 / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark suite for the hot paths: load_audio_mono, compute_features,
+Predictor.predict_from_file and a TestClient round trip to /upload, plus cold-start
+import and time-to-first-prediction (startup/*, from benchmark_startup).
+
+Clips are generated deterministically with generate_synthetic_data.synth_wave at each
+--rates x --durations. Every case reports latency percentiles, throughput (calls/sec and
+seconds of audio per second) and peak traced memory; results go to --output as JSON.
+
+--compare BASELINE flags cases whose p50 latency or peak memory grew by more than
+--threshold and exits 1 if any did, so a saved baseline can gate a change in review:
+
+    python -m scripts.benchmark_suite --output benchmarks/baseline.json         # on main
+    python -m scripts.benchmark_suite --compare benchmarks/baseline.json        # on a branch
+
+Run from core/.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+from scipy.io import wavfile
+
+from scripts.benchmark_startup import as_suite_results
+from scripts.generate_synthetic_data import synth_wave
+
+DEFAULT_RATES = [8000, 16000, 44100, 48000]
+DEFAULT_DURATIONS = [0.5, 2.0, 10.0]
+
+
+def write_clip(directory: Path, sr: int, duration: float) -> Path:
+    path = directory / f"synth_{sr}_{duration:g}s.wav"
+    # int16, like most field recordings.
+    wavfile.write(path, sr, (synth_wave(440.0, sr, duration) * 32767).astype(np.int16))
+    return path
+
+
+def measure(fn: Callable[[], object], audio_seconds: float, min_time: float, max_iterations: int) -> Dict[str, float]:
+    for _ in range(2):
+        fn()  # warm caches (filter design, FFT plans, imports)
+    latencies: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < 5 or (time.perf_counter() < deadline and len(latencies) < max_iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    # Tracing slows everything down, so peak memory comes from a separate call.
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = np.asarray(latencies) * 1000.0
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    mean_s = float(np.mean(latencies))
+    return {
+        "iterations": len(latencies),
+        "mean_ms": float(np.mean(ms)),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "calls_per_sec": 1.0 / mean_s,
+        "audio_x_realtime": audio_seconds / mean_s,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def run_suite(rates: List[int], durations: List[float], only: str, min_time: float, max_iterations: int) -> Dict[str, Dict]:
+    # Repeated uploads must not be served from the result cache.
+    os.environ["RESULT_CACHE_SIZE"] = "0"
+    from fastapi.testclient import TestClient
+
+    from app.fastapi_app import app
+    from src.features.audio_embeddings import compute_features
+    from src.inference.predictor import Predictor
+    from src.preprocess.audio_preprocess import load_audio_mono
+
+    predictor = Predictor()
+    results: Dict[str, Dict] = {}
+
+    def case(name: str, fn: Callable[[], object], audio_seconds: float):
+        if only and only not in name:
+            return
+        results[name] = measure(fn, audio_seconds, min_time, max_iterations)
+        r = results[name]
+        print(
+            f"{name:<40} {r['p50_ms']:>9.3f} {r['p90_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+            f"{r['calls_per_sec']:>10.1f} {r['audio_x_realtime']:>9.0f} {r['peak_mb']:>8.2f}",
+            flush=True,
+        )
+
+    print(f"{'case':<40} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'calls/s':>10} {'x rt':>9} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp, TestClient(app) as client:
+        for duration in durations:
+            for sr in rates:
+                path = write_clip(Path(tmp), sr, duration)
+                case(f"load_audio_mono/{sr}Hz/{duration:g}s", lambda: load_audio_mono(path), duration)
+                case(f"predict_from_file/{sr}Hz/{duration:g}s", lambda: predictor.predict_from_file(path), duration)
+
+            _, audio = load_audio_mono(write_clip(Path(tmp), 16000, duration))
+            case(f"compute_features/{duration:g}s", lambda: compute_features(audio, 16000), duration)
+
+            payload = write_clip(Path(tmp), 16000, duration).read_bytes()
+
+            def upload():
+                response = client.post("/upload", files={"file": ("clip.wav", payload, "audio/wav")})
+                response.raise_for_status()
+
+            case(f"upload/16000Hz/{duration:g}s", upload, duration)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float, min_delta_ms: float) -> List[str]:
+    """Names of cases whose p50 or peak memory regressed beyond `threshold` (relative)."""
+    regressions = []
+    print(f"\n{'case':<40} {'p50 base':>9} {'p50 now':>9} {'change':>8} {'mem base':>9} {'mem now':>9}  status")
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>9} {now['p50_ms']:>9.3f} {'-':>8} {'-':>9} {now['peak_mb']:>9.2f}  new")
+            continue
+        change = now["p50_ms"] / base["p50_ms"] - 1.0
+        slower = change > threshold and now["p50_ms"] - base["p50_ms"] > min_delta_ms
+        bigger = now["peak_mb"] > base["peak_mb"] * (1.0 + threshold) + 0.1
+        status = "REGRESSION" if slower or bigger else ("faster" if change < -threshold else "ok")
+        if slower or bigger:
+            regressions.append(name)
+        print(
+            f"{name:<40} {base['p50_ms']:>9.3f} {now['p50_ms']:>9.3f} {change:>+8.1%} "
+            f"{base['peak_mb']:>9.2f} {now['peak_mb']:>9.2f}  {status}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=int, nargs="+", default=DEFAULT_RATES)
+    parser.add_argument("--durations", type=float, nargs="+", default=DEFAULT_DURATIONS)
+    parser.add_argument("--only", default="", help="Run only cases whose name contains this.")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to spend timing each case.")
+    parser.add_argument("--max-iterations", type=int, default=1000)
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh interpreters per startup case; 0 skips them.")
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/latest.json"))
+    parser.add_argument("--compare", type=Path, help="Baseline JSON from an earlier run.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown/growth counted as a regression.")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore slowdowns smaller than this.")
+    args = parser.parse_args()
+
+    results = run_suite(args.rates, args.durations, args.only, args.min_time, args.max_iterations)
+    if args.startup_runs:
+        startup = as_suite_results(args.startup_runs, args.only)
+        for name, r in startup.items():
+            print(f"{name:<40} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {'':>10} {'':>9} {r['peak_mb']:>8.1f}")
+        results.update(startup)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            # ru_maxrss is KiB on Linux, bytes on macOS.
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3),
+        },
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {args.output} (process peak RSS {report['meta']['max_rss_mb']:.0f} MB)")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline["meta"].get("platform") != report["meta"]["platform"]:
+            print(f"Note: baseline is from {baseline['meta'].get('platform')}; timings may not be comparable.")
+        regressions = compare(results, baseline["results"], args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Write an ensemble manifest over existing checkpoints. Point CHECKPOINT_PATH (or
+Predictor) at the manifest to serve the ensemble.
+
+Stacking fusion is fit on a labelled directory (labels.csv + clips), which should be
+held out from the members' training data.
+
+Run from core/:
+    python -m scripts.build_ensemble models/checkpoints/a.json models/checkpoints/b.ckpt \\
+        --fusion stacking --data-dir data/holdout --output models/checkpoints/ensemble.json
+"""
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.models.checkpoint import load_checkpoint
+from src.models.ensemble import build_ensemble, save_manifest
+from src.models.fusion_model import FUSION_METHODS, RuleBasedFusionModel, fit_stacking
+from src.train.train import extract_features, load_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("members", type=Path, nargs="+")
+    parser.add_argument("--output", type=Path, default=Path("models/checkpoints/ensemble.json"))
+    parser.add_argument("--fusion", choices=FUSION_METHODS, default="mean")
+    parser.add_argument("--weights", type=float, nargs="+", help="Per-member weights for weighted / log_mean.")
+    parser.add_argument("--data-dir", type=Path, help="Labelled clips for fitting stacking fusion.")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args()
+
+    checkpoints = [load_checkpoint(path) for path in args.members]
+    if args.fusion == "stacking":
+        if args.data_dir is None:
+            parser.error("--fusion stacking needs --data-dir")
+        ensemble = build_ensemble(checkpoints, RuleBasedFusionModel(len(checkpoints)))
+        samples = load_dataset(args.data_dir)
+        paths = [path for path, _ in samples]
+        vectors = {
+            config: extract_features(paths, args.sample_rate, config=config)[0] for config in ensemble.feature_configs
+        }
+        targets = np.array([ensemble.labels.index(label) for _, label in samples])
+        fusion = fit_stacking(ensemble.member_log_probs(vectors), targets, epochs=200, learning_rate=0.5)
+        print(f"Fit stacking on {len(samples)} clips from {args.data_dir}")
+    else:
+        fusion = RuleBasedFusionModel(len(checkpoints), args.fusion, weights=args.weights)
+
+    members = [os.path.relpath(path.resolve(), args.output.resolve().parent) for path in args.members]
+    save_manifest(args.output, members, fusion)
+    print(f"Wrote {args.fusion} ensemble of {len(members)} members to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
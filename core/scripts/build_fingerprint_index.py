@@ -0,0 +1,55 @@
+"""
+Build or refresh the contribution fingerprint index from a local checkout of the
+dataset's pending/ folder.
+
+Only clips that are new or changed since the last run (by size and mtime) are
+fingerprinted, on a process pool; clips that disappeared are dropped. The index's log
+is then compacted into a fresh memory-mapped generation.
+
+Run from core/:
+    python -m scripts.build_fingerprint_index ../cheetahsense-dataset/pending
+    python -m scripts.build_fingerprint_index ../cheetahsense-dataset/pending --index-dir data/fingerprints --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.features.fingerprint import fingerprint_file
+from src.utils.fingerprint_index import FingerprintIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pending_dir", type=Path, help="Local copy of the dataset's pending/ folder.")
+    parser.add_argument("--index-dir", type=Path, default=Path(os.getenv("FINGERPRINT_INDEX_DIR", "data/fingerprints")))
+    parser.add_argument("--prefix", default="pending/", help="Prepended to each clip's relative path (its name in the repo).")
+    parser.add_argument("--workers", type=int, default=0, help="Fingerprinting processes; 0 = one per CPU, 1 = in this process.")
+    parser.add_argument("--no-compact", action="store_true", help="Leave the changes in the index's log.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = FingerprintIndex(args.index_dir)
+    workers = args.workers or os.cpu_count() or 1
+    if workers == 1:
+        counts = index.sync(args.pending_dir, fingerprint_file, prefix=args.prefix)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = index.sync(args.pending_dir, fingerprint_file, prefix=args.prefix, map_fn=lambda *its: executor.map(*its, chunksize=16))
+    synced = time.perf_counter() - start
+    if not args.no_compact:
+        index.compact()
+    stats = index.stats()
+    index.close()
+    fingerprinted = counts["added"] + counts["updated"]
+    print(
+        f"{counts['added']} added, {counts['updated']} updated, {counts['removed']} removed, "
+        f"{counts['unchanged']} unchanged, {counts['failed']} unreadable; "
+        f"index holds {stats['clips']} clips / {stats['hashes']} hashes ({stats['generation']})"
+    )
+    print(f"sync {synced:.1f}s ({fingerprinted / synced if synced else 0:.0f} clips/sec), total {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Score an archive of WAVs offline on a process pool, one Predictor per worker.
+
+SOURCE is a directory (searched recursively for --pattern), a glob, or a manifest CSV
+in the `filename,label` format the trainer reads (true labels are then written next to
+the predictions and accuracy is reported).
+
+Results are appended as shards finish. --format csv / jsonl writes one line per file;
+npz / parquet (needs pyarrow) writes columnar part files into a directory named by
+--output. Rerunning the same command resumes: files already in the output are skipped,
+and a line torn by an interruption is discarded and rescored.
+
+Run from core/:
+    python -m scripts.bulk_score data/archive --output scores.csv
+    python -m scripts.bulk_score "recordings/**/*.wav" --output scores.jsonl --workers 8
+    python -m scripts.bulk_score data/synth/labels.csv --output scores.npz
+"""
+import argparse
+import csv
+import glob
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.inference import pool
+from src.inference.predictor import Predictor, resolve_checkpoint_path
+from src.train.train import load_manifest
+
+FORMATS = ("csv", "jsonl", "npz", "parquet")
+
+
+def collect_inputs(source: str, pattern: str = "*.wav") -> List[Tuple[str, Optional[str]]]:
+    """(path, true label or None) for every clip named by `source`, sorted by path."""
+    path = Path(source)
+    if path.is_dir():
+        items = [(str(p), None) for p in path.rglob(pattern)]
+    elif path.suffix.lower() == ".csv" and path.is_file():
+        items = [(str(p), label) for p, label in load_manifest(path)]
+    else:
+        items = [(p, None) for p in glob.glob(source, recursive=True)]
+    return sorted(items)
+
+
+def _score_shard(paths: List[str]) -> List[Dict]:
+    # Runs in a worker: one vectorized batch, falling back to per-file on a bad clip.
+    try:
+        results = pool.call_worker("predict_batch", paths)
+        return [_row(path, result) for path, result in zip(paths, results)]
+    except Exception:  # noqa: BLE001
+        pass
+    rows = []
+    for path in paths:
+        try:
+            rows.append(_row(path, pool.call_worker("predict_batch", [path])[0]))
+        except Exception as exc:  # noqa: BLE001
+            rows.append({"path": path, "label": None, "confidence": None, "probs": None, "error": " ".join(f"{type(exc).__name__}: {exc}".split())})
+    return rows
+
+
+def _row(path: str, result: Dict) -> Dict:
+    return {"path": path, "label": result["label"], "confidence": result["confidence"], "probs": result["probs"], "error": None}
+
+
+class LineWriter:
+    """CSV or JSONL, appended and flushed per shard."""
+
+    def __init__(self, path: Path, fmt: str, labels: List[str]):
+        self.path = path
+        self.fmt = fmt
+        self.labels = labels
+        self.columns = ["path", "true_label", "label", "confidence"] + [f"prob_{label}" for label in labels] + ["error"]
+        self._file = None
+
+    def done(self) -> Set[str]:
+        if not self.path.exists():
+            return set()
+        data = self.path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            # Interrupted mid-line: drop the partial row, it will be rescored.
+            data = data[: data.rfind(b"\n") + 1]
+            with self.path.open("r+b") as f:
+                f.truncate(len(data))
+        text = data.decode("utf-8")
+        if self.fmt == "jsonl":
+            return {json.loads(line)["path"] for line in text.splitlines() if line}
+        reader = csv.DictReader(io.StringIO(text))
+        if reader.fieldnames and reader.fieldnames != self.columns:
+            raise SystemExit(f"{self.path} has columns {reader.fieldnames}; this checkpoint writes {self.columns}.")
+        return {row["path"] for row in reader}
+
+    def write(self, rows: List[Dict]) -> None:
+        if self._file is None:
+            new = not self.path.exists() or self.path.stat().st_size == 0
+            self._file = self.path.open("a", encoding="utf-8", newline="")
+            if new and self.fmt == "csv":
+                csv.writer(self._file).writerow(self.columns)
+        if self.fmt == "jsonl":
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        else:
+            writer = csv.writer(self._file)
+            for row in rows:
+                probs = row["probs"] or {}
+                writer.writerow(
+                    [row["path"], row.get("true_label") or "", row["label"] or "", "" if row["confidence"] is None else row["confidence"]]
+                    + [probs.get(label, "") for label in self.labels]
+                    + [row["error"] or ""]
+                )
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class PartWriter:
+    """
+    Columnar output: a directory of part files, each written atomically once
+    `part_rows` results have accumulated. Unflushed rows are simply rescored on resume.
+    """
+
+    def __init__(self, root: Path, fmt: str, labels: List[str], part_rows: int = 10000):
+        self.root = root
+        self.fmt = fmt
+        self.labels = labels
+        self.part_rows = part_rows
+        self._rows: List[Dict] = []
+        if fmt == "parquet":
+            if importlib.util.find_spec("pyarrow") is None:
+                raise SystemExit("--format parquet needs pyarrow (pip install pyarrow); npz needs nothing extra.")
+        root.mkdir(parents=True, exist_ok=True)
+
+    def _parts(self) -> List[Path]:
+        return sorted(self.root.glob(f"part-*.{self.fmt}"))
+
+    def done(self) -> Set[str]:
+        paths: Set[str] = set()
+        for part in self._parts():
+            if self.fmt == "npz":
+                with np.load(part) as data:
+                    paths.update(data["path"].tolist())
+            else:
+                import pyarrow.parquet as pq
+
+                paths.update(pq.read_table(part, columns=["path"]).column("path").to_pylist())
+        return paths
+
+    def write(self, rows: List[Dict]) -> None:
+        self._rows.extend(rows)
+        if len(self._rows) >= self.part_rows:
+            self._flush()
+
+    def _columns(self, rows: List[Dict]) -> Dict[str, np.ndarray]:
+        probs = np.array(
+            [[(row["probs"] or {}).get(label, np.nan) for label in self.labels] for row in rows], dtype=np.float32
+        ).reshape(len(rows), len(self.labels))
+        columns = {
+            "path": np.array([row["path"] for row in rows]),
+            "true_label": np.array([row.get("true_label") or "" for row in rows]),
+            "label": np.array([row["label"] or "" for row in rows]),
+            "confidence": np.array([np.nan if row["confidence"] is None else row["confidence"] for row in rows], dtype=np.float32),
+            "error": np.array([row["error"] or "" for row in rows]),
+        }
+        columns.update({f"prob_{label}": probs[:, i] for i, label in enumerate(self.labels)})
+        return columns
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        parts = self._parts()
+        index = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+        final = self.root / f"part-{index:05d}.{self.fmt}"
+        tmp = final.with_name(final.name + ".tmp")
+        columns = self._columns(self._rows)
+        if self.fmt == "npz":
+            with tmp.open("wb") as f:
+                np.savez(f, **columns)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table({name: column.tolist() if column.dtype.kind == "U" else column for name, column in columns.items()}), tmp)
+        os.replace(tmp, final)
+        self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+
+
+def _progress(done: int, total: int, start: float, final: bool = False) -> None:
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else float("inf")
+    eta_text = f", eta {eta:.0f}s" if not final and rate > 0 else ""
+    print(f"{done}/{total} files, {rate:.1f} files/sec{eta_text}", file=sys.stderr, flush=True)
+
+
+def _shards(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory, glob, or manifest CSV (filename,label).")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the --output suffix.")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Checkpoint or ensemble manifest to score with.")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes; 0 = one per CPU, 1 = in this process.")
+    parser.add_argument("--shard-size", type=int, default=64, help="Files per task; each is scored as one batch.")
+    parser.add_argument("--pattern", default="*.wav", help="File pattern when SOURCE is a directory.")
+    parser.add_argument("--part-rows", type=int, default=10000, help="Rows per npz/parquet part file.")
+    parser.add_argument("--progress-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    fmt = args.format or args.output.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"Can't infer a format from {args.output}; pass --format {{{','.join(FORMATS)}}}.")
+    checkpoint = args.checkpoint or resolve_checkpoint_path()
+    labels = Predictor(checkpoint).labels
+
+    items = collect_inputs(args.source, args.pattern)
+    true_labels = {path: label for path, label in items if label is not None}
+    writer = LineWriter(args.output, fmt, labels) if fmt in ("csv", "jsonl") else PartWriter(args.output, fmt, labels, args.part_rows)
+    done = writer.done()
+    todo = [path for path, _ in items if path not in done]
+    print(f"{len(items)} files, {len(items) - len(todo)} already scored, {len(todo)} to go", file=sys.stderr)
+
+    workers = args.workers or os.cpu_count() or 1
+    scored = errors = correct = labelled = 0
+    start = last_report = time.perf_counter()
+
+    def handle(rows: List[Dict]):
+        nonlocal scored, errors, correct, labelled, last_report
+        for row in rows:
+            row["true_label"] = true_labels.get(row["path"])
+            errors += row["error"] is not None
+            if row["true_label"] is not None and row["error"] is None:
+                labelled += 1
+                correct += row["label"] == row["true_label"]
+        writer.write(rows)
+        scored += len(rows)
+        if time.perf_counter() - last_report >= args.progress_interval:
+            last_report = time.perf_counter()
+            _progress(scored, len(todo), start)
+
+    try:
+        if workers == 1:
+            pool.init_worker(checkpoint)
+            for shard in _shards(todo, args.shard_size):
+                handle(_score_shard(shard))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=pool.init_worker, initargs=(checkpoint,)) as executor:
+                # Keep a bounded number of shards in flight so memory doesn't grow with the archive.
+                shards = _shards(todo, args.shard_size)
+                pending = set()
+                for shard in shards:
+                    pending.add(executor.submit(_score_shard, shard))
+                    if len(pending) >= workers * 2:
+                        break
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        handle(future.result())
+                        shard = next(shards, None)
+                        if shard is not None:
+                            pending.add(executor.submit(_score_shard, shard))
+    finally:
+        writer.close()
+
+    _progress(scored, len(todo), start, final=True)
+    summary = f"Wrote {scored} results to {args.output} ({errors} errors)"
+    if labelled:
+        summary += f"; accuracy {correct / labelled:.3f} on the {labelled} labelled files scored this run"
+    print(summary, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Upload a directory (or glob) of clips to a running API's /upload with the client SDK,
+--concurrency at a time, and write one JSON line per clip as results come back.
+
+Each SOURCE is a directory (searched recursively for audio files) or a glob. Files are
+streamed from disk; 5xx / 429 responses and dropped connections are retried with
+backoff (--retries). Lines hold the path, the predicted label and confidence, the
+contribution status, attempts and seconds, or the error. Rerunning with the same
+--output skips clips already uploaded successfully. Progress and clips/sec go to
+stderr.
+
+Run from core/:
+    python -m scripts.bulk_upload data/archive --output uploads.jsonl
+    python -m scripts.bulk_upload "recordings/**/*.wav" --url http://api:8000 --concurrency 32 --contribute --contributor field-team
+"""
+import argparse
+import glob
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Set
+
+from src.client.api import CheetahSenseClient, UploadResult, iter_audio_files
+
+
+def collect_paths(sources: List[str]) -> Iterator[Path]:
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            yield from iter_audio_files(path)
+        else:
+            yield from (Path(p) for p in sorted(glob.glob(source, recursive=True)))
+
+
+def _done(output: Path) -> Set[str]:
+    done = set()
+    if output.exists():
+        with output.open() as handle:
+            for line in handle:
+                try:
+                    row = json.loads(line)
+                except ValueError:  # a line torn by an interruption
+                    continue
+                if row.get("error") is None:
+                    done.add(row["path"])
+    return done
+
+
+def _row(result: UploadResult) -> dict:
+    response = result.response or {}
+    return {
+        "path": str(result.source),
+        "label": response.get("label"),
+        "confidence": response.get("confidence"),
+        "contribution": (response.get("contribution") or {}).get("status"),
+        "attempts": result.attempts,
+        "seconds": round(result.seconds, 4),
+        "error": None if result.ok else " ".join(f"{type(result.error).__name__}: {result.error}".split()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL.")
+    parser.add_argument("--output", type=Path, default=Path("uploads.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--contribute", action="store_true")
+    parser.add_argument("--contributor")
+    parser.add_argument("--label", help="Label to attach to contributed clips.")
+    parser.add_argument("--notes")
+    args = parser.parse_args()
+
+    done = _done(args.output)
+    paths = [p for p in collect_paths(args.sources) if str(p) not in done]
+    if done:
+        print(f"skipping {len(done)} clips already in {args.output}", file=sys.stderr)
+    if not paths:
+        return
+
+    ok = failed = 0
+    start = time.perf_counter()
+    with CheetahSenseClient(args.url, timeout=args.timeout, retries=args.retries) as client, args.output.open("a") as out:
+        if not client.wait_ready(timeout=args.timeout):
+            sys.exit(f"{args.url} is not ready")
+        results = client.upload_many(
+            paths,
+            concurrency=args.concurrency,
+            contribute=args.contribute,
+            contributor=args.contributor,
+            label=args.label,
+            notes=args.notes,
+        )
+        for n, result in enumerate(results, 1):
+            out.write(json.dumps(_row(result)) + "\n")
+            out.flush()
+            ok += result.ok
+            failed += not result.ok
+            if n % 100 == 0 or n == len(paths):
+                elapsed = time.perf_counter() - start
+                print(f"{n}/{len(paths)} uploaded, {failed} failed, {ok / elapsed:.1f} clips/sec", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,38 @@
+"""
+Synthetic labelled corpus for training, caching and bulk-scoring runs.
+
+Each label is a base frequency; clips are tones at that frequency (optionally detuned,
+chirped and given harmonics) plus Gaussian noise. Every clip's parameters are drawn up
+front from --seed. Audio is synthesized a batch at a time as one (clips x samples) array
+and batches are written by a process pool. The result is the same for any --workers.
+
+Writes <output-dir>/<label>/<label>_NNNNNN.wav, the `filename,label` labels.csv that
+train.load_dataset reads, and manifest.json (settings, seed, sizes, labels.csv hash).
+--manifest replays a previous run's settings.
+
+    python scripts/generate_synthetic_data.py                         # 3 short clips
+    python scripts/generate_synthetic_data.py --per-label 33334 --output-dir data/synth_100k \\
+        --duration 0.5 2 --sample-rates 16000 44100 48000 --channels 1 2 \\
+        --dtypes int16 float32 --harmonics 3 --chirp 0.2 --noise 0.005 0.1
+"""
+import argparse
 import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 import numpy as np
 from scipy.io import wavfile
 
 OUTPUT_DIR = Path("data/synth")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+DEFAULT_LABELS = ["resting:220", "hunting:880", "distress:440"]
+DTYPES = ("float32", "int16", "int32", "uint8")
+MANIFEST_VERSION = 1
 
 
 def synth_wave(freq: float, sr: int, duration: float) -> np.ndarray:
@@ -15,27 +42,193 @@ def synth_wave(freq: float, sr: int, duration: float) -> np.ndarray:
     return (wave + noise).astype(np.float32)
 
 
-def main():
-    sr = 16000
-    duration = 0.6
-    clips = {
-        "resting": 220.0,
-        "hunting": 880.0,
-        "distress": 440.0,
+def parse_label(spec: str) -> Tuple[str, float, int]:
+    # NAME:FREQ or NAME:FREQ:COUNT (COUNT overrides --per-label); -1 = use --per-label.
+    parts = spec.split(":")
+    if len(parts) not in (2, 3) or not parts[0]:
+        raise argparse.ArgumentTypeError(f"Expected NAME:FREQ[:COUNT], got {spec!r}.")
+    return parts[0], float(parts[1]), int(parts[2]) if len(parts) == 3 else -1
+
+
+def plan_clips(args) -> Dict[str, np.ndarray]:
+    """
+    Per-clip parameters for the whole corpus, as arrays indexed by clip.
+    """
+    rng = np.random.default_rng(args.seed)
+    labels = [parse_label(spec) for spec in args.labels]
+    counts = [count if count >= 0 else args.per_label for _, _, count in labels]
+    label_index = np.repeat(np.arange(len(labels)), counts)
+    clip_number = np.concatenate([np.arange(count) for count in counts]) if counts else np.zeros(0, int)
+    n = len(label_index)
+    base = np.array([freq for _, freq, _ in labels], dtype=np.float64)[label_index]
+    return {
+        "label_index": label_index,
+        "clip_number": clip_number,
+        "freq": base * (1.0 + args.freq_jitter * rng.uniform(-1.0, 1.0, n)),
+        "duration": rng.uniform(args.duration[0], args.duration[-1], n),
+        "sample_rate": rng.choice(args.sample_rates, n),
+        "channels": rng.choice(args.channels, n),
+        "dtype": rng.choice(len(args.dtypes), n),
+        "chirp": args.chirp * rng.uniform(-1.0, 1.0, n),
+        "noise": rng.uniform(args.noise[0], args.noise[-1], n),
+        "amplitude": rng.uniform(args.amplitude[0], args.amplitude[-1], n),
     }
-    labels_path = OUTPUT_DIR / "labels.csv"
+
+
+def synth_batch(params: Dict[str, np.ndarray], harmonics: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (clips, max_len) float32 waveforms in [-1, 1] and each clip's length in samples.
+    Rows are zero past their length.
+    """
+    lengths = clip_lengths(params)
+    t = np.arange(lengths.max(), dtype=np.float64)[None, :] / params["sample_rate"].astype(np.float64)[:, None]
+    f0 = params["freq"][:, None]
+    # Linear chirp: the frequency moves by chirp * f0 over the clip. Phase is accumulated
+    # in cycles in float64 and wrapped before the float32 sin.
+    sweep = f0 * params["chirp"][:, None] / params["duration"][:, None]
+    cycles = t * (f0 + 0.5 * sweep * t)
+    cycles -= np.floor(cycles)
+    phase = (2 * np.pi * cycles).astype(np.float32)
+    wave = np.sin(phase)
+    if harmonics:
+        # sin(kx) = 2cos(x) sin((k-1)x) - sin((k-2)x): overtones without another sin per sample.
+        two_cos = 2 * np.cos(phase)
+        prev, cur = np.zeros_like(wave), wave.copy()
+        for h in range(2, harmonics + 2):
+            prev, cur = cur, two_cos * cur - prev
+            wave += cur / np.float32(h)
+    gain = params["amplitude"] / sum(1.0 / h for h in range(1, harmonics + 2))
+    wave *= gain[:, None].astype(np.float32)
+    wave += rng.standard_normal(wave.shape, dtype=np.float32) * params["noise"][:, None].astype(np.float32)
+    np.clip(wave, -1.0, 1.0, out=wave)
+    wave[np.arange(wave.shape[1])[None, :] >= lengths[:, None]] = 0.0
+    return wave, lengths
+
+
+def clip_lengths(params: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.maximum(np.round(params["duration"] * params["sample_rate"]).astype(np.int64), 1)
+
+
+def to_pcm(wave: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "float32":
+        return wave
+    if dtype == "uint8":
+        return (wave * 127.0 + 128.0).astype(np.uint8)
+    scale = np.iinfo(dtype).max
+    return (wave.astype(np.float64) * scale).astype(dtype)
+
+
+def _write_batch(output_dir: str, batch: int, seed: int, params: Dict[str, np.ndarray], filenames: List[str], harmonics: int, dtypes: List[str]) -> Tuple[int, float]:
+    # Noise comes from (seed, batch), so a batch's audio doesn't depend on which worker writes it.
+    wave, lengths = synth_batch(params, harmonics, np.random.default_rng([seed, batch]))
+    written = 0
+    for i, filename in enumerate(filenames):
+        clip = wave[i, : lengths[i]]
+        channels = int(params["channels"][i])
+        if channels > 1:
+            # Same signal per channel at slightly different gains, so a downmix isn't a no-op.
+            clip = clip[:, None] * np.linspace(1.0, 0.7, channels, dtype=np.float32)[None, :]
+        path = Path(output_dir) / filename
+        wavfile.write(path, int(params["sample_rate"][i]), to_pcm(clip, dtypes[int(params["dtype"][i])]))
+        written += path.stat().st_size
+    return written, float(np.sum(lengths / params["sample_rate"]))
+
+
+def _settings(args) -> Dict:
+    return {key: value for key, value in vars(args).items() if key not in ("output_dir", "manifest", "workers")}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--labels", nargs="+", default=DEFAULT_LABELS, help="NAME:FREQ[:COUNT] per label.")
+    parser.add_argument("--per-label", type=int, default=1, help="Clips per label without an explicit COUNT.")
+    parser.add_argument("--duration", type=float, nargs="+", default=[0.6], help="Seconds, or MIN MAX to draw from.")
+    parser.add_argument("--sample-rates", type=int, nargs="+", default=[16000])
+    parser.add_argument("--channels", type=int, nargs="+", default=[1])
+    parser.add_argument("--dtypes", nargs="+", choices=DTYPES, default=["float32"], help="PCM sample formats to draw from.")
+    parser.add_argument("--harmonics", type=int, default=0, help="Overtones at 1/k amplitude above the base tone.")
+    parser.add_argument("--chirp", type=float, default=0.0, help="Max frequency sweep over a clip, as a fraction of its base.")
+    parser.add_argument("--freq-jitter", type=float, default=0.0, help="Max per-clip detune, as a fraction of the base.")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.02], help="Noise std, or MIN MAX.")
+    parser.add_argument("--amplitude", type=float, nargs="+", default=[0.5], help="Peak tone amplitude, or MIN MAX.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=256, help="Clips synthesized per array op (and per pool task).")
+    parser.add_argument("--workers", type=int, default=0, help="Writer processes; 0 = one per CPU, 1 = in this process.")
+    parser.add_argument("--manifest", type=Path, help="Replay the settings of an earlier run's manifest.json.")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.manifest:
+        # Settings from the manifest; anything given on the command line still wins.
+        parser.set_defaults(**json.loads(args.manifest.read_text())["settings"])
+        args = parser.parse_args()
+        expected = json.loads(args.manifest.read_text())["labels_sha256"]
+
+    start = time.perf_counter()
+    params = plan_clips(args)
+    names = [parse_label(spec)[0] for spec in args.labels]
+    filenames = [f"{names[label]}/{names[label]}_{number:06d}.wav" for label, number in zip(params["label_index"], params["clip_number"])]
+    for name in names:
+        (args.output_dir / name).mkdir(parents=True, exist_ok=True)
+
+    n = len(filenames)
+    # Batch clips of similar length together so little of each (clips x samples) array is padding.
+    order = np.argsort(clip_lengths(params), kind="stable")
+    tasks = []
+    for b, lo in enumerate(range(0, n, args.batch_size)):
+        index = order[lo : lo + args.batch_size]
+        batch_params = {key: value[index] for key, value in params.items()}
+        tasks.append((str(args.output_dir), b, args.seed, batch_params, [filenames[i] for i in index], args.harmonics, args.dtypes))
+    workers = args.workers or os.cpu_count() or 1
+    total_bytes, total_seconds, done = 0, 0.0, 0
+    last_report = time.perf_counter()
+
+    def record(result: Tuple[int, float], count: int):
+        nonlocal total_bytes, total_seconds, done, last_report
+        total_bytes += result[0]
+        total_seconds += result[1]
+        done += count
+        if time.perf_counter() - last_report >= 5.0:
+            last_report = time.perf_counter()
+            print(f"{done}/{n} clips, {done / (last_report - start):.0f} clips/sec", file=sys.stderr, flush=True)
+
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            record(_write_batch(*task), len(task[4]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_write_batch, *task) for task in tasks]
+            for task, future in zip(tasks, futures):
+                record(future.result(), len(task[4]))
+
+    labels_path = args.output_dir / "labels.csv"
     with labels_path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["filename", "label"],
-        )
-        writer.writeheader()
-        for label, freq in clips.items():
-            filename = f"{label}_0.wav"
-            wave = synth_wave(freq, sr, duration)
-            wavfile.write(OUTPUT_DIR / filename, sr, wave)
-            writer.writerow({"filename": filename, "label": label})
-    print(f"Wrote synthetic data to {OUTPUT_DIR}")
+        writer = csv.writer(f)
+        writer.writerow(["filename", "label"])
+        writer.writerows((filename, names[label]) for filename, label in zip(filenames, params["label_index"]))
+    digest = hashlib.sha256(labels_path.read_bytes()).hexdigest()
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "settings": _settings(args),
+        "clips": n,
+        "per_label": {name: int(np.sum(params["label_index"] == i)) for i, name in enumerate(names)},
+        "audio_seconds": total_seconds,
+        "bytes": total_bytes,
+        "labels_sha256": digest,
+    }
+    (args.output_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Wrote {n} clips ({total_seconds / 3600:.2f} h of audio, {total_bytes / 1e6:.1f} MB) to {args.output_dir} "
+        f"in {elapsed:.1f}s ({n / elapsed:.0f} clips/sec)"
+    )
+    if args.manifest and digest != expected:
+        print(f"Warning: labels.csv differs from {args.manifest}; the settings or generator version changed.", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,222 @@
+"""
+Concurrent load test for the FastAPI service.
+
+Each --config is a comma-separated list of KEY=VALUE env overrides. For every config
+a fresh uvicorn server is spawned (the pre-fork server, app/serve.py, when the config
+sets SERVER_WORKERS), driven with concurrent requests to --endpoint (/upload goes
+through the client SDK, src/client; other endpoints such as /upload/batch are posted
+directly), and end-to-end clips/sec plus latency percentiles are reported at each
+--concurrency, with the server's memory afterwards: mean RSS per serving process and
+total PSS (which splits shared pages between the processes sharing them) over the
+whole process tree. Spawned servers run
+with RESULT_CACHE_SIZE=0 (every request here sends the same clip) unless a config sets
+it. With --url, an already running server is driven instead.
+
+Run from core/:
+    python -m scripts.load_test --config INFERENCE_POOL=inline --config INFERENCE_POOL=thread,INFERENCE_WORKERS=4
+    python -m scripts.load_test --config UPLOAD_BATCH_MAX_SIZE=1 --config UPLOAD_BATCH_MAX_SIZE=16 --concurrency 1 4 16 64
+    python -m scripts.load_test --config "" --config SERVER_WORKERS=4 --config SERVER_WORKERS=16 --concurrency 16 64
+"""
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import requests
+from scipy.io import wavfile
+
+from src.client.api import CheetahSenseClient
+
+
+def make_payload(sr: int = 16000, duration: float = 2.0) -> bytes:
+    t = np.linspace(0, duration, int(sr * duration), endpoint=False)
+    wave = 0.5 * np.sin(2 * np.pi * 440.0 * t) + 0.02 * np.random.default_rng(0).normal(size=t.shape)
+    buf = io.BytesIO()
+    wavfile.write(buf, sr, wave.astype(np.float32))
+    return buf.getvalue()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_config(text: str) -> Dict[str, str]:
+    env = {}
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        env[key.strip()] = value.strip()
+    return env
+
+
+@contextmanager
+def spawn_server(env_overrides: Dict[str, str], args: Optional[List[str]] = None) -> Iterator[str]:
+    port = _free_port()
+    env = {**os.environ, "RESULT_CACHE_SIZE": "0", **env_overrides}
+    workers = int(env_overrides.get("SERVER_WORKERS") or 0)
+    if workers:
+        cmd = [sys.executable, "-m", "app.serve", "--port", str(port), "--host", "127.0.0.1"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.fastapi_app:app", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd + (args or []), env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30 + workers
+        pids = set()
+        # Pre-forked workers share the socket; wait until every one has answered.
+        while time.time() < deadline and len(pids) < max(workers, 1):
+            try:
+                resp = requests.get(f"{base}/health", timeout=1)
+                if resp.ok and resp.json().get("ready", True):
+                    pids.add(resp.json().get("pid"))
+            except requests.RequestException:  # refused, or accepted but still preloading
+                time.sleep(0.1)
+        if len(pids) < max(workers, 1):
+            raise RuntimeError(f"Server did not become ready in {30 + workers}s.")
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _proc_kb(pid: int, name: str, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/{name}") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+    except (OSError, StopIteration):
+        return 0
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def server_memory(base: str) -> Dict[str, float]:
+    """
+    Mean RSS of the serving processes and total PSS of the server's process tree, in MB
+    (Linux only; zeros elsewhere).
+    """
+    pid = requests.get(f"{base}/health", timeout=5).json().get("pid")
+    # Walk up from the answering worker to the process this script spawned.
+    root = pid
+    while root and _proc_kb(root, "status", "PPid") and _proc_kb(root, "status", "PPid") != os.getpid():
+        root = _proc_kb(root, "status", "PPid")
+    tree, todo = [], [root]
+    while todo:
+        tree.append(todo.pop())
+        todo.extend(_children(tree[-1]))
+    serving = _children(root) if root != pid else [root]
+    rss = [_proc_kb(p, "status", "VmRSS") for p in serving]
+    return {
+        "rss_mb": float(np.mean(rss)) / 1024 if rss else 0.0,
+        "pss_mb": sum(_proc_kb(p, "smaps_rollup", "Pss") for p in tree) / 1024,
+    }
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0}
+    p50, p90, p99 = np.percentile(np.asarray(latencies) * 1000.0, [50, 90, 99])
+    return {"p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99)}
+
+
+def _post_many(url: str, field: str, payload: bytes, total: int, concurrency: int) -> Iterator[Tuple[int, float]]:
+    # (status, seconds) per request, one kept-alive session per thread.
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        resp = session.post(url, files={field: ("clip.wav", payload, "audio/wav")}, timeout=60)
+        return resp.status_code, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield from pool.map(one, range(total))
+
+
+def _upload_many(base: str, payload: bytes, total: int, concurrency: int, retries: int) -> Iterator[Tuple[int, float]]:
+    with CheetahSenseClient(base, timeout=60, retries=retries) as client:
+        for result in client.upload_many((payload for _ in range(total)), concurrency=concurrency):
+            yield 200 if result.ok else getattr(result.error, "status", 0), result.seconds
+
+
+def run_load(
+    base: str, payload: bytes, total: int, concurrency: int, retries: int = 0, endpoint: str = "/upload"
+) -> Dict[str, float]:
+    """
+    `total` requests to `endpoint`, each carrying the clip once. /upload goes through
+    CheetahSenseClient.upload_many, with `retries`; latencies and clips/sec are end to
+    end, retries and backoff included. Other endpoints are posted without retries.
+    """
+    statuses: Dict[int, int] = {}
+    latencies: List[float] = []
+    start = time.perf_counter()
+    if endpoint == "/upload":
+        responses = _upload_many(base, payload, total, concurrency, retries)
+    else:
+        field = "files" if endpoint == "/upload/batch" else "file"
+        responses = _post_many(base.rstrip("/") + endpoint, field, payload, total, concurrency)
+    for status, seconds in responses:
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            latencies.append(seconds)
+    wall = time.perf_counter() - start
+    return {
+        "requests": total,
+        "ok": statuses.get(200, 0),
+        "rejected_503": statuses.get(503, 0),
+        "clips_per_sec": statuses.get(200, 0) / wall,
+        **percentiles(latencies),
+    }
+
+
+def _print_row(name: str, concurrency: int, result: Dict[str, float], memory: Optional[Dict[str, float]] = None):
+    mem = f" {memory['rss_mb']:>9.1f} {memory['pss_mb']:>9.1f}" if memory else ""
+    print(
+        f"{name:<48} {concurrency:>5} {result['clips_per_sec']:>8.1f} {result['p50_ms']:>8.1f} {result['p90_ms']:>8.1f} "
+        f"{result['p99_ms']:>8.1f} {result['rejected_503']:>6}{mem}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Drive an already running server (e.g. http://localhost:8000).")
+    parser.add_argument("--config", action="append", default=[], help="Env overrides for a spawned server.")
+    parser.add_argument("--endpoint", default="/upload", help="/upload (through the client SDK) or e.g. /upload/batch.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16], help="One run per level.")
+    parser.add_argument("--duration", type=float, default=2.0, help="Clip length in seconds.")
+    parser.add_argument("--retries", type=int, default=0, help="Client retries per clip on /upload; 0 counts every 503 as rejected.")
+    args = parser.parse_args()
+
+    payload = make_payload(duration=args.duration)
+    print(f"{'config':<48} {'conc':>5} {'clips/s':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'503s':>6} {'RSS/proc':>9} {'PSS tot':>9}")
+    if args.url:
+        for concurrency in args.concurrency:
+            _print_row(args.url, concurrency, run_load(args.url, payload, args.requests, concurrency, args.retries, args.endpoint))
+        return
+    for config in args.config or ["INFERENCE_POOL=inline", "INFERENCE_POOL=thread"]:
+        with spawn_server(parse_config(config)) as base:
+            for concurrency in args.concurrency:
+                run_load(base, payload, min(concurrency, args.requests), concurrency, endpoint=args.endpoint)  # warm-up
+                result = run_load(base, payload, args.requests, concurrency, args.retries, args.endpoint)
+                _print_row(config or "(single process)", concurrency, result, server_memory(base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Synthetic-stream load test for the /stream WebSocket endpoint.
+
+Opens --streams concurrent connections, each sending --seconds of int16 PCM in
+--chunk-ms chunks paced in real time (--speed > 1 sends faster). Reports predictions/sec,
+dropped windows (never answered), and chunk-to-prediction latency measured on the client (from sending
+the chunk that completes a window to receiving its prediction) and on the server.
+
+Against spawned uvicorn servers (one per --config, needs the `websockets` package that
+uvicorn[standard] installs) or --url; --in-process drives the ASGI app directly in this process.
+
+Run from core/:
+    python -m scripts.load_test_stream --streams 200 --config INFERENCE_POOL=inline
+    python -m scripts.load_test_stream --streams 100 --in-process
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from scripts.load_test import parse_config, percentiles, spawn_server
+
+SR = 16000
+
+
+def make_stream(seconds: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SR * seconds)) / SR
+    freq = rng.uniform(200.0, 2000.0)
+    wave = 0.4 * np.sin(2 * np.pi * freq * t) + 0.05 * rng.normal(size=t.shape)
+    return (wave * 32767).astype("<i2")
+
+
+class StreamStats:
+    def __init__(self, window: float, hop: float):
+        self.window = int(window * SR)
+        self.hop = int(hop * SR)
+        self.client_latencies: List[float] = []
+        self.server_latencies: List[float] = []
+        self.predictions = 0
+        self.dropped = 0
+
+    def record(self, message: Dict, chunk_ends: List[int], sent_at: List[float], received_at: float):
+        # The chunk that completed this window is the first whose cumulative end reaches it.
+        end = message["index"] * self.hop + self.window
+        chunk = bisect.bisect_left(chunk_ends, end)
+        self.predictions += 1
+        self.client_latencies.append(received_at - sent_at[chunk])
+        self.server_latencies.append(message["latency_ms"] / 1000.0)
+
+    def finish_stream(self, dropped: int):
+        self.dropped += dropped
+
+
+def _schedule(pcm: np.ndarray, chunk: int):
+    chunks = [pcm[i : i + chunk] for i in range(0, len(pcm), chunk)]
+    return chunks, list(np.cumsum([len(c) for c in chunks]))
+
+
+async def _drive_stream(send_chunk, receive_text, seed: int, args, stats: StreamStats):
+    """
+    One synthetic station: paced sends on one task, predictions read on this one until
+    the last window arrives or nothing has come for `--settle` seconds after the final chunk.
+    """
+    pcm = make_stream(args.seconds, seed)
+    chunks, chunk_ends = _schedule(pcm, int(SR * args.chunk_ms / 1000))
+    sent_at: List[float] = []
+    expected = (len(pcm) - stats.window) // stats.hop + 1
+    # Stations don't start in lockstep; spread them over one chunk period.
+    offset = np.random.default_rng(seed).uniform(0, args.chunk_ms / 1000 / args.speed)
+
+    async def send():
+        await asyncio.sleep(offset)
+        start = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            delay = start + i * args.chunk_ms / 1000 / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent_at.append(time.perf_counter())
+            await send_chunk(chunk.tobytes())
+
+    sender = asyncio.create_task(send())
+    received, last_index = 0, -1
+    while last_index < expected - 1:
+        try:
+            text = await asyncio.wait_for(receive_text(), timeout=args.settle)
+        except asyncio.TimeoutError:
+            if sender.done():
+                break
+            continue
+        message = json.loads(text)
+        stats.record(message, chunk_ends, sent_at, time.perf_counter())
+        received, last_index = received + 1, message["index"]
+    await sender
+    stats.finish_stream(expected - received)
+
+
+async def _ws_stream(url: str, seed: int, args, stats: StreamStats):
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # config
+        await _drive_stream(ws.send, ws.recv, seed, args, stats)
+
+
+async def _asgi_stream(app, query: str, seed: int, args, stats: StreamStats):
+    # Speaks the ASGI websocket protocol to the app directly: no sockets or threads,
+    # so the numbers are the app's own cost.
+    incoming: asyncio.Queue = asyncio.Queue()
+    outgoing: asyncio.Queue = asyncio.Queue()
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+        "subprotocols": [],
+    }
+    await incoming.put({"type": "websocket.connect"})
+    server = asyncio.create_task(app(scope, incoming.get, outgoing.put))
+    assert (await outgoing.get())["type"] == "websocket.accept"
+    await outgoing.get()  # config
+
+    async def send_chunk(payload: bytes):
+        await incoming.put({"type": "websocket.receive", "bytes": payload})
+
+    async def receive_text() -> str:
+        return (await outgoing.get())["text"]
+
+    await _drive_stream(send_chunk, receive_text, seed, args, stats)
+    await incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await server
+
+
+async def _drive_url(url: str, args, stats: StreamStats):
+    await asyncio.gather(*(_ws_stream(url, i, args, stats) for i in range(args.streams)))
+
+
+async def _drive_in_process(args, stats: StreamStats, query: str):
+    from app.fastapi_app import app
+
+    await asyncio.gather(*(_asgi_stream(app, query, i, args, stats) for i in range(args.streams)))
+
+
+def run(args, url: str = None) -> Dict[str, float]:
+    stats = StreamStats(args.window, args.hop)
+    query = f"sample_rate={SR}&encoding=s16le&window={args.window}&hop={args.hop}"
+    start = time.perf_counter()
+    if url is None:
+        asyncio.run(_drive_in_process(args, stats, query))
+    else:
+        asyncio.run(_drive_url(f"{url}/stream?{query}", args, stats))
+    wall = time.perf_counter() - start
+    client = percentiles(stats.client_latencies)
+    server = percentiles(stats.server_latencies)
+    return {
+        "streams": args.streams,
+        "predictions": stats.predictions,
+        "predictions_per_sec": stats.predictions / wall,
+        "dropped": stats.dropped,
+        "under_50ms": float(np.mean(np.asarray(stats.client_latencies) < 0.05)) if stats.client_latencies else 0.0,
+        **client,
+        "server_p50_ms": server["p50_ms"],
+        "server_p99_ms": server["p99_ms"],
+    }
+
+
+def _print_row(name: str, result: Dict[str, float]):
+    print(
+        f"{name:<36} {result['streams']:>7} {result['predictions_per_sec']:>8.1f} {result['dropped']:>7} "
+        f"{result['p50_ms']:>7.1f} {result['p90_ms']:>7.1f} {result['p99_ms']:>7.1f} "
+        f"{result['server_p99_ms']:>10.1f} {result['under_50ms']:>8.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Drive an already running server (e.g. ws://localhost:8000).")
+    parser.add_argument("--config", action="append", default=[], help="Env overrides for a spawned server.")
+    parser.add_argument("--in-process", action="store_true", help="Drive the ASGI app in this process.")
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Audio per stream.")
+    parser.add_argument("--chunk-ms", type=float, default=100.0)
+    parser.add_argument("--window", type=float, default=1.0)
+    parser.add_argument("--hop", type=float, default=0.5)
+    parser.add_argument("--speed", type=float, default=1.0, help="Send rate as a multiple of real time.")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait for stragglers after the last chunk.")
+    args = parser.parse_args()
+
+    print(f"{'config':<36} {'streams':>7} {'pred/s':>8} {'dropped':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'server p99':>10} {'<50ms':>8}")
+    if args.in_process:
+        _print_row("in-process", run(args))
+        return
+    if args.url:
+        _print_row(args.url, run(args, args.url.rstrip("/")))
+        return
+    for config in args.config or ["INFERENCE_POOL=inline", "INFERENCE_POOL=thread"]:
+        with spawn_server(parse_config(config)) as base:
+            _print_row(config, run(args, base.replace("http://", "ws://")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Print a per-window intent timeline and merged events for a recording.
+
+Run from core/: python -m scripts.timeline path/to/clip.wav --window 1.0 --hop 0.5
+"""
+import argparse
+import json
+from pathlib import Path
+
+from src.inference.predictor import Predictor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--window", type=float, default=1.0, help="Window length in seconds.")
+    parser.add_argument("--hop", type=float, default=0.5, help="Hop between windows in seconds.")
+    parser.add_argument("--checkpoint", type=Path, default=None)
+    parser.add_argument("--segments", action="store_true", help="Also print every window, not just events.")
+    parser.add_argument("--json", action="store_true", help="Emit the full result as JSON.")
+    args = parser.parse_args()
+
+    result = Predictor(args.checkpoint).predict_timeline(args.path, window_seconds=args.window, hop_seconds=args.hop)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    if args.segments:
+        for seg in result["segments"]:
+            print(f"{seg['start']:>9.2f} {seg['end']:>9.2f}  {seg['label']:<10} {seg['confidence']:.2f}")
+        print()
+    print(f"{'start':>9} {'end':>9}  {'label':<10} conf")
+    for event in result["events"]:
+        print(f"{event['start']:>9.2f} {event['end']:>9.2f}  {event['label']:<10} {event['confidence']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
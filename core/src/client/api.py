@@ -0,0 +1,390 @@
+"""
+Client for the CheetahSense API (/upload, /health, /ready), sync and asyncio.
+
+Connections are pooled and kept alive per thread; files are streamed from disk as the
+multipart body (never read whole); 5xx, 429 and connection errors are retried with
+exponential backoff (and Retry-After when the server sends one). upload_many and
+upload_directory keep at most `concurrency` uploads in flight and yield results in the
+order they complete.
+
+    with CheetahSenseClient("http://localhost:8000") as client:
+        print(client.upload("clip.wav")["label"])
+        for result in client.upload_directory("recordings/", concurrency=8):
+            print(result.source, result.response or result.error)
+
+    async with AsyncCheetahSenseClient("http://localhost:8000") as client:
+        async for result in client.upload_many(paths, concurrency=32):
+            ...
+
+A retried /upload with contribute=True may be queued twice if the first attempt
+reached the server; the server's fingerprint index drops the repeat.
+"""
+import asyncio
+import io
+import mimetypes
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+# requests is imported where it is used, like in github_push.
+if TYPE_CHECKING:
+    import requests
+
+Source = Union[str, Path, bytes, IO[bytes]]
+AUDIO_SUFFIXES = {".wav", ".flac", ".ogg", ".mp3"}
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class ApiError(RuntimeError):
+    def __init__(self, status: int, detail: str, attempts: int = 1):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+        self.attempts = attempts
+
+
+@dataclass
+class UploadResult:
+    source: Source
+    response: Optional[Dict]  # the /upload JSON, or None on error
+    error: Optional[Exception]
+    seconds: float  # including retries
+    attempts: int
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _MultipartBody:
+    """
+    multipart/form-data body read on demand: form fields, then the file in blocks.
+    Has a length, so requests sends Content-Length instead of chunking.
+    """
+
+    def __init__(self, fields: Dict[str, str], filename: str, content_type: str, stream: IO[bytes], size: int):
+        self.boundary = uuid.uuid4().hex
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        quoted = filename.replace('"', "%22")
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="file"; filename="{quoted}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        self._parts: deque = deque([io.BytesIO(head), stream, io.BytesIO(f"\r\n--{self.boundary}--\r\n".encode())])
+        self._length = len(head) + size + len(self.boundary) + 8
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        out = []
+        while self._parts and size != 0:
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.popleft()
+                continue
+            out.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(out)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _open_source(source: Source, filename: Optional[str]) -> Tuple[IO[bytes], int, str, bool]:
+    # (stream at its start, size, filename, whether we opened it and must close it)
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        return path.open("rb"), path.stat().st_size, filename or path.name, True
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), len(source), filename or "clip.wav", True
+    size = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    return source, size, filename or Path(getattr(source, "name", "clip.wav")).name, False
+
+
+def _retry_after(resp: "requests.Response") -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def iter_audio_files(directory: Union[str, Path], suffixes=AUDIO_SUFFIXES) -> Iterator[Path]:
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() in suffixes and path.is_file():
+            yield path
+
+
+class CheetahSenseClient:
+    """
+    Synchronous client. Safe to share between threads: each thread gets its own pooled
+    keep-alive session.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = 30.0,
+        retries: int = 4,
+        backoff_factor: float = 0.25,
+        max_backoff: float = 10.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+        # Weak, so the sessions of finished upload_many threads are collected with them.
+        self._sessions: "weakref.WeakSet[requests.Session]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CheetahSenseClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for session in list(self._sessions):
+                session.close()
+            self._sessions.clear()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> "requests.Session":
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            # A thread sends one request at a time, so one kept-alive connection is enough.
+            # No urllib3-level retries: a streamed body can't be replayed, so _send retries.
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def _backoff(self, attempt: int, resp: Optional["requests.Response"] = None) -> float:
+        hinted = _retry_after(resp) if resp is not None else None
+        delay = hinted if hinted is not None else self.backoff_factor * (2 ** (attempt - 1))
+        return min(self.max_backoff, delay) * (0.5 + random.random() / 2)  # jitter, so retries don't arrive in lockstep
+
+    def _send(self, method: str, path: str, body_factory=None) -> Tuple["requests.Response", int]:
+        """
+        One request, retried on connection errors and RETRY_STATUSES. body_factory()
+        returns fresh request kwargs (plus an optional "close" callback) per attempt.
+        Errors raised after the last attempt carry `.attempts`.
+        """
+        import requests
+
+        attempt = 0
+        while True:
+            attempt += 1
+            resp = None
+            kwargs = body_factory() if body_factory is not None else {}
+            close = kwargs.pop("close", None)
+            try:
+                resp = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt > self.retries:
+                    exc.attempts = attempt
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt > self.retries:
+                    return resp, attempt
+            finally:
+                if close is not None:
+                    close()
+            time.sleep(self._backoff(attempt, resp))
+
+    @staticmethod
+    def _json(resp: "requests.Response", attempts: int = 1) -> Dict:
+        if not resp.ok:
+            try:
+                detail = resp.json().get("detail", resp.text)
+            except ValueError:
+                detail = resp.text
+            raise ApiError(resp.status_code, str(detail), attempts)
+        return resp.json()
+
+    def health(self) -> Dict:
+        return self._json(self._send("GET", "/health")[0])
+
+    def ready(self) -> bool:
+        import requests
+
+        try:
+            return self.session.get(f"{self.base_url}/ready", timeout=self.timeout).ok
+        except requests.RequestException:
+            return False
+
+    def wait_ready(self, timeout: float = 60.0, interval: float = 0.25) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.ready():
+                return True
+            time.sleep(interval)
+        return False
+
+    def _upload(self, source: Source, filename: Optional[str], content_type: Optional[str], fields: Dict[str, str]) -> Tuple[Dict, int]:
+        def body():
+            stream, size, name, owned = _open_source(source, filename)
+            kind = content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+            multipart = _MultipartBody(fields, name, kind, stream, size)
+            return {
+                "data": multipart,
+                "headers": {"Content-Type": multipart.content_type},
+                "close": stream.close if owned else None,
+            }
+
+        resp, attempts = self._send("POST", "/upload", body)
+        return self._json(resp, attempts), attempts
+
+    @staticmethod
+    def _fields(contribute: bool, contributor: Optional[str], label: Optional[str], notes: Optional[str]) -> Dict[str, str]:
+        fields = {"contribute": "true" if contribute else "false"}
+        for name, value in (("contributor", contributor), ("label", label), ("notes", notes)):
+            if value:
+                fields[name] = value
+        return fields
+
+    def upload(
+        self,
+        source: Source,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        contribute: bool = False,
+        contributor: Optional[str] = None,
+        label: Optional[str] = None,
+        notes: Optional[str] = None,
+    ) -> Dict:
+        """
+        POST one clip (a path, bytes or a binary file object) to /upload and return its
+        JSON. Raises ApiError for error responses left after retries.
+        """
+        return self._upload(source, filename, content_type, self._fields(contribute, contributor, label, notes))[0]
+
+    def _upload_result(self, source: Source, fields: Dict[str, str]) -> UploadResult:
+        start = time.perf_counter()
+        try:
+            response, attempts = self._upload(source, None, None, fields)
+            return UploadResult(source, response, None, time.perf_counter() - start, attempts)
+        except Exception as exc:  # noqa: BLE001 -- reported per clip
+            return UploadResult(source, None, exc, time.perf_counter() - start, getattr(exc, "attempts", 0))
+
+    def upload_many(
+        self,
+        sources: Iterable[Source],
+        concurrency: int = 8,
+        contribute: bool = False,
+        contributor: Optional[str] = None,
+        label: Optional[str] = None,
+        notes: Optional[str] = None,
+    ) -> Iterator[UploadResult]:
+        """
+        Upload every source with up to `concurrency` in flight, yielding results as they
+        complete. `sources` is consumed lazily, so it may be a long generator.
+        """
+        fields = self._fields(contribute, contributor, label, notes)
+        pending = set()
+        sources = iter(sources)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="upload") as pool:
+            for source in sources:
+                pending.add(pool.submit(self._upload_result, source, fields))
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from (future.result() for future in done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+
+    def upload_directory(self, directory: Union[str, Path], concurrency: int = 8, **form) -> Iterator[UploadResult]:
+        return self.upload_many(iter_audio_files(directory), concurrency=concurrency, **form)
+
+
+class AsyncCheetahSenseClient:
+    """
+    asyncio front end to CheetahSenseClient: each request runs on a bounded thread pool
+    (one pooled session per thread), so the event loop never blocks on the network or
+    on file reads.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8000", max_concurrency: int = 16, **options):
+        self.client = CheetahSenseClient(base_url, **options)
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="cheetahsense-client")
+
+    async def __aenter__(self) -> "AsyncCheetahSenseClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.client.close()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def health(self) -> Dict:
+        return await self._run(self.client.health)
+
+    async def ready(self) -> bool:
+        return await self._run(self.client.ready)
+
+    async def upload(self, source: Source, filename: Optional[str] = None, content_type: Optional[str] = None, **form) -> Dict:
+        return await self._run(lambda: self.client.upload(source, filename, content_type, **form))
+
+    async def upload_many(self, sources: Iterable[Source], concurrency: Optional[int] = None, **form) -> AsyncIterator[UploadResult]:
+        """
+        Async generator of results in completion order, at most `concurrency` (default
+        max_concurrency) uploads in flight.
+        """
+        fields = self.client._fields(form.get("contribute", False), form.get("contributor"), form.get("label"), form.get("notes"))
+        limit = min(concurrency or self.max_concurrency, self.max_concurrency)
+        pending = set()
+        try:
+            for source in sources:
+                pending.add(asyncio.ensure_future(self._run(self.client._upload_result, source, fields)))
+                if len(pending) >= limit:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def upload_directory(self, directory: Union[str, Path], concurrency: Optional[int] = None, **form) -> AsyncIterator[UploadResult]:
+        async for result in self.upload_many(iter_audio_files(directory), concurrency=concurrency, **form):
+            yield result
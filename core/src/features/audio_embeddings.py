@@ -1,20 +1,52 @@
-from typing import Dict
+from typing import Dict, Iterable
 
 import numpy as np
 
+from src.utils.metrics import stage
+
+# Frame length of the spectral centroid estimate, in samples.
+CENTROID_FRAME = 4096
+
+
+def spectral_centroid(signals: np.ndarray, sample_rate: int, frame_size: int = CENTROID_FRAME) -> np.ndarray:
+    """
+    Spectral centroid along the last axis of `signals`.
+
+    Magnitudes of Hann-windowed `frame_size`-sample frames (the last one zero-padded)
+    are summed over the signal, so the value can be built block by block in constant
+    memory; StreamingFeatureAccumulator does exactly that. Signals shorter than one
+    frame use their plain rfft.
+    """
+    eps = 1e-9
+    signals = np.asarray(signals, dtype=np.float32)
+    n = signals.shape[-1]
+    if n < frame_size:
+        magnitude = np.abs(np.fft.rfft(signals, axis=-1))
+        freqs = np.fft.rfftfreq(n, d=1.0 / sample_rate)
+        return (magnitude @ freqs) / (np.sum(magnitude, axis=-1) + eps)
+
+    n_frames = -(-n // frame_size)
+    padded = np.zeros(signals.shape[:-1] + (n_frames * frame_size,), dtype=np.float32)
+    padded[..., :n] = signals
+    frames = padded.reshape(signals.shape[:-1] + (n_frames, frame_size))
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=-1))
+    freqs = np.fft.rfftfreq(frame_size, d=1.0 / sample_rate)
+    return np.sum(magnitude @ freqs, axis=-1) / (np.sum(magnitude, axis=(-2, -1)) + eps)
+
 
 def compute_features(waveform: np.ndarray, sample_rate: int) -> Dict[str, float]:
     eps = 1e-9
     rms = float(np.sqrt(np.mean(np.square(waveform)) + eps))
 
-    magnitude = np.abs(np.fft.rfft(waveform))
-    freqs = np.fft.rfftfreq(len(waveform), d=1.0 / sample_rate)
-    spectral_centroid = float(np.sum(freqs * magnitude) / (np.sum(magnitude) + eps))
+    with stage("features.fft"):
+        centroid = float(spectral_centroid(waveform, sample_rate))
 
-    zero_crossings = np.where(np.diff(np.sign(waveform)))[0]
-    zcr = float(len(zero_crossings)) / (len(waveform) + eps)
+    # Same count as np.where(np.diff(np.sign(x))), without the float diff and index array.
+    signs = np.sign(waveform)
+    zero_crossings = int(np.count_nonzero(signs[1:] != signs[:-1]))
+    zcr = float(zero_crossings) / (len(waveform) + eps)
 
-    return {"rms": rms, "spectral_centroid": spectral_centroid, "zero_cross_rate": zcr}
+    return {"rms": rms, "spectral_centroid": centroid, "zero_cross_rate": zcr}
 
 
 def to_feature_vector(features: Dict[str, float]) -> np.ndarray:
@@ -23,3 +55,134 @@ def to_feature_vector(features: Dict[str, float]) -> np.ndarray:
     centroid = features["spectral_centroid"] / 4000.0
     zcr = features["zero_cross_rate"] * 5.0
     return np.array([rms, centroid, zcr], dtype=np.float32)
+
+
+def to_feature_matrix(features: Dict[str, np.ndarray]) -> np.ndarray:
+    # Same scaling as to_feature_vector, for per-frame feature arrays: (N, 3).
+    rms = np.asarray(features["rms"]) * 10
+    centroid = np.asarray(features["spectral_centroid"]) / 4000.0
+    zcr = np.asarray(features["zero_cross_rate"]) * 5.0
+    return np.stack([rms, centroid, zcr], axis=1).astype(np.float32)
+
+
+def frame_starts(n_samples: int, window: int, hop: int) -> np.ndarray:
+    # A clip shorter than one window is treated as a single frame covering all of it.
+    window = min(window, n_samples)
+    return np.arange(0, n_samples - window + 1, hop)
+
+
+def compute_features_framed(
+    waveform: np.ndarray,
+    sample_rate: int,
+    window: int,
+    hop: int,
+    batch_frames: int = 256,
+) -> Dict[str, np.ndarray]:
+    """
+    compute_features for every window of `window` samples, `hop` apart, as arrays.
+
+    RMS and zero crossings come from cumulative sums, so they cost O(n) regardless of
+    overlap. The spectra are batched rFFTs over a strided view of the waveform, taken
+    `batch_frames` windows at a time to bound the size of the complex buffer.
+    """
+    eps = 1e-9
+    waveform = np.asarray(waveform, dtype=np.float32)
+    window = min(window, len(waveform))
+    starts = frame_starts(len(waveform), window, hop)
+    stops = starts + window
+
+    sq = np.concatenate([[0.0], np.cumsum(np.square(waveform, dtype=np.float64))])
+    rms = np.sqrt((sq[stops] - sq[starts]) / window + eps)
+
+    crossings = np.concatenate([[0], np.cumsum(np.diff(np.sign(waveform)) != 0)])
+    zcr = (crossings[stops - 1] - crossings[starts]) / (window + eps)
+
+    frames = np.lib.stride_tricks.sliding_window_view(waveform, window)[::hop]
+    centroid = np.empty(len(starts), dtype=np.float64)
+    for i in range(0, len(frames), batch_frames):
+        centroid[i : i + batch_frames] = spectral_centroid(frames[i : i + batch_frames], sample_rate)
+
+    return {"rms": rms, "spectral_centroid": centroid, "zero_cross_rate": zcr}
+
+
+class StreamingFeatureAccumulator:
+    """
+    Incremental version of compute_features for waveforms fed in blocks.
+
+    Blocks may be un-normalized: peak normalization is applied at the end, which leaves
+    the spectral centroid and zero crossings unchanged and only rescales the RMS.
+    All three features match compute_features up to float rounding: the spectral
+    centroid is summed over the same Hann-windowed frames as spectral_centroid.
+    """
+
+    def __init__(self, sample_rate: int, frame_size: int = CENTROID_FRAME):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self._window = np.hanning(frame_size).astype(np.float32)
+        self._freqs = np.fft.rfftfreq(frame_size, d=1.0 / sample_rate)
+        self._pending = np.empty(0, dtype=np.float32)
+        self._count = 0
+        self._sum_sq = 0.0
+        self._peak = 0.0
+        self._crossings = 0
+        self._last_sign = None
+        self._weighted_mag = 0.0
+        self._total_mag = 0.0
+        self._frames = 0
+
+    def update(self, block: np.ndarray) -> None:
+        block = np.asarray(block, dtype=np.float32)
+        if block.size == 0:
+            return
+        self._count += block.size
+        self._sum_sq += float(np.dot(block, block.astype(np.float64)))
+        self._peak = max(self._peak, float(np.max(np.abs(block))))
+
+        signs = np.sign(block)
+        if self._last_sign is not None and signs[0] != self._last_sign:
+            self._crossings += 1
+        self._crossings += int(np.count_nonzero(np.diff(signs)))
+        self._last_sign = signs[-1]
+
+        pending = np.concatenate([self._pending, block])
+        n_frames = len(pending) // self.frame_size
+        if n_frames:
+            self._add_frames(pending[: n_frames * self.frame_size].reshape(n_frames, self.frame_size))
+            pending = pending[n_frames * self.frame_size :].copy()
+        self._pending = pending
+
+    def _add_frames(self, frames: np.ndarray) -> None:
+        magnitude = np.abs(np.fft.rfft(frames * self._window, axis=1))
+        self._weighted_mag += float(np.sum(magnitude @ self._freqs))
+        self._total_mag += float(np.sum(magnitude))
+        self._frames += len(frames)
+
+    def result(self) -> Dict[str, float]:
+        eps = 1e-9
+        peak = self._peak + eps
+        count = max(self._count, 1)
+        rms = float(np.sqrt(self._sum_sq / (count * peak * peak) + eps))
+
+        if self._frames == 0:
+            magnitude = np.abs(np.fft.rfft(self._pending / peak))
+            freqs = np.fft.rfftfreq(len(self._pending), d=1.0 / self.sample_rate)
+            spectral_centroid = float(np.sum(freqs * magnitude) / (np.sum(magnitude) + eps))
+        else:
+            weighted, total = self._weighted_mag, self._total_mag
+            if len(self._pending):
+                tail = np.zeros(self.frame_size, dtype=np.float32)
+                tail[: len(self._pending)] = self._pending
+                magnitude = np.abs(np.fft.rfft(tail * self._window))
+                weighted += float(magnitude @ self._freqs)
+                total += float(np.sum(magnitude))
+            spectral_centroid = weighted / (total + eps * peak)
+
+        zcr = float(self._crossings) / (self._count + eps)
+        return {"rms": rms, "spectral_centroid": spectral_centroid, "zero_cross_rate": zcr}
+
+
+def compute_features_streaming(blocks: Iterable[np.ndarray], sample_rate: int, frame_size: int = CENTROID_FRAME) -> Dict[str, float]:
+    accumulator = StreamingFeatureAccumulator(sample_rate, frame_size=frame_size)
+    for block in blocks:
+        accumulator.update(block)
+    return accumulator.result()
@@ -0,0 +1,240 @@
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from src.features.audio_embeddings import compute_features, frame_starts, to_feature_vector
+
+FEATURE_MODES = ("basic", "logmel", "mfcc")
+_LOG_FLOOR = 1e-10
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    """
+    Which feature vector a checkpoint was trained on.
+
+    "basic" is the original 3-value RMS / centroid / ZCR vector. "logmel" and "mfcc"
+    frame the waveform (Hann window, `n_fft` samples every `hop`) and pool the
+    per-frame log-mel or MFCC values into [mean, std, std of first differences].
+    """
+
+    mode: str = "basic"
+    n_fft: int = 512
+    hop: int = 160
+    n_mels: int = 40
+    n_mfcc: int = 13
+    fmin: float = 0.0
+    fmax: Optional[float] = None
+
+    def __post_init__(self):
+        if self.mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature mode {self.mode!r}; expected one of {FEATURE_MODES}.")
+
+    @property
+    def frame_dim(self) -> int:
+        return self.n_mels if self.mode == "logmel" else self.n_mfcc
+
+    @property
+    def dim(self) -> int:
+        return 3 if self.mode == "basic" else 3 * self.frame_dim
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "EmbeddingConfig":
+        return cls(**data) if data else cls()
+
+
+@lru_cache(maxsize=16)
+def hann_window(n_fft: int) -> np.ndarray:
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)  # periodic
+    window.setflags(write=False)
+    return window
+
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+@lru_cache(maxsize=32)
+def mel_filterbank(sample_rate: int, n_fft: int, n_mels: int, fmin: float = 0.0, fmax: Optional[float] = None) -> np.ndarray:
+    """Triangular HTK-style mel filters, (n_fft // 2 + 1, n_mels), ready to right-multiply a power spectrum."""
+    fmax = fmax or sample_rate / 2.0
+    bin_freqs = np.fft.rfftfreq(n_fft, d=1.0 / sample_rate)
+    edges = _mel_to_hz(np.linspace(_hz_to_mel(fmin), _hz_to_mel(fmax), n_mels + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bin_freqs - lower) / np.maximum(center - lower, 1e-9)
+    falling = (upper - bin_freqs) / np.maximum(upper - center, 1e-9)
+    filters = np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+    filters.setflags(write=False)
+    return filters
+
+
+@lru_cache(maxsize=16)
+def dct_matrix(n_mels: int, n_mfcc: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, (n_mels, n_mfcc)."""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    basis = np.cos(np.pi / n_mels * (n + 0.5) * k) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    basis = basis.T.astype(np.float32)
+    basis.setflags(write=False)
+    return basis
+
+
+def num_frames(n_samples: int, config: EmbeddingConfig) -> int:
+    # Only whole frames are used; a clip shorter than one frame is zero-padded to one.
+    return max(1 + (n_samples - config.n_fft) // config.hop, 1) if n_samples >= config.n_fft else 1
+
+
+def frame_features(waveform: np.ndarray, sample_rate: int, config: EmbeddingConfig, batch_frames: int = 2048) -> np.ndarray:
+    """Per-frame log-mel or MFCC values, (frames, config.frame_dim), from one batched rFFT per chunk."""
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if len(waveform) < config.n_fft:
+        waveform = np.pad(waveform, (0, config.n_fft - len(waveform)))
+    frames = np.lib.stride_tricks.sliding_window_view(waveform, config.n_fft)[:: config.hop]
+    window = hann_window(config.n_fft)
+    filters = mel_filterbank(sample_rate, config.n_fft, config.n_mels, config.fmin, config.fmax)
+    out = np.empty((len(frames), config.frame_dim), dtype=np.float32)
+    for i in range(0, len(frames), batch_frames):
+        spectrum = np.fft.rfft(frames[i : i + batch_frames] * window, axis=1)
+        power = spectrum.real**2 + spectrum.imag**2
+        values = np.log(power @ filters + _LOG_FLOOR)
+        if config.mode == "mfcc":
+            values = values @ dct_matrix(config.n_mels, config.n_mfcc)
+        out[i : i + batch_frames] = values
+    return out
+
+
+def pool_sums(sums: np.ndarray, sums_sq: np.ndarray, count, delta_sums: np.ndarray, delta_sums_sq: np.ndarray, delta_count) -> np.ndarray:
+    """
+    [mean, std, delta std] from running sums. Works on single vectors or (windows, D)
+    arrays, which is what lets whole-clip, streaming and windowed paths agree.
+    """
+    count = np.maximum(np.asarray(count, dtype=np.float64), 1.0)
+    delta_count = np.maximum(np.asarray(delta_count, dtype=np.float64), 1.0)
+    if count.ndim:
+        count, delta_count = count[:, None], delta_count[:, None]
+    mean = sums / count
+    std = np.sqrt(np.maximum(sums_sq / count - mean * mean, 0.0))
+    delta_mean = delta_sums / delta_count
+    delta_std = np.sqrt(np.maximum(delta_sums_sq / delta_count - delta_mean * delta_mean, 0.0))
+    return np.concatenate([mean, std, delta_std], axis=-1).astype(np.float32)
+
+
+def pool_frames(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.float64)
+    deltas = np.diff(values, axis=0)
+    return pool_sums(
+        values.sum(axis=0), np.square(values).sum(axis=0), len(values),
+        deltas.sum(axis=0), np.square(deltas).sum(axis=0), len(deltas),
+    )
+
+
+def extract_embedding(waveform: np.ndarray, sample_rate: int, config: EmbeddingConfig) -> np.ndarray:
+    if config.mode == "basic":
+        return to_feature_vector(compute_features(waveform, sample_rate))
+    return pool_frames(frame_features(waveform, sample_rate, config))
+
+
+def windowed_embeddings(waveform: np.ndarray, sample_rate: int, config: EmbeddingConfig, window: int, hop: int) -> np.ndarray:
+    """
+    Embeddings for each `window`-sample window `hop` apart (same starts as frame_starts),
+    pooled from one pass of frame features via cumulative sums. Each window pools the
+    clip's frames that lie wholly inside it, which equals extract_embedding on the
+    window when its start is a multiple of `config.hop`.
+    """
+    values = frame_features(waveform, sample_rate, config).astype(np.float64)
+    deltas = np.diff(values, axis=0)
+    zero = np.zeros((1, values.shape[1]))
+    c_sum = np.concatenate([zero, np.cumsum(values, axis=0)])
+    c_sq = np.concatenate([zero, np.cumsum(np.square(values), axis=0)])
+    d_sum = np.concatenate([zero, np.cumsum(deltas, axis=0)])
+    d_sq = np.concatenate([zero, np.cumsum(np.square(deltas), axis=0)])
+
+    starts = frame_starts(len(waveform), window, hop)
+    window = min(window, len(waveform))
+    # Frames wholly inside each window; always at least one.
+    first = -(-starts // config.hop)
+    last = np.maximum((starts + window - config.n_fft) // config.hop + 1, first + 1)
+    first = np.minimum(first, len(values) - 1)
+    last = np.minimum(last, len(values))
+    return pool_sums(
+        c_sum[last] - c_sum[first], c_sq[last] - c_sq[first], last - first,
+        d_sum[last - 1] - d_sum[first], d_sq[last - 1] - d_sq[first], last - 1 - first,
+    )
+
+
+class EmbeddingAccumulator:
+    """
+    Streaming counterpart of extract_embedding for the framed modes: carries the
+    partial frame and the previous frame's values across blocks, so the result
+    matches the whole-clip embedding.
+
+    Blocks may be un-normalized, as with StreamingFeatureAccumulator. Peak
+    normalization only shifts log-power by -2 log(peak), which moves the means and
+    leaves the spreads alone, so it is applied at the end. (Frames quiet enough to
+    hit the log floor are the exception.)
+    """
+
+    def __init__(self, sample_rate: int, config: EmbeddingConfig):
+        self.sample_rate = sample_rate
+        self.config = config
+        dim = config.frame_dim
+        self._pending = np.empty(0, dtype=np.float32)
+        self._peak = 0.0
+        self._previous: Optional[np.ndarray] = None
+        self._count = 0
+        self._sums, self._sums_sq = np.zeros(dim), np.zeros(dim)
+        self._delta_count = 0
+        self._delta_sums, self._delta_sums_sq = np.zeros(dim), np.zeros(dim)
+
+    def update(self, block: np.ndarray) -> None:
+        block = np.asarray(block, dtype=np.float32)
+        if len(block):
+            self._peak = max(self._peak, float(np.max(np.abs(block))))
+        pending = np.concatenate([self._pending, block])
+        if len(pending) >= self.config.n_fft:
+            n = 1 + (len(pending) - self.config.n_fft) // self.config.hop
+            self._add(frame_features(pending[: (n - 1) * self.config.hop + self.config.n_fft], self.sample_rate, self.config))
+            pending = pending[n * self.config.hop :].copy()
+        self._pending = pending
+
+    def _add(self, values: np.ndarray) -> None:
+        values = values.astype(np.float64)
+        self._count += len(values)
+        self._sums += values.sum(axis=0)
+        self._sums_sq += np.square(values).sum(axis=0)
+        chained = values if self._previous is None else np.vstack([self._previous, values])
+        deltas = np.diff(chained, axis=0)
+        self._delta_count += len(deltas)
+        self._delta_sums += deltas.sum(axis=0)
+        self._delta_sums_sq += np.square(deltas).sum(axis=0)
+        self._previous = values[-1:]
+
+    def result(self) -> np.ndarray:
+        if self._count == 0:
+            self._add(frame_features(self._pending, self.sample_rate, self.config))
+        embedding = pool_sums(
+            self._sums, self._sums_sq, self._count, self._delta_sums, self._delta_sums_sq, self._delta_count
+        )
+        if self._peak > 0:
+            shift = np.full(self.config.n_mels, -2.0 * np.log(self._peak + 1e-9), dtype=np.float32)
+            if self.config.mode == "mfcc":
+                shift = shift @ dct_matrix(self.config.n_mels, self.config.n_mfcc)
+            embedding[: self.config.frame_dim] += shift
+        return embedding
+
+
+def compute_embedding_streaming(blocks: Iterable[np.ndarray], sample_rate: int, config: EmbeddingConfig) -> np.ndarray:
+    accumulator = EmbeddingAccumulator(sample_rate, config)
+    for block in blocks:
+        accumulator.update(block)
+    return accumulator.result()
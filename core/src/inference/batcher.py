@@ -0,0 +1,105 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from src.utils import metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submit() calls into run_batch(items) calls.
+
+    A batch is dispatched as soon as a runner is free (so a lone request never waits),
+    when `max_batch_size` items are pending, or when the oldest pending item has
+    waited `max_wait` seconds with every runner busy. `max_in_flight` is how many
+    batches may run at once, normally the inference pool's worker count.
+
+    run_batch returns one result per item, in order; an item's result may be an
+    exception instance, which is raised to that item's caller only.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[Sequence[Any]]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.002,
+        max_in_flight: int = 1,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait
+        self.max_in_flight = max(max_in_flight, 1)
+        self.batches = 0
+        self.items = 0
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._scheduled = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "pending": self.pending,
+        }
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size or self._in_flight < self.max_in_flight:
+            # Dispatch on the next loop iteration, so requests that are already
+            # runnable in this one join the batch.
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch, False)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch, True)
+        result, timings = await future
+        # The batch's stages count towards each request that waited on it (Server-Timing).
+        metrics.attribute(timings)
+        return result
+
+    def _dispatch(self, timed_out: bool) -> None:
+        self._scheduled = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending = [(item, future) for item, future in self._pending if not future.done()]
+        while self._pending and (
+            timed_out or self._in_flight < self.max_in_flight or len(self._pending) >= self.max_batch_size
+        ):
+            batch, self._pending = self._pending[: self.max_batch_size], self._pending[self.max_batch_size :]
+            self._in_flight += 1
+            asyncio.get_running_loop().create_task(self._run(batch))
+            timed_out = False
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch, True)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            with metrics.collect_timings() as timings:
+                try:
+                    results = await self.run_batch([item for item, _ in batch])
+                except Exception as exc:  # noqa: BLE001
+                    results = [exc] * len(batch)
+        finally:
+            self._in_flight -= 1
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # caller went away
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result((result, timings))
+        # A runner is free again: send whatever queued up behind this batch.
+        if self._pending:
+            self._dispatch(False)
@@ -0,0 +1,176 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Disk pruning lists the whole directory, so only do it every few writes.
+_DISK_PRUNE_EVERY = 64
+
+
+class ResultCache:
+    """
+    LRU cache of prediction results keyed by audio content and checkpoint identity,
+    with an optional on-disk tier of JSON files.
+
+    Entries expire after `ttl_seconds`. If `watch_path` is given (normally the
+    checkpoint file), any change to its mtime or size clears both tiers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        disk_dir: Optional[Path] = None,
+        max_disk_entries: int = 100_000,
+        watch_path: Optional[Path] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.watch_path = Path(watch_path) if watch_path else None
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch_signature = self._signature()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(payload: bytes, checkpoint_id: str) -> str:
+        digest = hashlib.blake2b(payload, digest_size=20)
+        digest.update(checkpoint_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        if self.watch_path is None:
+            return None
+        try:
+            stat = self.watch_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_watch(self) -> None:
+        if self.watch_path is None:
+            return
+        signature = self._signature()
+        if signature != self._watch_signature:
+            self._watch_signature = signature
+            self.invalidations += 1
+            self._clear_locked()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            self._check_watch()
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, result = entry
+                if now - created < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+            disk_entry = self._read_disk(key, now)
+            if disk_entry is not None:
+                self._store(key, *disk_entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return copy.deepcopy(disk_entry[1])
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict) -> None:
+        now = time.time()
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._check_watch()
+            self._store(key, now, result)
+            self._write_disk(key, now, result)
+
+    def _store(self, key: str, created: float, result: Dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict]]:
+        if self.disk_dir is None:
+            return None
+        path = self.disk_dir / f"{key}.json"
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if now - data["created"] >= self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        return data["created"], data["result"]
+
+    def _write_disk(self, key: str, created: float, result: Dict) -> None:
+        if self.disk_dir is None:
+            return
+        path = self.disk_dir / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"created": created, "result": result}, f)
+        os.replace(tmp, path)
+        self._disk_writes += 1
+        if self._disk_writes % _DISK_PRUNE_EVERY == 0:
+            self._prune_disk(created)
+
+    def _prune_disk(self, now: float) -> None:
+        files = sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        excess = len(files) - self.max_disk_entries
+        for i, path in enumerate(files):
+            if i < excess or now - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        if self.disk_dir is not None:
+            for path in self.disk_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_from_env(watch_path: Optional[Path] = None) -> Optional[ResultCache]:
+    max_entries = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+    disk_dir = os.getenv("RESULT_CACHE_DIR")
+    if max_entries <= 0 and not disk_dir:
+        return None
+    return ResultCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+        disk_dir=Path(disk_dir) if disk_dir else None,
+        watch_path=watch_path,
+    )
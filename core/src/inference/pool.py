@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from src.inference.predictor import Predictor
+from src.utils import metrics
+
+POOL_KINDS = ("inline", "thread", "process")
+
+# Per-process replica built by init_worker. Thread pools share the parent's
+# Predictor instead, since its state is read-only during inference.
+_worker_predictor: Optional[Predictor] = None
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def init_worker(checkpoint_path: Optional[Path], watch_interval: Optional[float] = None, warm_up: bool = False):
+    """
+    Process-pool initializer: builds this process's Predictor for call_worker.
+    Also usable directly to score in the current process.
+    """
+    global _worker_predictor
+    _worker_predictor = Predictor(checkpoint_path, watch_interval=watch_interval)
+    if warm_up:
+        _worker_predictor.warm_up()
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def call_worker(method: str, *args: Any) -> Any:
+    """Calls `method` on the Predictor built by init_worker in this process."""
+    return getattr(_worker_predictor, method)(*args)
+
+
+def _call_predictor_timed(method: str, *args: Any) -> Tuple[Any, metrics.Timings]:
+    # Stage timings recorded in a worker process are sent back with the result.
+    with metrics.collect_timings() as timings:
+        result = call_worker(method, *args)
+    return result, timings
+
+
+class InferencePool:
+    """
+    Runs Predictor methods off the event loop with a bounded backlog.
+
+    kind="inline" keeps the old behaviour (run on the calling thread) and is mostly
+    useful as a load-test baseline.
+    """
+
+    def __init__(self, predictor: Predictor, kind: str = "thread", workers: Optional[int] = None, max_queue: int = 64):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind {kind!r}; expected one of {POOL_KINDS}.")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.predictor = predictor
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=init_worker,
+                    initargs=(
+                        None if self.predictor.follows_default_checkpoint else self.predictor.checkpoint_path,
+                        self.predictor.watch_interval,
+                        True,
+                    ),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    async def run(self, method: str, *args: Any) -> Any:
+        if self.kind == "inline":
+            return getattr(self.predictor, method)(*args)
+        # Only touched from the event loop thread, so no lock is needed.
+        if self._in_flight >= self.capacity:
+            raise QueueFullError(f"Inference queue full ({self._in_flight} in flight).")
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == "process":
+                if not metrics.ENABLED:
+                    return await loop.run_in_executor(self._get_executor(), call_worker, method, *args)
+                result, timings = await loop.run_in_executor(self._get_executor(), _call_predictor_timed, method, *args)
+                metrics.replay(timings)
+                return result
+            # Run in a copy of this context so stage timings reach the request that asked.
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._get_executor(), context.run, getattr(self.predictor, method), *args)
+        finally:
+            self._in_flight -= 1
+
+    async def warm_up(self) -> None:
+        """
+        Start every process worker now (each warms up its own Predictor) instead of on
+        the first requests. Thread and inline pools share the already-warm parent Predictor.
+        """
+        if self.kind != "process":
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # The executor starts a worker per queued task (up to `workers`); each runs its
+        # initializer, including the warm-up, before answering.
+        await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def pool_from_env(predictor: Predictor) -> InferencePool:
+    workers = os.getenv("INFERENCE_WORKERS")
+    return InferencePool(
+        predictor,
+        kind=os.getenv("INFERENCE_POOL", "thread"),
+        workers=int(workers) if workers else None,
+        max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "64")),
+    )
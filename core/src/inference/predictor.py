@@ -1,12 +1,31 @@
-import json
+import io
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
-from src.features.audio_embeddings import compute_features, to_feature_vector
-from src.preprocess.audio_preprocess import load_audio_mono
+from src.features.audio_embeddings import (
+    StreamingFeatureAccumulator,
+    compute_features,
+    compute_features_framed,
+    frame_starts,
+    to_feature_matrix,
+    to_feature_vector,
+)
+from src.features.fingerprint import fingerprint
+from src.features.spectral import EmbeddingAccumulator, EmbeddingConfig, extract_embedding, windowed_embeddings
+from src.inference.cache import ResultCache
+from src.inference.timeline import merge_events
+from src.models.checkpoint import Checkpoint, load_checkpoint, make_checkpoint
+from src.models.ensemble import Ensemble, is_ensemble, load_ensemble
+from src.preprocess.audio_preprocess import iter_audio_blocks, load_audio_mono, load_audio_mono_from_bytes, prepare_waveform
+from src.utils.metrics import stage
 
+DEFAULT_CHECKPOINT_PATH = Path("models/checkpoints/trained_weights.json")
+DEFAULT_BINARY_CHECKPOINT_PATH = DEFAULT_CHECKPOINT_PATH.with_suffix(".ckpt")
 DEFAULT_LABELS = ["resting", "hunting", "distress"]
 DEFAULT_WEIGHTS = np.array(
     [
@@ -17,41 +36,333 @@ DEFAULT_WEIGHTS = np.array(
     dtype=np.float32,
 )
 DEFAULT_BIAS = np.array([0.0, 0.0, 0.0], dtype=np.float32)
+# Common upload rates; warm_up designs each one's resampling filter ahead of time.
+WARM_UP_SAMPLE_RATES = (8000, 11025, 16000, 22050, 32000, 44100, 48000)
+
+
+def default_checkpoint() -> Checkpoint:
+    return make_checkpoint(DEFAULT_LABELS, DEFAULT_WEIGHTS, DEFAULT_BIAS)
+
+
+def resolve_checkpoint_path() -> Path:
+    if os.getenv("CHECKPOINT_PATH"):
+        return Path(os.environ["CHECKPOINT_PATH"])
+    # The most recently written of the two, so retraining in either format takes over
+    # from a stale file in the other; the memory-mappable binary one wins a tie.
+    candidates = []
+    for rank, path in enumerate((DEFAULT_CHECKPOINT_PATH, DEFAULT_BINARY_CHECKPOINT_PATH)):
+        try:
+            candidates.append((path.stat().st_mtime_ns, rank, path))
+        except FileNotFoundError:
+            continue
+    return max(candidates)[2] if candidates else DEFAULT_CHECKPOINT_PATH
 
 
 class Predictor:
-    def __init__(self, checkpoint_path: Path | None = None):
-        self.labels: List[str] = DEFAULT_LABELS
-        self.weights, self.bias = self._load_checkpoint(checkpoint_path)
+    """
+    Linear softmax classifier over the audio feature vector. The checkpoint says which
+    vector (see EmbeddingConfig); the response's "features" are always the basic ones.
+    The checkpoint may also be an ensemble manifest (see load_ensemble): each distinct
+    feature config is extracted once per clip and all members are scored together.
 
-    def _load_checkpoint(self, checkpoint_path: Path | None) -> Tuple[np.ndarray, np.ndarray]:
+    With `watch_interval` set, the checkpoint file is re-stat'ed at most that often
+    (seconds) during predictions and swapped in when it changes. Each prediction
+    works on one snapshot of the model, so a swap never mixes old and new weights.
+
+    With `lazy=True` the checkpoint is read on first use rather than here; call
+    warm_up() to load it (and everything else the first prediction needs) up front.
+    """
+
+    def __init__(
+        self,
+        checkpoint_path: Path | None = None,
+        cache: Optional[ResultCache] = None,
+        watch_interval: Optional[float] = None,
+        lazy: bool = False,
+    ):
+        # Without an explicit path, each check re-resolves the default one, so a
+        # checkpoint retrained in the other format is picked up too.
+        self.follows_default_checkpoint = checkpoint_path is None
         if checkpoint_path is None:
-            checkpoint_path = Path("models/checkpoints/trained_weights.json")
-        if checkpoint_path.exists():
-            with checkpoint_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            weights = np.array(data.get("weights", DEFAULT_WEIGHTS)).astype(np.float32)
-            bias = np.array(data.get("bias", DEFAULT_BIAS)).astype(np.float32)
-            return weights, bias
-        return DEFAULT_WEIGHTS, DEFAULT_BIAS
+            checkpoint_path = resolve_checkpoint_path()
+        self.checkpoint_path = Path(checkpoint_path)
+        self.cache = cache
+        self.watch_interval = watch_interval
+        self._reload_lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._watched = [self.checkpoint_path]
+        self._model: Optional[Union[Checkpoint, Ensemble]] = None
+        self._signature: Optional[Tuple] = None
+        if not lazy:
+            self._model, self._signature = self._load_signed()
+
+    @property
+    def model(self) -> Union[Checkpoint, Ensemble]:
+        if self._model is None:
+            with self._reload_lock:
+                if self._model is None:
+                    self._model, self._signature = self._load_signed()
+                    self._last_check = time.monotonic()
+        if self.watch_interval is not None:
+            now = time.monotonic()
+            if now - self._last_check >= self.watch_interval:
+                self._last_check = now
+                self.reload_if_changed()
+        return self._model
+
+    @property
+    def labels(self) -> List[str]:
+        return self.model.labels
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self.model.weights
+
+    @property
+    def bias(self) -> np.ndarray:
+        return self.model.bias
+
+    @property
+    def checkpoint_id(self) -> str:
+        return self.model.content_hash
+
+    @property
+    def feature_configs(self) -> List[EmbeddingConfig]:
+        return self._feature_configs(self.model)
+
+    @staticmethod
+    def _feature_configs(model: Union[Checkpoint, Ensemble]) -> List[EmbeddingConfig]:
+        if isinstance(model, Ensemble):
+            return model.feature_configs
+        return [EmbeddingConfig.from_dict(model.features)]
+
+    def warm_up(self, sample_rates: Sequence[int] = WARM_UP_SAMPLE_RATES, seconds: float = 1.0) -> float:
+        """
+        Load the model and score a short synthetic WAV at each of `sample_rates`, so the
+        first real request doesn't pay for imports, resampling-filter design, filterbank
+        construction or FFT setup. Bypasses the result cache. Returns the seconds spent.
+        """
+        from scipy.io import wavfile
+
+        start = time.perf_counter()
+        for sr in sample_rates:
+            t = np.arange(int(sr * seconds), dtype=np.float32) / sr
+            buffer = io.BytesIO()
+            wavfile.write(buffer, sr, (0.3 * np.sin(2 * np.pi * 440.0 * t) * 32767).astype(np.int16))
+            self.predict_batch([buffer.getvalue()])
+        return time.perf_counter() - start
+
+    def _file_signature(self) -> Optional[Tuple]:
+        # An ensemble manifest is watched together with its member checkpoints.
+        signature = [resolve_checkpoint_path()] if self.follows_default_checkpoint else []
+        for path in self._watched:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(signature)
+
+    def reload_if_changed(self) -> bool:
+        # Non-blocking: if another thread is already reloading, keep serving the current model.
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._file_signature() == self._signature:
+                return False
+            try:
+                self._model, self._signature = self._load_signed()
+            except (OSError, ValueError, KeyError):
+                # Most likely a half-written file; try again on the next check.
+                return False
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _load_signed(self) -> Tuple[Union[Checkpoint, Ensemble], Tuple]:
+        # Stat before reading, so a write that lands mid-load is picked up on the next check.
+        watched, signature = list(self._watched), self._file_signature()
+        if self.follows_default_checkpoint:
+            self.checkpoint_path = signature[0]
+        model = self._load_checkpoint(self.checkpoint_path)
+        if self._watched != watched:
+            signature = self._file_signature()
+        return model, signature
+
+    def _load_checkpoint(self, checkpoint_path: Path) -> Union[Checkpoint, Ensemble]:
+        if not checkpoint_path.exists():
+            return default_checkpoint()
+        if is_ensemble(checkpoint_path):
+            ensemble = load_ensemble(checkpoint_path)
+            self._watched = [checkpoint_path, *ensemble.member_paths]
+            return ensemble
+        self._watched = [checkpoint_path]
+        checkpoint = load_checkpoint(checkpoint_path, default=default_checkpoint())
+        if len(checkpoint.labels) != checkpoint.weights.shape[0] or checkpoint.bias.shape != (len(checkpoint.labels),):
+            raise ValueError(f"{checkpoint_path}: labels, weights and bias disagree on the number of classes.")
+        expected = EmbeddingConfig.from_dict(checkpoint.features).dim
+        if checkpoint.weights.shape[1] != expected:
+            raise ValueError(f"{checkpoint_path}: weights take {checkpoint.weights.shape[1]} features, its feature config gives {expected}.")
+        return checkpoint
 
     def _softmax(self, logits: np.ndarray) -> np.ndarray:
-        shifted = logits - np.max(logits)
+        shifted = logits - np.max(logits, axis=-1, keepdims=True)
         exp = np.exp(shifted)
-        denom = np.sum(exp) + 1e-9
+        denom = np.sum(exp, axis=-1, keepdims=True) + 1e-9
         return exp / denom
 
-    def predict_from_file(self, file_path: Path) -> Dict:
-        sample_rate, audio = load_audio_mono(file_path)
-        feats = compute_features(audio, sample_rate)
-        vec = to_feature_vector(feats)
-        logits = np.dot(self.weights, vec) + self.bias
-        probs = self._softmax(logits)
+    def _logits(self, vectors: np.ndarray, model: Optional[Checkpoint] = None) -> np.ndarray:
+        model = model or self.model
+        if model.feature_mean is not None:
+            vectors = (vectors - model.feature_mean) / model.feature_std
+        # (N, F) x (C, F) -> (N, C) in one op. einsum keeps each row's reduction order
+        # independent of N, so batched results are bit-identical to single-clip ones.
+        return np.einsum("nf,cf->nc", vectors, model.weights) + model.bias
+
+    def _probabilities(self, vectors: Dict[EmbeddingConfig, np.ndarray], model: Union[Checkpoint, Ensemble]) -> np.ndarray:
+        with stage("predict.score"):
+            if isinstance(model, Ensemble):
+                return model.predict_proba(vectors)
+            return self._softmax(self._logits(next(iter(vectors.values())), model))
+
+    def _format_prediction(self, probs: np.ndarray, feats: Dict[str, float], labels: List[str]) -> Dict:
         top_idx = int(np.argmax(probs))
-        label = self.labels[top_idx]
+        label = labels[top_idx]
         return {
             "label": label,
-            "probs": {lbl: float(prob) for lbl, prob in zip(self.labels, probs)},
+            "probs": {lbl: float(prob) for lbl, prob in zip(labels, probs)},
             "confidence": float(probs[top_idx]),
             "features": feats,
         }
+
+    def predict_from_file(self, file_path: Path) -> Dict:
+        if self.cache is None:
+            return self.predict_batch([file_path])[0]
+        return self.predict_from_bytes(Path(file_path).read_bytes())
+
+    def predict_from_bytes(self, payload: bytes) -> Dict:
+        if self.cache is None:
+            return self.predict_batch([payload])[0]
+        key = self.cache.key(payload, self.checkpoint_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.predict_batch([payload])[0]
+        self.cache.put(key, result)
+        return result
+
+    def predict_batch(self, inputs: Sequence[Union[Path, str, bytes, np.ndarray]], sample_rate: int = 16000) -> List[Dict]:
+        """
+        Score many clips at once. Items are file paths, encoded file bytes, or mono waveforms
+        at `sample_rate` (resampled to 16 kHz here).
+        """
+        if len(inputs) == 0:
+            return []
+        model = self.model
+        configs = self._feature_configs(model)
+        all_feats = []
+        rows: Dict[EmbeddingConfig, List[np.ndarray]] = {config: [] for config in configs}
+        for item in inputs:
+            sr, audio = self._load(item, sample_rate)
+            feats = compute_features(audio, sr)
+            all_feats.append(feats)
+            for config in configs:
+                if config.mode == "basic":
+                    rows[config].append(to_feature_vector(feats))
+                    continue
+                with stage("features.embedding"):
+                    rows[config].append(extract_embedding(audio, sr, config))
+        return self._predict_vectors({config: np.stack(vecs) for config, vecs in rows.items()}, all_feats, model)
+
+    def _load(self, item: Union[Path, str, bytes, np.ndarray], sample_rate: int = 16000) -> Tuple[int, np.ndarray]:
+        if isinstance(item, np.ndarray):
+            # Waveforms get the same resampling and normalization as decoded files, so a
+            # clip scores the same whichever way (and at whatever rate) it arrives.
+            return prepare_waveform(item, sample_rate)
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            return load_audio_mono_from_bytes(item)
+        return load_audio_mono(Path(item))
+
+    def fingerprint(self, source: Union[Path, str, bytes, np.ndarray], sample_rate: int = 16000) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Landmark hashes and anchor frames of a clip (see src/features/fingerprint.py).
+        """
+        sr, audio = self._load(source, sample_rate)
+        return fingerprint(audio, sr)
+
+    def predict_timeline(
+        self,
+        source: Union[Path, str, bytes, np.ndarray],
+        window_seconds: float = 1.0,
+        hop_seconds: float = 0.5,
+        sample_rate: int = 16000,
+    ) -> Dict:
+        """
+        Score fixed windows across a clip and merge same-label neighbours into events.
+        """
+        if window_seconds <= 0 or hop_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive.")
+        model = self.model
+        sr, audio = self._load(source, sample_rate)
+        window = max(int(round(window_seconds * sr)), 1)
+        hop = max(int(round(hop_seconds * sr)), 1)
+        starts = frame_starts(len(audio), window, hop)
+
+        with stage("features.windowed"):
+            matrices = {
+                config: to_feature_matrix(compute_features_framed(audio, sr, window, hop))
+                if config.mode == "basic"
+                else windowed_embeddings(audio, sr, config, window, hop)
+                for config in self._feature_configs(model)
+            }
+        window = min(window, len(audio))
+        probs = self._probabilities(matrices, model)
+        top = np.argmax(probs, axis=1)
+        segments = [
+            {
+                "start": float(start) / sr,
+                "end": float(start + window) / sr,
+                "label": model.labels[idx],
+                "confidence": float(row[idx]),
+                "probs": {lbl: float(prob) for lbl, prob in zip(model.labels, row)},
+            }
+            for start, idx, row in zip(starts, top, probs)
+        ]
+        return {
+            "sample_rate": sr,
+            "window_seconds": window / sr,
+            "hop_seconds": hop / sr,
+            "segments": segments,
+            "events": merge_events(segments),
+        }
+
+    def predict_streaming(self, file_path: Path, target_sr: int = 16000, block_size: int = 1 << 16) -> Dict:
+        """
+        Constant-memory scoring for long recordings; see StreamingFeatureAccumulator
+        and EmbeddingAccumulator.
+        """
+        model = self.model
+        basic = StreamingFeatureAccumulator(target_sr)
+        framed = {
+            config: EmbeddingAccumulator(target_sr, config) for config in self._feature_configs(model) if config.mode != "basic"
+        }
+        for block in iter_audio_blocks(file_path, target_sr, block_size):
+            basic.update(block)
+            for accumulator in framed.values():
+                accumulator.update(block)
+        feats = basic.result()
+        vectors = {
+            config: (to_feature_vector(feats) if config.mode == "basic" else framed[config].result())[None, :]
+            for config in self._feature_configs(model)
+        }
+        return self._predict_vectors(vectors, [feats], model)[0]
+
+    def _predict_vectors(
+        self,
+        vectors: Dict[EmbeddingConfig, np.ndarray],
+        all_feats: List[Dict[str, float]],
+        model: Union[Checkpoint, Ensemble],
+    ) -> List[Dict]:
+        probs = self._probabilities(vectors, model)
+        return [self._format_prediction(row, feats, model.labels) for row, feats in zip(probs, all_feats)]
@@ -0,0 +1,97 @@
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.preprocess.audio_preprocess import normalize_audio
+
+ENCODINGS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+
+
+class RingBuffer:
+    """Fixed-size float32 sample buffer; writes past capacity overwrite the oldest audio."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0  # samples ever written
+
+    def write(self, samples: np.ndarray) -> None:
+        # Only the last `capacity` samples can survive; place them where they would have landed.
+        kept = samples[-self.capacity :]
+        pos = (self.total + len(samples) - len(kept)) % self.capacity
+        first = min(len(kept), self.capacity - pos)
+        self._data[pos : pos + first] = kept[:first]
+        self._data[: len(kept) - first] = kept[first:]
+        self.total += len(samples)
+
+    def read(self, end: int, length: int) -> np.ndarray:
+        """Copy of samples [end - length, end); they must still be in the buffer."""
+        if end > self.total or end - length < max(self.total - self.capacity, 0):
+            raise ValueError("Requested samples are not in the buffer.")
+        start = (end - length) % self.capacity
+        if start + length <= self.capacity:
+            return self._data[start : start + length].copy()
+        return np.concatenate([self._data[start:], self._data[: start + length - self.capacity]])
+
+
+def decode_chunk(payload: bytes, encoding: str) -> np.ndarray:
+    """Mono PCM bytes -> float32 in [-1, 1]."""
+    dtype = ENCODINGS[encoding]
+    if len(payload) % dtype.itemsize:
+        raise ValueError(f"{encoding} chunk length must be a multiple of {dtype.itemsize} bytes.")
+    samples = np.frombuffer(payload, dtype=dtype)
+    if dtype.kind == "i":
+        return samples.astype(np.float32) / np.float32(32768.0)
+    return samples.astype(np.float32)
+
+
+class StreamSession:
+    """
+    Per-connection state for live scoring: a ring buffer holding `max_lag_hops` hops
+    beyond one window, and the hop schedule. Windows end every `hop` samples once the
+    first full window has arrived.
+
+    Scoring is pull-based: `next_window` hands out the newest complete window and counts
+    any older ones it skips as dropped, so a slow consumer costs accuracy, not memory.
+    """
+
+    def __init__(self, sample_rate: int = 16000, window_seconds: float = 1.0, hop_seconds: float = 0.5, max_lag_hops: int = 4):
+        if window_seconds <= 0 or hop_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive.")
+        self.sample_rate = sample_rate
+        self.window = max(int(round(window_seconds * sample_rate)), 1)
+        self.hop = max(int(round(hop_seconds * sample_rate)), 1)
+        self.buffer = RingBuffer(self.window + max_lag_hops * self.hop)
+        self.next_index = 0  # index of the next window to score
+        self.dropped = 0
+        self.completed_at: Optional[float] = None  # monotonic arrival time of the chunk completing the newest window
+
+    def _available(self) -> int:
+        # Number of windows whose last sample has arrived.
+        if self.buffer.total < self.window:
+            return 0
+        return (self.buffer.total - self.window) // self.hop + 1
+
+    def push(self, samples: np.ndarray) -> bool:
+        """Append samples; True if at least one new window is ready."""
+        before = self._available()
+        self.buffer.write(samples)
+        ready = self._available() > before
+        if ready:
+            self.completed_at = time.monotonic()
+        return self._available() > self.next_index
+
+    def next_window(self) -> Optional[Tuple[int, np.ndarray]]:
+        available = self._available()
+        if available <= self.next_index:
+            return None
+        index = available - 1
+        self.dropped += index - self.next_index
+        self.next_index = index + 1
+        end = index * self.hop + self.window
+        return index, normalize_audio(self.buffer.read(end, self.window))
+
+    def skip(self) -> None:
+        """Count a window handed out by next_window that could not be scored."""
+        self.dropped += 1
@@ -0,0 +1,24 @@
+from typing import Dict, List
+
+
+def merge_events(segments: List[Dict]) -> List[Dict]:
+    """
+    Collapse runs of adjacent segments sharing a label into events.
+
+    Segments must be in time order; with overlapping windows an event ends where its
+    last segment ends. Event confidence is the mean top-class probability of the run.
+    """
+    events: List[Dict] = []
+    run_confidences: List[float] = []
+    for segment in segments:
+        if events and events[-1]["label"] == segment["label"]:
+            events[-1]["end"] = segment["end"]
+        else:
+            if events:
+                events[-1]["confidence"] = sum(run_confidences) / len(run_confidences)
+            events.append({"start": segment["start"], "end": segment["end"], "label": segment["label"]})
+            run_confidences = []
+        run_confidences.append(segment["confidence"])
+    if events:
+        events[-1]["confidence"] = sum(run_confidences) / len(run_confidences)
+    return events
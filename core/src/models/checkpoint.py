@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MAGIC = b"CSCKPT\x00\x00"
+FORMAT_VERSION = 1
+BINARY_SUFFIX = ".ckpt"
+_ALIGN = 64
+_PREFIX = struct.Struct("<8sII")  # magic, format version, header length
+_ARRAY_FIELDS = ("weights", "bias", "feature_mean", "feature_std")
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    labels: List[str]
+    weights: np.ndarray  # (classes, features)
+    bias: np.ndarray  # (classes,)
+    feature_mean: Optional[np.ndarray] = None
+    feature_std: Optional[np.ndarray] = None
+    content_hash: str = ""
+    features: Optional[Dict] = None  # EmbeddingConfig.to_dict(); None means the basic 3-feature vector
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in _ARRAY_FIELDS if getattr(self, name) is not None}
+
+
+def content_hash(labels: List[str], arrays: Dict[str, np.ndarray], features: Optional[Dict] = None) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(labels).encode("utf-8"))
+    if features:
+        digest.update(json.dumps(features, sort_keys=True).encode("utf-8"))
+    for name in _ARRAY_FIELDS:
+        if name in arrays:
+            array = np.ascontiguousarray(arrays[name], dtype=np.float32)
+            digest.update(f"{name}:{array.shape}".encode("utf-8"))
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def make_checkpoint(labels: List[str], weights, bias, feature_mean=None, feature_std=None, features=None) -> Checkpoint:
+    arrays = {
+        name: np.asarray(value, dtype=np.float32)
+        for name, value in zip(_ARRAY_FIELDS, (weights, bias, feature_mean, feature_std))
+        if value is not None
+    }
+    features = dict(features) if features else None
+    return Checkpoint(
+        labels=list(labels), **arrays, content_hash=content_hash(list(labels), arrays, features), features=features
+    )
+
+
+def save_json(path: Path, checkpoint: Checkpoint) -> None:
+    payload = {"labels": checkpoint.labels}
+    payload.update({name: array.tolist() for name, array in checkpoint.arrays().items()})
+    if checkpoint.features:
+        payload["features"] = checkpoint.features
+    # Written aside and renamed into place, as save_binary does, so a watching server
+    # never reads a half-written file.
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_json(path: Path, default: Optional[Checkpoint] = None) -> Checkpoint:
+    with Path(path).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    fallback = default.arrays() if default is not None else {}
+    return make_checkpoint(
+        data.get("labels", default.labels if default is not None else []),
+        data.get("weights", fallback.get("weights")),
+        data.get("bias", fallback.get("bias")),
+        data.get("feature_mean"),
+        data.get("feature_std"),
+        data.get("features"),
+    )
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def save_binary(path: Path, checkpoint: Checkpoint) -> None:
+    """
+    Layout: fixed prefix (magic, version, header length), a JSON header describing
+    labels, hash and each array's dtype/shape/offset, then the raw little-endian
+    float32 arrays, each 64-byte aligned so they can be memory-mapped directly.
+    """
+    arrays = {name: np.ascontiguousarray(array, dtype="<f4") for name, array in checkpoint.arrays().items()}
+    entries = {}
+    header = {"labels": checkpoint.labels, "content_hash": checkpoint.content_hash, "arrays": entries}
+    if checkpoint.features:
+        header["features"] = checkpoint.features
+    # Offsets depend on the header size, which depends on the offsets; settle it in two passes.
+    data_start = 0
+    for _ in range(2):
+        offset = data_start
+        for name, array in arrays.items():
+            entries[name] = {"dtype": "<f4", "shape": list(array.shape), "offset": offset}
+            offset = _aligned(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = _aligned(_PREFIX.size + len(header_bytes) + _ALIGN)
+    assert _PREFIX.size + len(header_bytes) <= min((e["offset"] for e in entries.values()), default=data_start)
+
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(entries[name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+
+
+def load_binary(path: Path, verify: bool = False) -> Checkpoint:
+    """
+    Memory-map a binary checkpoint. Array pages are only read when first touched;
+    `verify=True` re-hashes the arrays (which reads them all) and checks the header hash.
+    """
+    path = Path(path)
+    with path.open("rb") as f:
+        magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a CheetahSense binary checkpoint.")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}; this build reads up to {FORMAT_VERSION}.")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    arrays = {
+        # Plain ndarray views keep the mapping alive without memmap subclass propagation.
+        name: np.memmap(path, dtype=entry["dtype"], mode="r", offset=entry["offset"], shape=tuple(entry["shape"])).view(np.ndarray)
+        for name, entry in header["arrays"].items()
+    }
+    checkpoint = Checkpoint(
+        labels=header["labels"], **arrays, content_hash=header["content_hash"], features=header.get("features")
+    )
+    if verify and content_hash(checkpoint.labels, arrays, checkpoint.features) != checkpoint.content_hash:
+        raise ValueError(f"{path} failed its content hash check.")
+    return checkpoint
+
+
+def is_binary(path: Path) -> bool:
+    with Path(path).open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_checkpoint(path: Path, default: Optional[Checkpoint] = None) -> Checkpoint:
+    if is_binary(path):
+        return load_binary(path)
+    return load_json(path, default=default)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.features.spectral import EmbeddingConfig
+from src.models.checkpoint import Checkpoint, is_binary, load_checkpoint
+from src.models.fusion_model import RuleBasedFusionModel
+
+
+@dataclass(frozen=True)
+class MemberGroup:
+    """Members that share a feature config, stacked as (members, classes, features)."""
+
+    config: EmbeddingConfig
+    indices: np.ndarray  # positions in the ensemble's member order
+    weights: np.ndarray
+    bias: np.ndarray  # (members, classes)
+
+
+@dataclass(frozen=True)
+class Ensemble:
+    """
+    N linear checkpoints evaluated together and combined by a RuleBasedFusionModel.
+
+    Each member's normalization stats are folded into its weights at load time, and
+    members are grouped by feature config, so scoring is one einsum per distinct
+    config (usually one) however many members there are.
+    """
+
+    labels: List[str]
+    groups: List[MemberGroup]
+    fusion: RuleBasedFusionModel
+    member_paths: List[Path]
+    content_hash: str
+
+    @property
+    def num_members(self) -> int:
+        return self.fusion.num_models
+
+    @property
+    def feature_configs(self) -> List[EmbeddingConfig]:
+        return [group.config for group in self.groups]
+
+    def member_log_probs(self, vectors: Dict[EmbeddingConfig, np.ndarray]) -> np.ndarray:
+        """(members, N, classes) log-probabilities from each config's (N, features) matrix."""
+        n = len(next(iter(vectors.values())))
+        out = np.empty((self.num_members, n, len(self.labels)), dtype=np.float64)
+        for group in self.groups:
+            logits = np.einsum("nf,mcf->mnc", vectors[group.config], group.weights) + group.bias[:, None, :]
+            shifted = logits - np.max(logits, axis=-1, keepdims=True)
+            out[group.indices] = shifted - np.log(np.sum(np.exp(shifted), axis=-1, keepdims=True))
+        return out
+
+    def predict_proba(self, vectors: Dict[EmbeddingConfig, np.ndarray]) -> np.ndarray:
+        return self.fusion.fuse_log_probs(self.member_log_probs(vectors))
+
+
+def _folded(checkpoint: Checkpoint, labels: List[str]):
+    # Reorder rows to the ensemble's label order and fold (x - mean) / std into W and b.
+    order = [checkpoint.labels.index(label) for label in labels]
+    weights = np.asarray(checkpoint.weights, dtype=np.float64)[order]
+    bias = np.asarray(checkpoint.bias, dtype=np.float64)[order]
+    if checkpoint.feature_mean is not None:
+        weights = weights / checkpoint.feature_std
+        bias = bias - weights @ checkpoint.feature_mean
+    return weights, bias
+
+
+def is_ensemble(path: Path) -> bool:
+    path = Path(path)
+    if path.suffix != ".json" or is_binary(path):
+        return False
+    with path.open("r", encoding="utf-8") as f:
+        return "members" in json.load(f)
+
+
+def build_ensemble(checkpoints: List[Checkpoint], fusion: RuleBasedFusionModel, member_paths: Optional[List[Path]] = None) -> Ensemble:
+    if not checkpoints:
+        raise ValueError("An ensemble needs at least one member.")
+    if fusion.num_models != len(checkpoints):
+        raise ValueError(f"Fusion is set up for {fusion.num_models} models, got {len(checkpoints)} members.")
+    labels = list(checkpoints[0].labels)
+    for checkpoint in checkpoints[1:]:
+        if sorted(checkpoint.labels) != sorted(labels):
+            raise ValueError(f"Ensemble members disagree on labels: {checkpoint.labels} vs {labels}.")
+
+    by_config: Dict[EmbeddingConfig, List[int]] = {}
+    for i, checkpoint in enumerate(checkpoints):
+        by_config.setdefault(EmbeddingConfig.from_dict(checkpoint.features), []).append(i)
+    groups = []
+    for config, indices in by_config.items():
+        folded = [_folded(checkpoints[i], labels) for i in indices]
+        if any(weights.shape[1] != config.dim for weights, _ in folded):
+            raise ValueError(f"A member's weights don't match its {config.mode} feature dimension {config.dim}.")
+        groups.append(
+            MemberGroup(
+                config=config,
+                indices=np.asarray(indices),
+                weights=np.stack([weights for weights, _ in folded]),
+                bias=np.stack([bias for _, bias in folded]),
+            )
+        )
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({"labels": labels, "fusion": fusion.to_dict()}, sort_keys=True).encode("utf-8"))
+    for checkpoint in checkpoints:
+        digest.update(checkpoint.content_hash.encode("utf-8"))
+    return Ensemble(
+        labels=labels,
+        groups=groups,
+        fusion=fusion,
+        member_paths=list(member_paths or []),
+        content_hash=digest.hexdigest(),
+    )
+
+
+def load_ensemble(path: Path) -> Ensemble:
+    """
+    Manifest: {"members": [checkpoint paths, relative to the manifest], "fusion": "mean" |
+    "weighted" | "log_mean" | "stacking", plus "weights" and "stacking_weights"/"stacking_bias"
+    as RuleBasedFusionModel takes them}.
+    """
+    path = Path(path)
+    with path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    member_paths = [path.parent / member for member in manifest["members"]]
+    checkpoints = [load_checkpoint(member) for member in member_paths]
+    fusion = RuleBasedFusionModel(
+        num_models=len(checkpoints),
+        method=manifest.get("fusion", "mean"),
+        weights=manifest.get("weights"),
+        stacking_weights=manifest.get("stacking_weights"),
+        stacking_bias=manifest.get("stacking_bias"),
+    )
+    return build_ensemble(checkpoints, fusion, member_paths)
+
+
+def save_manifest(path: Path, members: List[str], fusion: RuleBasedFusionModel) -> None:
+    payload = {"members": list(members), "fusion": fusion.method, **fusion.to_dict()}
+    payload.pop("method")
+    with Path(path).open("w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
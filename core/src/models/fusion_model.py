@@ -1,16 +1,98 @@
+from typing import Optional, Sequence
+
 import numpy as np
 
+from src.models.softmax_regression import fit_softmax_regression
+
+FUSION_METHODS = ("mean", "weighted", "log_mean", "stacking")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / np.sum(exp, axis=-1, keepdims=True)
+
 
 class RuleBasedFusionModel:
     """
-    Minimal fusion placeholder that averages probability vectors.
+    Combines per-model class probabilities.
+
+    - "mean": plain average of probabilities.
+    - "weighted": average with per-model `weights` (normalized to sum to 1).
+    - "log_mean": weighted average of log-probabilities, renormalized (a geometric mean);
+      one confident dissenting model counts for more than under "mean".
+    - "stacking": a learned softmax layer over every model's log-probabilities,
+      `stacking_weights` (classes, models * classes) and `stacking_bias` (classes,).
     """
 
-    def __init__(self, num_models: int = 1):
+    def __init__(
+        self,
+        num_models: int = 1,
+        method: str = "mean",
+        weights: Optional[Sequence[float]] = None,
+        stacking_weights: Optional[np.ndarray] = None,
+        stacking_bias: Optional[np.ndarray] = None,
+    ):
+        if method not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method {method!r}; expected one of {FUSION_METHODS}.")
         self.num_models = num_models
+        self.method = method
+        # Without explicit weights, "mean" and "log_mean" fuse any number of models equally.
+        self.uniform = weights is None
+        if weights is None:
+            weights = np.ones(num_models)
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (num_models,) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError(f"Fusion weights must be {num_models} non-negative values with a positive sum.")
+        self.weights = weights / weights.sum()
+        if method == "stacking":
+            if stacking_weights is None or stacking_bias is None:
+                raise ValueError("Stacking fusion needs stacking_weights and stacking_bias.")
+            self.stacking_weights = np.asarray(stacking_weights, dtype=np.float64)
+            self.stacking_bias = np.asarray(stacking_bias, dtype=np.float64)
+            if self.stacking_weights.shape[1] != num_models * len(self.stacking_bias):
+                raise ValueError("stacking_weights must be (classes, num_models * classes).")
 
     def fuse(self, prob_vectors: list[np.ndarray]) -> np.ndarray:
         if not prob_vectors:
             raise ValueError("No probability vectors provided.")
         stacked = np.stack(prob_vectors, axis=0)
-        return np.mean(stacked, axis=0)
+        if self.method in ("mean", "weighted"):
+            return np.tensordot(self._weights_for(len(stacked)), stacked, axes=1)
+        return self.fuse_log_probs(np.log(np.maximum(stacked, 1e-12)))
+
+    def _weights_for(self, count: int) -> np.ndarray:
+        if count == self.num_models:
+            return self.weights
+        if self.uniform and self.method != "stacking":
+            return np.full(count, 1.0 / count)
+        raise ValueError(f"Fusion model has weights for {self.num_models} models, got {count} probability vectors.")
+
+    def fuse_log_probs(self, log_probs: np.ndarray) -> np.ndarray:
+        """(models, N, classes) log-probabilities -> (N, classes) fused probabilities."""
+        weights = self._weights_for(log_probs.shape[0])
+        if self.method in ("mean", "weighted"):
+            return np.tensordot(weights, np.exp(log_probs), axes=1)
+        if self.method == "log_mean":
+            return _softmax(np.tensordot(weights, log_probs, axes=1))
+        # (M, N, C) -> (N, M * C), model-major to match stacking_weights' columns.
+        features = np.moveaxis(log_probs, 0, -2).reshape(*log_probs.shape[1:-1], -1)
+        return _softmax(features @ self.stacking_weights.T + self.stacking_bias)
+
+    def to_dict(self) -> dict:
+        data = {"method": self.method, "weights": self.weights.tolist()}
+        if self.method == "stacking":
+            data["stacking_weights"] = self.stacking_weights.tolist()
+            data["stacking_bias"] = self.stacking_bias.tolist()
+        return data
+
+
+def fit_stacking(log_probs: np.ndarray, targets: np.ndarray, **fit_kwargs) -> RuleBasedFusionModel:
+    """
+    Learn stacking fusion from members' (models, N, classes) log-probabilities on
+    labelled clips, ideally ones the members were not trained on.
+    """
+    num_models, _, num_classes = log_probs.shape
+    features = np.moveaxis(log_probs, 0, -2).reshape(log_probs.shape[1], -1)
+    result = fit_softmax_regression(features, targets, num_classes=num_classes, **fit_kwargs)
+    return RuleBasedFusionModel(num_models, "stacking", stacking_weights=result.weights, stacking_bias=result.bias)
@@ -0,0 +1,164 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class EpochStats:
+    epoch: int
+    loss: float
+    train_accuracy: float
+    val_loss: Optional[float]
+    val_accuracy: Optional[float]
+    seconds: float
+
+
+@dataclass
+class TrainResult:
+    weights: np.ndarray  # (classes, features)
+    bias: np.ndarray  # (classes,)
+    best_epoch: int
+    history: List[EpochStats] = field(default_factory=list)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - np.max(logits, axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / np.sum(exp, axis=1, keepdims=True)
+
+
+def predict_logits(features: np.ndarray, weights: np.ndarray, bias: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    out = np.empty((len(features), len(bias)), dtype=np.float64)
+    for start in range(0, len(features), chunk):
+        out[start : start + chunk] = np.asarray(features[start : start + chunk], dtype=np.float64) @ weights.T + bias
+    return out
+
+
+def accuracy(features: np.ndarray, targets: np.ndarray, weights: np.ndarray, bias: np.ndarray) -> float:
+    if len(targets) == 0:
+        return 0.0
+    return float(np.mean(np.argmax(predict_logits(features, weights, bias), axis=1) == targets))
+
+
+def evaluate(features: np.ndarray, targets: np.ndarray, weights: np.ndarray, bias: np.ndarray) -> Tuple[float, float]:
+    probs = _softmax(predict_logits(features, weights, bias))
+    loss = -float(np.mean(np.log(probs[np.arange(len(targets)), targets] + 1e-12)))
+    return loss, float(np.mean(np.argmax(probs, axis=1) == targets))
+
+
+def column_stats(features: np.ndarray, rows: np.ndarray, chunk: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    # Mean and std over `rows`, read in chunks so memmaps are never loaded whole.
+    total = np.zeros(features.shape[1], dtype=np.float64)
+    total_sq = np.zeros(features.shape[1], dtype=np.float64)
+    for start in range(0, len(rows), chunk):
+        x = np.asarray(features[rows[start : start + chunk]], dtype=np.float64)
+        total += x.sum(axis=0)
+        total_sq += np.square(x).sum(axis=0)
+    mean = total / max(len(rows), 1)
+    std = np.sqrt(np.maximum(total_sq / max(len(rows), 1) - mean * mean, 0.0))
+    return mean, np.where(std > 1e-8, std, 1.0)
+
+
+def split_indices(n: int, validation_split: float, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.random.default_rng(seed).permutation(n)
+    n_val = int(n * validation_split)
+    # Keep at least one training row; tiny datasets simply skip validation.
+    n_val = min(n_val, n - 1) if n > 1 else 0
+    return np.sort(order[n_val:]), np.sort(order[:n_val])
+
+
+def fit_softmax_regression(
+    features: np.ndarray,
+    targets: np.ndarray,
+    num_classes: int,
+    epochs: int = 100,
+    learning_rate: float = 0.1,
+    batch_size: int = 256,
+    l2: float = 1e-4,
+    validation_split: float = 0.2,
+    patience: int = 10,
+    seed: int = 0,
+    on_epoch: Optional[Callable[[EpochStats], None]] = None,
+    rows: Optional[np.ndarray] = None,
+    standardize: bool = True,
+) -> TrainResult:
+    """
+    Multinomial logistic regression by mini-batch gradient descent with L2 and early
+    stopping on a held-out split.
+
+    `features` may be an np.memmap: rows are only read a batch at a time, so the
+    matrix never has to fit in memory. `batch_size <= 0` means full-batch.
+
+    `rows` restricts training (and the validation split) to those rows of `features`,
+    e.g. a cross-validation fold, without copying them out.
+
+    Training runs on standardized features unless `standardize=False`; the mean/std are
+    folded back into the returned weights and bias, so they apply directly to raw
+    feature vectors.
+    """
+    n_features = features.shape[1]
+    targets = np.asarray(targets, dtype=np.int64)
+    rows = np.arange(len(features)) if rows is None else np.sort(np.asarray(rows, dtype=np.int64))
+    train_idx, val_idx = split_indices(len(rows), validation_split, seed)
+    train_idx, val_idx = rows[train_idx], rows[val_idx]
+    rng = np.random.default_rng(seed)
+    if batch_size <= 0 or batch_size > len(train_idx):
+        batch_size = len(train_idx)
+
+    if standardize:
+        mean, std = column_stats(features, train_idx)
+    else:
+        mean, std = np.zeros(n_features), np.ones(n_features)
+
+    weights = np.zeros((num_classes, n_features), dtype=np.float64)
+    bias = np.zeros(num_classes, dtype=np.float64)
+    best = (weights.copy(), bias.copy(), 0)
+    best_score = -np.inf
+    stale = 0
+    history: List[EpochStats] = []
+
+    val_x = (np.asarray(features[val_idx], dtype=np.float64) - mean) / std if len(val_idx) else None
+    val_y = targets[val_idx]
+
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        order = train_idx[rng.permutation(len(train_idx))]
+        total_loss = 0.0
+        correct = 0
+        for b in range(0, len(order), batch_size):
+            # Sorted row order keeps memmap reads mostly sequential.
+            idx = np.sort(order[b : b + batch_size])
+            x = (np.asarray(features[idx], dtype=np.float64) - mean) / std
+            y = targets[idx]
+            probs = _softmax(x @ weights.T + bias)
+            total_loss -= float(np.sum(np.log(probs[np.arange(len(y)), y] + 1e-12)))
+            correct += int(np.sum(np.argmax(probs, axis=1) == y))
+
+            probs[np.arange(len(y)), y] -= 1.0
+            probs /= len(y)
+            weights -= learning_rate * (probs.T @ x + l2 * weights)
+            bias -= learning_rate * probs.sum(axis=0)
+
+        train_loss = total_loss / len(order) + 0.5 * l2 * float(np.sum(weights * weights))
+        train_acc = correct / len(order)
+        val_loss, val_acc = evaluate(val_x, val_y, weights, bias) if val_x is not None else (None, None)
+        stats = EpochStats(epoch, train_loss, train_acc, val_loss, val_acc, time.perf_counter() - start)
+        history.append(stats)
+        if on_epoch is not None:
+            on_epoch(stats)
+
+        score = -(val_loss if val_loss is not None else train_loss)
+        if score > best_score:
+            best_score = score
+            best = (weights.copy(), bias.copy(), epoch)
+            stale = 0
+        else:
+            stale += 1
+            if patience > 0 and stale >= patience:
+                break
+
+    # w·((x - mean) / std) + b == (w / std)·x + (b - (w / std)·mean)
+    folded = best[0] / std
+    return TrainResult(weights=folded, bias=best[1] - folded @ mean, best_epoch=best[2], history=history)
@@ -1,27 +1,91 @@
 from pathlib import Path
-from typing import Tuple
+from typing import Iterator, Tuple
 
 import numpy as np
-from scipy import signal
-from scipy.io import wavfile
 
+from src.preprocess.decode import AudioSource, decode_audio, pcm_to_float32
+from src.preprocess.resample import DEFAULT_QUALITY, design_plan, resample, resample_ratio
+from src.utils.metrics import stage
 
-def normalize_audio(audio: np.ndarray) -> np.ndarray:
-    peak = np.max(np.abs(audio)) + 1e-9
-    return (audio / peak).astype(np.float32)
 
+def normalize_audio(audio: np.ndarray, copy: bool = True) -> np.ndarray:
+    # copy=False divides a float32 array in place. max/min rather than abs() so
+    # finding the peak doesn't allocate a waveform-sized temporary.
+    peak = max(float(np.max(audio)), -float(np.min(audio))) + 1e-9 if audio.size else 1e-9
+    if not copy and audio.dtype == np.float32:
+        return np.divide(audio, np.float32(peak), out=audio)
+    return (audio / np.float32(peak)).astype(np.float32, copy=False)
 
-def load_audio_mono(file_path: Path, target_sr: int = 16000) -> Tuple[int, np.ndarray]:
-    sr, data = wavfile.read(file_path)
-    if data.ndim > 1:
-        data = np.mean(data, axis=1)
-    data = data.astype(np.float32)
-    # Convert integer PCM to [-1,1]
-    if data.dtype != np.float32:
-        max_val = np.iinfo(data.dtype).max
-        data = data / float(max_val)
+
+def load_audio_mono(
+    file_path: AudioSource,
+    target_sr: int = 16000,
+    quality: str = DEFAULT_QUALITY,
+) -> Tuple[int, np.ndarray]:
+    """
+    Decode (see src/preprocess/decode.py), resample to target_sr and peak-normalize.
+    Accepts a path, bytes-like payload or binary file object.
+    """
+    with stage("audio.decode"):
+        sr, data = decode_audio(file_path)
+    # decode_audio returns a fresh buffer, so it may be normalized in place.
+    return prepare_waveform(data, sr, target_sr, quality, copy=False)
+
+
+def prepare_waveform(
+    audio: np.ndarray,
+    sr: int,
+    target_sr: int = 16000,
+    quality: str = DEFAULT_QUALITY,
+    copy: bool = True,
+) -> Tuple[int, np.ndarray]:
+    """
+    Resample an already decoded mono waveform to target_sr and peak-normalize it, as
+    load_audio_mono does after decoding. copy=False may normalize `audio` in place.
+    """
     if sr != target_sr:
-        data = signal.resample_poly(data, target_sr, sr)
+        with stage("audio.resample"):
+            audio = resample(audio, sr, target_sr, quality)
         sr = target_sr
-    data = normalize_audio(data)
-    return sr, data
+        copy = False  # resample returned a fresh buffer
+    return sr, normalize_audio(audio, copy=copy)
+
+
+def load_audio_mono_from_bytes(payload: bytes, target_sr: int = 16000) -> Tuple[int, np.ndarray]:
+    return load_audio_mono(payload, target_sr=target_sr)
+
+
+def iter_audio_blocks(
+    file_path: Path,
+    target_sr: int = 16000,
+    block_size: int = 1 << 16,
+    quality: str = DEFAULT_QUALITY,
+) -> Iterator[np.ndarray]:
+    """
+    Yield the mono, resampled (not normalized) waveform of a WAV file in blocks.
+
+    The file is memory-mapped and resampled block by block with enough input context
+    on each side that the concatenated output equals a whole-file resample_poly.
+    """
+    from scipy.io import wavfile
+
+    sr, data = wavfile.read(file_path, mmap=True)
+    n = data.shape[0]
+    if sr == target_sr:
+        for start in range(0, n, block_size):
+            yield pcm_to_float32(data[start : start + block_size])
+        return
+
+    up, down = resample_ratio(sr, target_sr)
+    # Blocks start on multiples of `down`, so each maps onto a whole number of output samples.
+    block = max(block_size // down, 1) * down
+    # Input samples the FIR reaches on either side of an output sample, rounded up to whole blocks of `down`.
+    reach = len(design_plan(up, down, quality).taps) // up + 2
+    context = -(-reach // down) * down
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        lo, hi = max(start - context, 0), min(stop + context, n)
+        resampled = resample(pcm_to_float32(data[lo:hi]), sr, target_sr, quality)
+        offset = (start - lo) * up // down
+        count = -(-stop * up // down) - start * up // down
+        yield resampled[offset : offset + count]
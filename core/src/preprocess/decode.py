@@ -0,0 +1,195 @@
+"""
+Audio decoding: encoded clip (path or bytes) -> (sample_rate, mono float32 in [-1, 1]).
+
+WAV is parsed here: the samples are a zero-copy view of the file (memory-mapped) or of
+the payload, and are downmixed and scaled straight into one preallocated float32
+buffer, so a clip costs one output-sized allocation. WAV encodings not handled below
+(24-bit, A-law, ...) go through scipy's reader; other containers (FLAC, OGG, MP3 with
+libsndfile >= 1.1) through soundfile when it is installed.
+"""
+import io
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+import numpy as np
+
+AudioSource = Union[Path, str, bytes, bytearray, memoryview, BinaryIO]
+
+# (format tag, bits per sample) -> sample dtype; tag 1 is integer PCM, 3 is IEEE float.
+_WAV_DTYPES = {(1, 8): "u1", (1, 16): "i2", (1, 32): "i4", (3, 32): "f4", (3, 64): "f8"}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Frames per soundfile read; bounds the decoder's scratch memory for long files.
+_SOUNDFILE_BLOCK = 1 << 16
+# Smaller files are read() rather than mapped: below this the mmap setup costs more than the copy.
+_MMAP_MIN_BYTES = 1 << 20
+# Frames converted per step from a mapped file; converted pages are then dropped from RSS.
+_MMAP_BLOCK = 1 << 18
+
+
+class AudioDecodeError(ValueError):
+    """
+    The payload is not audio this build can decode.
+    """
+
+
+def pcm_to_float32(data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Downmix (frames, channels) or (frames,) PCM and scale integers to [-1, 1] as float32.
+
+    With `out` (float32, one value per frame) the result is written there and nothing
+    else of that size is allocated. Without it, mono float32 input is returned as is.
+    """
+    channels = data.shape[1] if data.ndim > 1 else 1
+    if out is None:
+        if channels == 1 and data.dtype == np.float32:
+            return data.reshape(-1)
+        out = np.empty(data.shape[0], dtype=np.float32)
+    if channels == 1:
+        np.copyto(out, data.reshape(-1), casting="unsafe")
+    else:
+        np.copyto(out, data[:, 0], casting="unsafe")
+        for c in range(1, channels):
+            np.add(out, data[:, c], out=out, casting="unsafe")
+    if data.dtype == np.uint8:
+        out *= np.float32(1.0 / (128.0 * channels))
+        out -= np.float32(1.0)
+    elif np.issubdtype(data.dtype, np.integer):
+        out *= np.float32(1.0 / ((np.iinfo(data.dtype).max + 1) * channels))
+    elif channels > 1:
+        out *= np.float32(1.0 / channels)
+    return out
+
+
+def _parse_wav(buf) -> Optional[Tuple[int, np.ndarray, int]]:
+    """
+    (sample rate, zero-copy (frames, channels) view of the samples, their byte offset),
+    or None for WAV encodings this parser doesn't handle. Raises AudioDecodeError if it
+    isn't WAV.
+    """
+    if len(buf) < 12 or buf[0:4] not in (b"RIFF", b"RIFX") or buf[8:12] != b"WAVE":
+        raise AudioDecodeError("Not a RIFF/WAVE file.")
+    endian = ">" if buf[0:4] == b"RIFX" else "<"
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id = buf[pos : pos + 4]
+        size = struct.unpack_from(endian + "I", buf, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(buf):
+                raise AudioDecodeError("Malformed WAV fmt chunk.")
+            tag, channels, sample_rate, _, block_align, bits = struct.unpack_from(endian + "HHIIHH", buf, body)
+            if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26 and body + 26 <= len(buf):
+                tag = struct.unpack_from(endian + "H", buf, body + 24)[0]
+            if sample_rate <= 0 or channels < 1 or block_align == 0:
+                raise AudioDecodeError("Malformed WAV fmt chunk: zero sample rate, channels or block size.")
+            fmt = (tag, bits, channels, sample_rate, block_align)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioDecodeError("WAV data chunk before fmt chunk.")
+            tag, bits, channels, sample_rate, block_align = fmt
+            code = _WAV_DTYPES.get((tag, bits))
+            if code is None or block_align != channels * bits // 8:
+                return None
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF; trust the file length instead.
+            available = len(buf) - body
+            size = available if size in (0, 0xFFFFFFFF) else min(size, available)
+            frames = size // block_align
+            if frames == 0:
+                raise AudioDecodeError("WAV file has no samples.")
+            dtype = np.dtype(code).newbyteorder(endian)
+            data = np.frombuffer(buf, dtype=dtype, count=frames * channels, offset=body)
+            return sample_rate, data.reshape(frames, channels), body
+        pos = body + size + (size & 1)
+    raise AudioDecodeError("WAV file has no data chunk.")
+
+
+def _decode_wav_buffer(buf, source: AudioSource) -> Tuple[int, np.ndarray]:
+    parsed = _parse_wav(buf)
+    if parsed is None:
+        from scipy.io import wavfile
+
+        try:
+            sample_rate, data = wavfile.read(source if isinstance(source, Path) else io.BytesIO(bytes(buf)))
+        except ValueError as exc:
+            raise AudioDecodeError(f"Unsupported WAV encoding: {exc}") from exc
+        return sample_rate, pcm_to_float32(data, np.empty(data.shape[0], dtype=np.float32))
+    sample_rate, data, offset = parsed
+    out = np.empty(data.shape[0], dtype=np.float32)
+    if not isinstance(buf, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+        return sample_rate, pcm_to_float32(data, out)
+    # Convert a block at a time and drop each block's pages from the mapping, so the
+    # file doesn't stay resident (as RSS) next to the output.
+    frame_bytes = data.strides[0]
+    for start in range(0, len(data), _MMAP_BLOCK):
+        stop = min(start + _MMAP_BLOCK, len(data))
+        pcm_to_float32(data[start:stop], out[start:stop])
+        lo = (offset + start * frame_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        hi = (offset + stop * frame_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        if hi > lo:
+            buf.madvise(mmap.MADV_DONTNEED, lo, hi - lo)
+    return sample_rate, out
+
+
+def _decode_soundfile(source: AudioSource) -> Tuple[int, np.ndarray]:
+    try:
+        import soundfile
+    except ImportError as exc:
+        raise AudioDecodeError("Not a WAV file; decoding other formats needs the soundfile package.") from exc
+    handle = str(source) if isinstance(source, Path) else io.BytesIO(source)
+    try:
+        with soundfile.SoundFile(handle) as f:
+            sample_rate = f.samplerate
+            # Decoded a block at a time into the output, so a long file's multichannel
+            # float32 samples never sit in memory all at once.
+            out = np.empty(max(f.frames, 0), dtype=np.float32)
+            filled = 0
+            for block in f.blocks(blocksize=_SOUNDFILE_BLOCK, dtype="float32", always_2d=True):
+                if filled + len(block) > len(out):  # frame count was an estimate (some MP3s)
+                    out = np.concatenate([out[:filled], np.empty(max(len(out), len(block)), dtype=np.float32)])
+                pcm_to_float32(block, out[filled : filled + len(block)])
+                filled += len(block)
+    except Exception as exc:  # noqa: BLE001 -- LibsndfileError, or RuntimeError before soundfile 0.12
+        raise AudioDecodeError(f"Could not decode audio: {exc}") from exc
+    return sample_rate, out[:filled]
+
+
+def decode_audio(source: AudioSource) -> Tuple[int, np.ndarray]:
+    """
+    (sample rate, mono float32 waveform) of a clip given as a path, bytes-like payload
+    or binary file object. The waveform is a fresh array the caller may modify.
+    """
+    sample_rate, audio = _decode(source)
+    # The scipy and soundfile fallbacks don't reject these themselves.
+    if sample_rate <= 0 or len(audio) == 0:
+        raise AudioDecodeError("Audio has no samples." if sample_rate > 0 else "Audio has no sample rate.")
+    return sample_rate, audio
+
+
+def _decode(source: AudioSource) -> Tuple[int, np.ndarray]:
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        with path.open("rb") as f:
+            if f.read(4) not in (b"RIFF", b"RIFX"):
+                return _decode_soundfile(path)
+            if os.fstat(f.fileno()).st_size < _MMAP_MIN_BYTES:
+                f.seek(0)
+                return _decode_wav_buffer(f.read(), path)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _decode_wav_buffer(mapped, path)
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a view escaped (error path); the map goes when it does
+    if isinstance(source, io.BytesIO):
+        source = source.getbuffer()
+    elif not isinstance(source, (bytes, bytearray, memoryview)):
+        source = source.read()
+    if bytes(source[0:4]) in (b"RIFF", b"RIFX"):
+        return _decode_wav_buffer(source, source)
+    return _decode_soundfile(bytes(source))
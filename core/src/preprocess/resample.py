@@ -0,0 +1,61 @@
+import os
+from functools import lru_cache
+from math import gcd
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+QUALITIES = ("high", "fast")
+DEFAULT_QUALITY = os.getenv("RESAMPLE_QUALITY", "high")
+# FIR half-length in multiples of max(up, down). "high" is resample_poly's own default
+# design, so its output is identical to signal.resample_poly(x, up, down).
+_HALF_LEN_FACTOR = {"high": 10, "fast": 3}
+
+
+class PolyphasePlan(NamedTuple):
+    up: int
+    down: int
+    taps: np.ndarray  # scaled by `up` and zero-padded so output sample 0 is centred
+    pre_remove: int
+
+
+@lru_cache(maxsize=None)
+def resample_ratio(src_sr: int, dst_sr: int) -> Tuple[int, int]:
+    g = gcd(dst_sr, src_sr)
+    return dst_sr // g, src_sr // g
+
+
+@lru_cache(maxsize=64)
+def design_plan(up: int, down: int, quality: str = "high") -> PolyphasePlan:
+    if quality not in _HALF_LEN_FACTOR:
+        raise ValueError(f"Unknown resample quality {quality!r}; expected one of {QUALITIES}.")
+    # scipy.signal takes about a second to import, so it is only loaded once audio needs resampling.
+    from scipy import signal
+
+    max_rate = max(up, down)
+    half_len = _HALF_LEN_FACTOR[quality] * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    taps *= up
+    # Same centring as resample_poly. Trailing zeros guarantee enough output samples
+    # for any input length; they never contribute to the samples we keep.
+    pre_pad = down - half_len % down
+    taps = np.concatenate([np.zeros(pre_pad, np.float32), taps, np.zeros(down, np.float32)])
+    taps.setflags(write=False)
+    return PolyphasePlan(up, down, taps, (half_len + pre_pad) // down)
+
+
+def resample(audio: np.ndarray, src_sr: int, dst_sr: int, quality: str = DEFAULT_QUALITY) -> np.ndarray:
+    """
+    Polyphase resampling with the FIR designed once per (rate ratio, quality).
+
+    float32 input stays float32 throughout.
+    """
+    if src_sr == dst_sr:
+        return audio
+    from scipy.signal import upfirdn
+
+    up, down = resample_ratio(src_sr, dst_sr)
+    plan = design_plan(up, down, quality)
+    n_out = -(-len(audio) * up // down)
+    filtered = upfirdn(plan.taps, audio, up, down)
+    return filtered[plan.pre_remove : plan.pre_remove + n_out]
@@ -0,0 +1,121 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_NAME = "index.json"
+MATRIX_NAME = "features.npy"
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FeatureStore:
+    """
+    On-disk cache of per-file feature vectors: a memory-mapped `features.npy` matrix
+    plus `index.json` mapping each absolute path to its (mtime, size) and matrix row.
+
+    `meta` describes how the features were produced (sample rate, extractor settings);
+    a store written with different meta is ignored and rebuilt.
+    """
+
+    def __init__(self, root: Path, meta: Optional[Dict] = None):
+        self.root = Path(root)
+        self.meta = meta or {}
+        self._index: Dict[str, Dict] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._new_rows: List[np.ndarray] = []
+        self._new_entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        index_path = self.root / INDEX_NAME
+        matrix_path = self.root / MATRIX_NAME
+        if not index_path.exists() or not matrix_path.exists():
+            return
+        with index_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("meta") != self.meta:
+            return
+        self._index = data["entries"]
+        self._matrix = np.load(matrix_path, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._index) + len(self._new_entries)
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+
+    def get(self, path: Path) -> Optional[np.ndarray]:
+        key = self._key(path)
+        mtime_ns, size = file_signature(path)
+        entry = self._new_entries.get(key)
+        if entry is not None:
+            source = self._new_rows
+        else:
+            entry = self._index.get(key)
+            source = self._matrix
+        if entry is None or source is None or entry["mtime_ns"] != mtime_ns or entry["size"] != size:
+            return None
+        return np.asarray(source[entry["row"]])
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        """The saved feature matrix, memory-mapped; None before the first save."""
+        return self._matrix
+
+    def rows(self, paths: List[Path]) -> np.ndarray:
+        """
+        Row of each path in `matrix`. Every path must be saved with its current
+        signature; raises KeyError otherwise.
+        """
+        rows = np.empty(len(paths), dtype=np.int64)
+        for i, path in enumerate(paths):
+            entry = self._index.get(self._key(path))
+            if entry is None or (entry["mtime_ns"], entry["size"]) != file_signature(path):
+                raise KeyError(f"{path} is not in the saved feature store.")
+            rows[i] = entry["row"]
+        return rows
+
+    def put(self, path: Path, vector: np.ndarray) -> None:
+        mtime_ns, size = file_signature(path)
+        self._new_entries[self._key(path)] = {"mtime_ns": mtime_ns, "size": size, "row": len(self._new_rows)}
+        self._new_rows.append(np.asarray(vector, dtype=np.float32))
+
+    def save(self) -> None:
+        if not self._new_entries:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        kept = {key: entry for key, entry in self._index.items() if key not in self._new_entries}
+        rows: List[np.ndarray] = []
+        entries: Dict[str, Dict] = {}
+        if kept:
+            old_rows = np.asarray(self._matrix[[entry["row"] for entry in kept.values()]])
+            rows.append(old_rows)
+            for i, (key, entry) in enumerate(kept.items()):
+                entries[key] = {**entry, "row": i}
+        offset = len(entries)
+        rows.append(np.stack(self._new_rows))
+        for key, entry in self._new_entries.items():
+            entries[key] = {**entry, "row": offset + entry["row"]}
+        matrix = np.concatenate(rows, axis=0)
+
+        # Write to temp names and swap in, so a crash never leaves a torn store.
+        matrix_tmp = self.root / f"{MATRIX_NAME}.{os.getpid()}.tmp.npy"
+        index_tmp = self.root / f"{INDEX_NAME}.{os.getpid()}.tmp"
+        np.save(matrix_tmp, matrix)
+        with index_tmp.open("w", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "entries": entries}, f)
+        self._matrix = None
+        os.replace(matrix_tmp, self.root / MATRIX_NAME)
+        os.replace(index_tmp, self.root / INDEX_NAME)
+
+        self._index = entries
+        self._matrix = np.load(self.root / MATRIX_NAME, mmap_mode="r")
+        self._new_entries = {}
+        self._new_rows = []
@@ -0,0 +1,304 @@
+"""
+k-fold cross-validation and hyperparameter search for the softmax-regression trainer.
+
+Features are extracted once (through the feature store) and saved as one .npy that
+every pool worker memory-maps, so folds and trials run concurrently without decoding
+audio again or pickling the matrix. Each (trial, fold) task fits on the other folds and
+returns the held-out confusion matrix. Trials are ranked on the macro-F1 of their
+pooled confusion matrix; the best settings are refit on every clip and written as a
+checkpoint.
+
+The search space is the `sweep` section of configs/train_config.yaml: option -> list of
+values (grid or random search), or {log_uniform: [lo, hi]} / {uniform: [lo, hi]} for
+random search. Options left out keep their top-level value.
+
+Run from core/:
+    python -m src.train.sweep
+    python -m src.train.sweep --search random --trials 40 --folds 10 --workers 8 --promote
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.models.softmax_regression import fit_softmax_regression, predict_logits
+from src.train.train import CHECKPOINT_DIR, load_config, prepare_features, save_checkpoint
+
+# fit_softmax_regression options a trial may set.
+FIT_OPTIONS = ("epochs", "learning_rate", "batch_size", "l2", "validation_split", "patience", "seed", "standardize")
+
+
+@dataclass
+class TrialResult:
+    params: Dict[str, Any]
+    accuracy: float  # over all held-out predictions
+    macro_f1: float
+    fold_accuracy: List[float]
+    confusion: np.ndarray  # (true, predicted) counts summed over folds
+    precision: np.ndarray
+    recall: np.ndarray
+    seconds: float  # fit + predict time summed over folds
+
+
+def base_params(config: Dict) -> Dict[str, Any]:
+    return {name: config[name] for name in FIT_OPTIONS if name in config}
+
+
+def grid_trials(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    names = list(space)
+    for name in names:
+        if not isinstance(space[name], list):
+            raise ValueError(f"Grid search needs a list of values for {name!r}.")
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space: Dict[str, Any], count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(count):
+        trial = {}
+        for name, spec in space.items():
+            if isinstance(spec, list):
+                trial[name] = spec[rng.integers(len(spec))]
+            elif "log_uniform" in spec:
+                lo, hi = spec["log_uniform"]
+                trial[name] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            elif "uniform" in spec:
+                trial[name] = float(rng.uniform(*spec["uniform"]))
+            else:
+                raise ValueError(f"Unknown search spec for {name!r}: {spec}")
+        trials.append(trial)
+    return trials
+
+
+def stratified_folds(targets: np.ndarray, folds: int, seed: int = 0) -> np.ndarray:
+    """
+    Fold number per row, with every class spread as evenly as possible over the folds.
+    """
+    rng = np.random.default_rng(seed)
+    assignment = np.empty(len(targets), dtype=np.int64)
+    offset = 0
+    for label in np.unique(targets):
+        rows = rng.permutation(np.flatnonzero(targets == label))
+        # Continue the round-robin where the previous class stopped, so fold sizes stay level.
+        assignment[rows] = (np.arange(len(rows)) + offset) % folds
+        offset += len(rows)
+    return assignment
+
+
+def confusion_matrix(targets: np.ndarray, predicted: np.ndarray, num_classes: int) -> np.ndarray:
+    return np.bincount(targets * num_classes + predicted, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def per_class_metrics(confusion: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (precision, recall, F1) per class from a (true, predicted) confusion matrix; 0 where
+    a class was never predicted / never present.
+    """
+    hits = np.diag(confusion).astype(np.float64)
+    predicted, actual = confusion.sum(axis=0), confusion.sum(axis=1)
+    precision = np.divide(hits, predicted, out=np.zeros_like(hits), where=predicted > 0)
+    recall = np.divide(hits, actual, out=np.zeros_like(hits), where=actual > 0)
+    total = precision + recall
+    f1 = np.divide(2 * precision * recall, total, out=np.zeros_like(hits), where=total > 0)
+    return precision, recall, f1
+
+
+# Set in each pool worker (or in-process for workers=1) by _init_worker.
+_features: Optional[np.ndarray] = None
+_targets: Optional[np.ndarray] = None
+_folds: Optional[np.ndarray] = None
+_num_classes = 0
+
+
+def _init_worker(matrix_path: str, targets: np.ndarray, folds: np.ndarray, num_classes: int) -> None:
+    global _features, _targets, _folds, _num_classes
+    _features = np.load(matrix_path, mmap_mode="r")
+    _targets, _folds, _num_classes = targets, folds, num_classes
+
+
+def _run_fold(trial: int, fold: int, params: Dict[str, Any]) -> Tuple[int, int, np.ndarray, float]:
+    start = time.perf_counter()
+    result = fit_softmax_regression(_features, _targets, _num_classes, rows=np.flatnonzero(_folds != fold), **params)
+    held_out = np.flatnonzero(_folds == fold)
+    predicted = np.argmax(predict_logits(_features[held_out], result.weights, result.bias), axis=1)
+    return trial, fold, confusion_matrix(_targets[held_out], predicted, _num_classes), time.perf_counter() - start
+
+
+def cross_validate(
+    features: np.ndarray,
+    targets: np.ndarray,
+    num_classes: int,
+    trials: List[Dict[str, Any]],
+    folds: int = 5,
+    workers: int = 0,
+    seed: int = 0,
+    work_dir: Optional[Path] = None,
+) -> List[TrialResult]:
+    """
+    Score every trial's fit options by k-fold CV, all (trial, fold) fits on one process
+    pool (`workers=0` means one per CPU). Returns results best first.
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+    if folds < 2 or folds > len(targets):
+        raise ValueError(f"Need 2 <= folds <= clips ({len(targets)}), got {folds}.")
+    assignment = stratified_folds(targets, folds, seed)
+    tasks = [(t, f) for t in range(len(trials)) for f in range(folds)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    tmp = None
+    if work_dir is None:
+        tmp = tempfile.mkdtemp(prefix="sweep-")
+        work_dir = Path(tmp)
+    matrix_path = Path(work_dir) / "features.npy"
+    np.save(matrix_path, np.asarray(features, dtype=np.float32))
+    init_args = (str(matrix_path), targets, assignment, num_classes)
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+                outcomes = list(pool.map(_run_fold, [t for t, _ in tasks], [f for _, f in tasks], [trials[t] for t, _ in tasks]))
+        else:
+            _init_worker(*init_args)
+            outcomes = [_run_fold(t, f, trials[t]) for t, f in tasks]
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    confusions = np.zeros((len(trials), folds, num_classes, num_classes), dtype=np.int64)
+    seconds = np.zeros(len(trials))
+    for trial, fold, confusion, elapsed in outcomes:
+        confusions[trial, fold] = confusion
+        seconds[trial] += elapsed
+    fold_accuracy = np.trace(confusions, axis1=2, axis2=3) / np.maximum(confusions.sum(axis=(2, 3)), 1)
+    results = []
+    for trial, params in enumerate(trials):
+        pooled = confusions[trial].sum(axis=0)
+        precision, recall, f1 = per_class_metrics(pooled)
+        results.append(
+            TrialResult(
+                params=params,
+                accuracy=float(np.trace(pooled) / max(pooled.sum(), 1)),
+                macro_f1=float(f1.mean()),
+                fold_accuracy=[float(a) for a in fold_accuracy[trial]],
+                confusion=pooled,
+                precision=precision,
+                recall=recall,
+                seconds=float(seconds[trial]),
+            )
+        )
+    results.sort(key=lambda r: (-r.macro_f1, -r.accuracy))
+    return results
+
+
+def _format_params(params: Dict[str, Any]) -> str:
+    return " ".join(f"{name}={value:.3g}" if isinstance(value, float) else f"{name}={value}" for name, value in params.items())
+
+
+def write_report(results: List[TrialResult], labels: List[str], output_dir: Path) -> None:
+    """
+    results.csv (ranked table) and results.json (plus confusion matrices and per-class
+    precision / recall) in `output_dir`.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    names = sorted({name for result in results for name in result.params})
+    with (output_dir / "results.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "macro_f1", "accuracy", "fold_accuracy_std", "seconds", *names])
+        for rank, result in enumerate(results, 1):
+            writer.writerow(
+                [rank, f"{result.macro_f1:.4f}", f"{result.accuracy:.4f}", f"{np.std(result.fold_accuracy):.4f}", f"{result.seconds:.2f}"]
+                + [result.params.get(name, "") for name in names]
+            )
+    report = [
+        {
+            "rank": rank,
+            "params": result.params,
+            "macro_f1": result.macro_f1,
+            "accuracy": result.accuracy,
+            "fold_accuracy": result.fold_accuracy,
+            "confusion": result.confusion.tolist(),
+            "precision": dict(zip(labels, result.precision.tolist())),
+            "recall": dict(zip(labels, result.recall.tolist())),
+            "seconds": result.seconds,
+        }
+        for rank, result in enumerate(results, 1)
+    ]
+    with (output_dir / "results.json").open("w", encoding="utf-8") as f:
+        json.dump({"labels": labels, "trials": report}, f, indent=2)
+
+
+def print_summary(results: List[TrialResult], labels: List[str], top: int = 10) -> None:
+    print(f"{'rank':>4} {'macro_f1':>8} {'acc':>6} {'±fold':>6} {'sec':>6}  params")
+    for rank, result in enumerate(results[:top], 1):
+        print(
+            f"{rank:>4} {result.macro_f1:>8.3f} {result.accuracy:>6.3f} {np.std(result.fold_accuracy):>6.3f} "
+            f"{result.seconds:>6.1f}  {_format_params(result.params)}"
+        )
+    best = results[0]
+    width = max(len(label) for label in labels)
+    print("\nBest trial, held-out confusion (rows true, columns predicted):")
+    print(" " * (width + 1) + " ".join(f"{label[:8]:>8}" for label in labels) + f" {'precision':>9} {'recall':>6}")
+    for i, label in enumerate(labels):
+        counts = " ".join(f"{n:>8d}" for n in best.confusion[i])
+        print(f"{label:<{width}} {counts} {best.precision[i]:>9.3f} {best.recall[i]:>6.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folds", type=int, default=None)
+    parser.add_argument("--search", choices=["grid", "random"], default=None)
+    parser.add_argument("--trials", type=int, default=None, help="Random search: number of trials.")
+    parser.add_argument("--workers", type=int, default=None, help="CV processes; 0 = one per CPU, 1 = in this process.")
+    parser.add_argument("--output", type=Path, default=None, help="Directory for results.csv/json and the best checkpoint.")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--promote", action="store_true", help="Also write the best checkpoint where Predictor loads it from.")
+    args = parser.parse_args()
+
+    config = load_config()
+    sweep = config.get("sweep", {})
+    folds = args.folds or int(sweep.get("folds", 5))
+    search = args.search or sweep.get("search", "grid")
+    workers = args.workers if args.workers is not None else int(sweep.get("workers", 0))
+    output = args.output or Path(sweep.get("output", "models/sweeps/latest"))
+    seed = int(config.get("seed", 0))
+    space = sweep.get("space", {})
+    unknown = set(space) - set(FIT_OPTIONS)
+    if unknown:
+        parser.error(f"Unknown sweep options {sorted(unknown)}; expected some of {FIT_OPTIONS}.")
+    overrides = grid_trials(space) if search == "grid" else random_trials(space, args.trials or int(sweep.get("trials", 20)), seed)
+    trials = [{**base_params(config), **override} for override in overrides]
+
+    labels, features, targets, feature_config, rows = prepare_features(config)
+    if rows is not None:  # cross_validate writes its own matrix for the workers
+        features, targets = features[rows], targets[rows]
+    start = time.perf_counter()
+    results = cross_validate(features, targets, len(labels), trials, folds=folds, workers=workers, seed=seed)
+    elapsed = time.perf_counter() - start
+    fits = len(trials) * folds
+    print(f"{len(trials)} trials x {folds} folds = {fits} fits in {elapsed:.1f}s ({fits / elapsed:.1f} fits/sec)\n")
+    for result in results:
+        result.params = {name: result.params[name] for name in space if name in result.params}
+    print_summary(results, labels, args.top)
+    write_report(results, labels, output)
+
+    best = {**base_params(config), **results[0].params}
+    result = fit_softmax_regression(features, targets, num_classes=len(labels), **best)
+    checkpoint_format = config.get("checkpoint_format", "json")
+    save_checkpoint(labels, result, feature_config, checkpoint_format, path=output / "best_weights.json")
+    if args.promote:
+        save_checkpoint(labels, result, feature_config, checkpoint_format, path=CHECKPOINT_DIR / "trained_weights.json")
+    print(f"Results in {output / 'results.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 import csv
-import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import yaml
 
-from src.features.audio_embeddings import compute_features, to_feature_vector
+from src.features.spectral import EmbeddingConfig, extract_embedding
+from src.models.checkpoint import BINARY_SUFFIX, make_checkpoint, save_binary, save_json
+from src.models.softmax_regression import EpochStats, TrainResult, fit_softmax_regression
 from src.preprocess.audio_preprocess import load_audio_mono
+from src.train.feature_store import FeatureStore
 
 CONFIG_PATH = Path("configs/train_config.yaml")
 CHECKPOINT_DIR = Path("models/checkpoints")
@@ -19,44 +24,186 @@ def load_config() -> Dict:
         return yaml.safe_load(f)
 
 
-def load_dataset(data_dir: Path) -> List[tuple[Path, str]]:
-    labels_path = data_dir / "labels.csv"
+def load_manifest(labels_path: Path) -> List[tuple[Path, str]]:
+    # `filename,label` rows; filenames are relative to the manifest's directory.
     samples: List[tuple[Path, str]] = []
     with labels_path.open("r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            samples.append((data_dir / row["filename"], row["label"]))
+            samples.append((labels_path.parent / row["filename"], row["label"]))
     return samples
 
 
-def train():
-    config = load_config()
+def load_dataset(data_dir: Path) -> List[tuple[Path, str]]:
+    return load_manifest(data_dir / "labels.csv")
+
+
+def extract_vector(path: Path, sample_rate: int, config: EmbeddingConfig = EmbeddingConfig()) -> np.ndarray:
+    sr, audio = load_audio_mono(path, target_sr=sample_rate)
+    return extract_embedding(audio, sr, config)
+
+
+def _extract_many(paths: List[Path], sample_rate: int, config: EmbeddingConfig) -> List[np.ndarray]:
+    return [extract_vector(path, sample_rate, config) for path in paths]
+
+
+def extract_features(
+    paths: List[Path],
+    sample_rate: int,
+    store: FeatureStore | None = None,
+    workers: int = 0,
+    config: EmbeddingConfig = EmbeddingConfig(),
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Feature matrix for `paths`, reusing vectors from `store` for unchanged files and
+    extracting the rest on a process pool (`workers=0` means one per CPU).
+    """
+    vectors, stats = _extract_vectors(paths, sample_rate, store, workers, config)
+    return np.stack(vectors) if vectors else np.empty((0, config.dim), dtype=np.float32), stats
+
+
+def _extract_vectors(
+    paths: List[Path], sample_rate: int, store: FeatureStore | None, workers: int, config: EmbeddingConfig
+) -> Tuple[List[np.ndarray], Dict[str, float]]:
+    # Cached vectors are views of the store's memory map, so nothing here loads it whole.
+    start = time.perf_counter()
+    vectors: List[np.ndarray | None] = [store.get(path) if store is not None else None for path in paths]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+
+    workers = workers or os.cpu_count() or 1
+    if missing:
+        missing_paths = [paths[i] for i in missing]
+        if workers > 1 and len(missing) > 1:
+            # Ship paths in chunks so per-task pickling stays negligible.
+            chunk = max(1, min(256, len(missing) // (workers * 4)))
+            chunks = [missing_paths[i : i + chunk] for i in range(0, len(missing_paths), chunk)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                extracted = [vec for part in pool.map(_extract_many, chunks, [sample_rate] * len(chunks), [config] * len(chunks)) for vec in part]
+        else:
+            extracted = _extract_many(missing_paths, sample_rate, config)
+        for i, vec in zip(missing, extracted):
+            vectors[i] = vec
+            if store is not None:
+                store.put(paths[i], vec)
+        if store is not None:
+            store.save()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "files": len(paths),
+        "extracted": len(missing),
+        "cache_hits": len(paths) - len(missing),
+        "cache_hit_rate": (len(paths) - len(missing)) / len(paths) if paths else 0.0,
+        "seconds": elapsed,
+        "files_per_sec": len(paths) / elapsed if elapsed > 0 else 0.0,
+    }
+    return vectors, stats
+
+
+def prepare_features(config: Dict) -> Tuple[List[str], np.ndarray, np.ndarray, EmbeddingConfig, Optional[np.ndarray]]:
+    """
+    (labels, feature matrix, target indices, feature config, rows) for the dataset in
+    `config`, extracting through the feature store.
+
+    With a feature store the matrix is the store's memory map, `rows` holds each
+    sample's row in it and `targets` is indexed by matrix row; pass both to
+    fit_softmax_regression (`rows=`) and it reads one minibatch at a time. Without a
+    store the matrix is stacked in sample order and `rows` is None.
+    """
     data_dir = Path(config["data_dir"])
     samples = load_dataset(data_dir)
     labels = sorted(list({label for _, label in samples}))
 
-    feature_sums: Dict[str, np.ndarray] = {label: np.zeros(3, dtype=np.float32) for label in labels}
-    counts: Dict[str, int] = {label: 0 for label in labels}
-
-    for path, label in samples:
-        sr, audio = load_audio_mono(path, target_sr=config["sample_rate"])
-        feats = compute_features(audio, sr)
-        vec = to_feature_vector(feats)
-        feature_sums[label] += vec
-        counts[label] += 1
-
-    weights = []
-    bias = []
-    for label in labels:
-        mean_vec = feature_sums[label] / max(counts[label], 1)
-        weights.append(mean_vec.tolist())
-        bias.append(0.0)
-
-    checkpoint = {"labels": labels, "weights": weights, "bias": bias}
-    ckpt_path = CHECKPOINT_DIR / "trained_weights.json"
-    with ckpt_path.open("w", encoding="utf-8") as f:
-        json.dump(checkpoint, f, indent=2)
-    print(f"Wrote checkpoint to {ckpt_path}")
+    feature_config = EmbeddingConfig.from_dict(config.get("features"))
+    store_dir = config.get("feature_store")
+    meta = {"sample_rate": config["sample_rate"], "features": feature_config.to_dict()}
+    store = FeatureStore(Path(store_dir), meta=meta) if store_dir else None
+    paths = [path for path, _ in samples]
+    workers = int(config.get("workers", 0))
+    if store is not None:
+        _, stats = _extract_vectors(paths, config["sample_rate"], store, workers, feature_config)
+        features, rows = store.matrix, store.rows(paths)
+    else:
+        features, stats = extract_features(paths, config["sample_rate"], workers=workers, config=feature_config)
+        rows = None
+    print(
+        f"Features for {stats['files']} files in {stats['seconds']:.2f}s "
+        f"({stats['files_per_sec']:.1f} files/sec); cache hits {stats['cache_hits']}/{stats['files']} "
+        f"({stats['cache_hit_rate']:.0%}); {feature_config.mode} features, dim {feature_config.dim}"
+    )
+
+    label_index = {label: i for i, label in enumerate(labels)}
+    targets = np.array([label_index[label] for _, label in samples], dtype=np.int64)
+    if rows is not None:
+        by_row = np.full(len(features), -1, dtype=np.int64)
+        by_row[rows] = targets
+        targets = by_row
+    return labels, features, targets, feature_config, rows
+
+
+def save_checkpoint(
+    labels: List[str],
+    result: TrainResult,
+    feature_config: EmbeddingConfig,
+    checkpoint_format: str = "json",
+    path: Path = CHECKPOINT_DIR / "trained_weights.json",
+) -> List[Path]:
+    # Basic-mode checkpoints omit the feature config, so they stay readable by older builds.
+    checkpoint = make_checkpoint(
+        labels,
+        result.weights,
+        result.bias,
+        features=feature_config.to_dict() if feature_config.mode != "basic" else None,
+    )
+    written = []
+    if checkpoint_format in ("json", "both"):
+        save_json(path, checkpoint)
+        written.append(path)
+    if checkpoint_format in ("binary", "both"):
+        save_binary(path.with_suffix(BINARY_SUFFIX), checkpoint)
+        written.append(path.with_suffix(BINARY_SUFFIX))
+    for out in written:
+        print(f"Wrote checkpoint to {out}")
+    return written
+
+
+def train():
+    config = load_config()
+    labels, features, targets, feature_config, rows = prepare_features(config)
+    epochs = int(config["epochs"])
+    log_every = max(1, epochs // 10)
+
+    def log_epoch(stats: EpochStats):
+        if stats.epoch % log_every == 0 or stats.epoch == 1:
+            val = f"val_loss {stats.val_loss:.4f} val_acc {stats.val_accuracy:.3f}" if stats.val_loss is not None else "no val split"
+            print(
+                f"epoch {stats.epoch}/{epochs} loss {stats.loss:.4f} train_acc {stats.train_accuracy:.3f} "
+                f"{val} ({stats.seconds * 1000:.1f}ms)"
+            )
+
+    result = fit_softmax_regression(
+        features,
+        targets,
+        num_classes=len(labels),
+        epochs=epochs,
+        learning_rate=float(config.get("learning_rate", 0.1)),
+        batch_size=int(config.get("batch_size", 256)),
+        l2=float(config.get("l2", 1e-4)),
+        validation_split=float(config.get("validation_split", 0.2)),
+        patience=int(config.get("patience", 10)),
+        seed=int(config.get("seed", 0)),
+        on_epoch=log_epoch,
+        rows=rows,
+        standardize=bool(config.get("standardize", True)),
+    )
+    best = result.history[result.best_epoch - 1]
+    mean_epoch_ms = 1000 * sum(h.seconds for h in result.history) / len(result.history)
+    print(
+        f"Best epoch {result.best_epoch}/{len(result.history)} run: train_acc {best.train_accuracy:.3f}"
+        + (f", val_acc {best.val_accuracy:.3f}" if best.val_accuracy is not None else "")
+        + f"; {mean_epoch_ms:.1f}ms/epoch"
+    )
+    save_checkpoint(labels, result, feature_config, config.get("checkpoint_format", "json"))
 
 
 if __name__ == "__main__":
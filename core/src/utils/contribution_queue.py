@@ -0,0 +1,306 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.utils.github_push import (
+    GitHubBatchClient,
+    PendingFile,
+    PushResult,
+    RefConflictError,
+    labels_row,
+    require_env,
+    safe_filename,
+)
+from src.utils.fingerprint_index import Fingerprint, FingerprintIndex
+from src.utils.metrics import stage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contributions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pending_path TEXT NOT NULL,
+    content BLOB NOT NULL,
+    label_row TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    url TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS contributions_status ON contributions (status, id);
+"""
+
+
+@dataclass
+class QueuedContribution:
+    id: int
+    pending_path: str
+    content: bytes
+    label_row: str
+    enqueued_at: float
+
+
+class ContributionQueue:
+    """
+    Durable SQLite spool of contributions waiting to be pushed to the dataset repo.
+    Rows move pending -> flushing (claimed by one flusher for `lease_seconds`) ->
+    pushed, or back to pending after a flush error and to failed after `max_attempts`
+    of them. A claim whose lease ran out (its flusher died) can be claimed again.
+    """
+
+    def __init__(self, db_path: Path, max_attempts: int = 5, lease_seconds: float = 300.0):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(contributions)")}
+            if "lease_until" not in columns:  # queues created before leases
+                conn.execute("ALTER TABLE contributions ADD COLUMN lease_until REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps this safe across threads.
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def enqueue(
+        self,
+        content: bytes,
+        filename: Optional[str],
+        contributor: Optional[str],
+        provided_label: Optional[str],
+        notes: Optional[str],
+        predicted_label: str,
+        confidence: float,
+    ) -> int:
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO contributions (pending_path, content, label_row, enqueued_at) VALUES ('', ?, '', ?)",
+                (sqlite3.Binary(content), time.time()),
+            )
+            contribution_id = int(cursor.lastrowid)
+            # The row id keeps same-named uploads within one second from sharing a path
+            # (one would overwrite the other in the batch commit).
+            pending_path = f"pending/{timestamp}_{contribution_id}_{safe_filename(filename or '')}"
+            row = labels_row(pending_path, provided_label, contributor, notes, confidence, predicted_label, timestamp)
+            conn.execute("UPDATE contributions SET pending_path = ?, label_row = ? WHERE id = ?", (pending_path, row, contribution_id))
+        return contribution_id
+
+    def pending_path(self, contribution_id: int) -> Optional[str]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT pending_path FROM contributions WHERE id = ?", (contribution_id,)).fetchone()
+        return row[0] if row else None
+
+    def next_batch(self, limit: int) -> List[QueuedContribution]:
+        """
+        Claim up to `limit` of the oldest pending rows for this flusher. Claims are
+        atomic, so flushers in several processes (e.g. an old and a new pre-fork worker
+        during a rolling restart) never push the same row twice.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None  # explicit transaction below
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "UPDATE contributions SET status = 'flushing', lease_until = ? WHERE id IN ("
+                    "SELECT id FROM contributions WHERE status = 'pending' OR (status = 'flushing' AND lease_until < ?) "
+                    "ORDER BY id LIMIT ?) RETURNING id, pending_path, content, label_row, enqueued_at",
+                    (now + self.lease_seconds, now, limit),
+                ).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return sorted((QueuedContribution(*row) for row in rows), key=lambda item: item.id)
+
+    def mark_pushed(self, ids: List[int], url: str) -> None:
+        # The clip now lives in the dataset repo; drop our copy of the bytes.
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE contributions SET status = 'pushed', url = ?, content = x'', lease_until = NULL WHERE id = ?",
+                [(url, i) for i in ids],
+            )
+
+    def mark_failed(self, ids: List[int], error: str) -> List[str]:
+        """
+        Count a failed flush against each row; returns the pending paths of the rows
+        that have now run out of attempts.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE contributions SET attempts = attempts + 1, last_error = ?, lease_until = NULL, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE id = ?",
+                [(error, self.max_attempts, i) for i in ids],
+            )
+            placeholders = ",".join("?" * len(ids))
+            rows = conn.execute(
+                f"SELECT pending_path FROM contributions WHERE status = 'failed' AND id IN ({placeholders})", ids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest_pending_at(self) -> Optional[float]:
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT MIN(enqueued_at) FROM contributions WHERE status IN ('pending', 'flushing')"
+            ).fetchone()[0]
+
+    def depth(self) -> int:
+        # Claimed rows still count: they aren't in the dataset repo yet.
+        with closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM contributions WHERE status IN ('pending', 'flushing')").fetchone()[0])
+
+    def counts(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM contributions GROUP BY status").fetchall()
+        return {status: int(count) for status, count in rows}
+
+
+class ContributionWorker:
+    """
+    Background thread that flushes the queue in batches, one git commit per batch.
+    With `fingerprints`, clips that finally fail to push are dropped from the index
+    queue_contribution added them to, so a re-upload isn't taken for a duplicate.
+    """
+
+    def __init__(
+        self,
+        queue: ContributionQueue,
+        client_factory: Callable[[], GitHubBatchClient] = GitHubBatchClient.from_env,
+        batch_size: int = 50,
+        interval: float = 5.0,
+        max_backoff: float = 300.0,
+        fingerprints: Optional[FingerprintIndex] = None,
+    ):
+        self.queue = queue
+        self.fingerprints = fingerprints
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._client: Optional[GitHubBatchClient] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.flushed = 0
+        self.failed_batches = 0
+        self.last_flush_seconds: Optional[float] = None
+        self.last_batch_size = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="contribution-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        backoff = self.interval
+        while not self._stop.is_set():
+            try:
+                flushed = self.flush_once()
+                backoff = self.interval
+                if flushed == self.batch_size:
+                    continue  # more may be waiting; don't sleep
+            except Exception:  # noqa: BLE001
+                backoff = min(backoff * 2, self.max_backoff)
+            self._wake.wait(backoff)
+            self._wake.clear()
+
+    def flush_once(self) -> int:
+        batch = self.queue.next_batch(self.batch_size)
+        if not batch:
+            return 0
+        ids = [item.id for item in batch]
+        start = time.perf_counter()
+        try:
+            if self._client is None:
+                self._client = self.client_factory()
+            files = [PendingFile(item.pending_path, item.content) for item in batch]
+            rows = [item.label_row for item in batch]
+            message = f"Add {len(batch)} pending clip{'s' if len(batch) != 1 else ''}"
+            for attempt in range(3):
+                try:
+                    with stage("push.batch"):
+                        url = self._client.commit_batch(files, rows, message)
+                    break
+                except RefConflictError:
+                    if attempt == 2:
+                        raise
+        except Exception as exc:  # noqa: BLE001
+            self.failed_batches += 1
+            self.last_error = str(exc)
+            for path in self.queue.mark_failed(ids, str(exc)):
+                if self.fingerprints is not None:
+                    self.fingerprints.remove(path)
+            raise
+        self.queue.mark_pushed(ids, url)
+        self.last_flush_seconds = time.perf_counter() - start
+        self.last_batch_size = len(batch)
+        self.flushed += len(batch)
+        self.last_error = None
+        return len(batch)
+
+    def stats(self) -> Dict:
+        oldest = self.queue.oldest_pending_at()
+        return {
+            "depth": self.queue.depth(),
+            "oldest_age_seconds": time.time() - oldest if oldest is not None else 0.0,
+            "flushed": self.flushed,
+            "failed_batches": self.failed_batches,
+            "last_flush_seconds": self.last_flush_seconds,
+            "last_batch_size": self.last_batch_size,
+            "last_error": self.last_error,
+        }
+
+
+def queue_contribution(
+    queue: ContributionQueue,
+    worker: Optional[ContributionWorker],
+    content: bytes,
+    filename: Optional[str],
+    contributor: Optional[str],
+    provided_label: Optional[str],
+    notes: Optional[str],
+    predicted_label: str,
+    confidence: float,
+    fingerprints: Optional[FingerprintIndex] = None,
+    fingerprint: Optional[Fingerprint] = None,
+) -> PushResult:
+    """
+    Spool a contribution for the background worker. With `fingerprints` and the clip's
+    `fingerprint`, a clip matching one already contributed (or queued) is skipped
+    instead, and a new one is added to the index under its pending/ path; the worker
+    removes it again if the push ultimately fails.
+    """
+    # Fail fast, as push_pending_clip does, rather than spooling clips that can never be pushed.
+    for name in ("GH_TOKEN", "GITHUB_OWNER", "COMMITTER_EMAIL"):
+        require_env(name)
+    if fingerprints is not None and fingerprint is not None:
+        with stage("upload.dedup"):
+            duplicate = fingerprints.find_duplicate(*fingerprint)
+        if duplicate is not None:
+            return PushResult(
+                status="duplicate",
+                url=None,
+                message=f"Matches {duplicate.path} (score {duplicate.score:.2f}), which was already contributed; not queued again.",
+            )
+    contribution_id = queue.enqueue(content, filename, contributor, provided_label, notes, predicted_label, confidence)
+    if fingerprints is not None and fingerprint is not None:
+        fingerprints.add(queue.pending_path(contribution_id), *fingerprint)
+    if worker is not None:
+        worker.start()
+    return PushResult(status="queued", url=None, message="Contribution queued; it will be pushed to pending/ shortly.")
@@ -0,0 +1,377 @@
+"""
+On-disk index of clip fingerprints (src/features/fingerprint.py), used to spot
+contributions that are already in the dataset's pending/ folder.
+
+A directory holds one immutable generation of arrays sorted by hash, memory-mapped on
+open so loading doesn't scale with the index, plus an append-only log of changes made
+since. compact() folds the log into a new generation and atomically repoints CURRENT.
+Several processes (pre-forked API workers) may share a directory: each appends whole
+records to the log and reads the others' before answering a query.
+
+    <dir>/CURRENT                  name of the live generation, e.g. "gen-000003"
+    <dir>/gen-000003/hashes.npy    uint32, sorted
+    <dir>/gen-000003/clips.npy     uint32 clip id per hash
+    <dir>/gen-000003/anchors.npy   uint16 anchor frame per hash
+    <dir>/gen-000003/stamps.npy    int64 (size, mtime_ns) per clip, for sync()
+    <dir>/gen-000003/paths.txt     one clip path per line, in clip id order
+    <dir>/gen-000003/delta.log     clips added / removed since the generation was written
+"""
+import os
+import shutil
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Stamp = Tuple[int, int]
+Fingerprint = Tuple[np.ndarray, np.ndarray]
+_ADD, _REMOVE = 1, 2
+# kind, path bytes, hash count, file size, mtime_ns
+_RECORD = struct.Struct("<BIIqq")
+AUDIO_SUFFIXES = {".wav", ".flac", ".ogg", ".mp3"}
+
+
+@dataclass
+class Match:
+    path: str
+    clip_id: int
+    matches: int  # query hashes found in the clip at one consistent time shift
+    score: float  # matches / query hashes
+
+
+class FingerprintIndex:
+    """
+    Clips' landmark hashes, searchable by hash. Paths are whatever the caller uses to
+    name clips (pending/ repo paths for contributions).
+    """
+
+    def __init__(self, directory: Path, max_postings: int = 1000):
+        self.directory = Path(directory)
+        # Hashes shared by more clips than this carry no information and are skipped at query time.
+        self.max_postings = max_postings
+        self.directory.mkdir(parents=True, exist_ok=True)
+        current = self.directory / "CURRENT"
+        if not current.exists():
+            self._write_generation("gen-000000", *_empty_arrays(), [])
+            _atomic_write(current, "gen-000000")
+        self._open(current.read_text().strip())
+
+    def _open(self, generation: str) -> None:
+        self.generation = generation
+        base = self.directory / generation
+        self._hashes = np.load(base / "hashes.npy", mmap_mode="r")
+        self._clips = np.load(base / "clips.npy", mmap_mode="r")
+        self._anchors = np.load(base / "anchors.npy", mmap_mode="r")
+        self._stamps = np.load(base / "stamps.npy", mmap_mode="r")
+        self._base_count = len(self._stamps)
+        self._base_paths: Optional[List[str]] = None  # read on first use
+        self._delta_paths: List[str] = []
+        self._delta_stamps: List[Stamp] = []
+        self._delta_prints: List[Fingerprint] = []
+        self._delta_sorted: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._removed = np.zeros(self._base_count, dtype=bool)
+        self._ids: Optional[Dict[str, int]] = None
+        self._log_path = base / "delta.log"
+        self._log_offset = 0
+        self._current_stamp = _mtime_ns(self.directory / "CURRENT")
+        self._replay_log(truncate=True)
+        # Unbuffered, so each record is one O_APPEND write and never interleaves with another process's.
+        self._log = self._log_path.open("ab", buffering=0)
+
+    def close(self) -> None:
+        self._log.close()
+
+    def refresh(self) -> None:
+        """
+        Pick up records other processes appended to the log, or their compaction.
+        Costs two stat calls when nothing changed.
+        """
+        if _mtime_ns(self.directory / "CURRENT") != self._current_stamp:
+            self._log.close()
+            self._open((self.directory / "CURRENT").read_text().strip())
+        elif self._log_path.stat().st_size > self._log_offset:
+            self._replay_log()
+
+    # -- reading ------------------------------------------------------------------
+
+    def _paths(self) -> List[str]:
+        if self._base_paths is None:
+            text = (self.directory / self.generation / "paths.txt").read_text(encoding="utf-8")
+            self._base_paths = text.split("\n")[: self._base_count] if self._base_count else []
+        return self._base_paths
+
+    def path(self, clip_id: int) -> str:
+        return self._paths()[clip_id] if clip_id < self._base_count else self._delta_paths[clip_id - self._base_count]
+
+    def _id_map(self) -> Dict[str, int]:
+        if self._ids is None:
+            paths = self._paths() + self._delta_paths
+            self._ids = {path: i for i, path in enumerate(paths) if not self._removed[i]}
+        return self._ids
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._id_map()
+
+    def __len__(self) -> int:
+        count = self._base_count + len(self._delta_paths)
+        return count - int(self._removed[:count].sum())
+
+    def stamp(self, path: str) -> Optional[Stamp]:
+        clip_id = self._id_map().get(path)
+        if clip_id is None:
+            return None
+        if clip_id < self._base_count:
+            return int(self._stamps[clip_id, 0]), int(self._stamps[clip_id, 1])
+        return self._delta_stamps[clip_id - self._base_count]
+
+    def _delta_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._delta_sorted is None:
+            if self._delta_prints:
+                hashes = np.concatenate([h for h, _ in self._delta_prints])
+                anchors = np.concatenate([a for _, a in self._delta_prints])
+                clips = np.repeat(
+                    np.arange(self._base_count, self._base_count + len(self._delta_prints), dtype=np.uint32),
+                    [len(h) for h, _ in self._delta_prints],
+                )
+                order = np.argsort(hashes, kind="stable")
+                self._delta_sorted = (hashes[order], clips[order], anchors[order])
+            else:
+                self._delta_sorted = _empty_arrays()[:3]
+        return self._delta_sorted
+
+    def _postings(self, hashes, clips, anchors, query: np.ndarray, query_anchors: np.ndarray):
+        lo = np.searchsorted(hashes, query, side="left")
+        hi = np.searchsorted(hashes, query, side="right")
+        counts = hi - lo
+        useful = (counts > 0) & (counts <= self.max_postings)
+        lo, counts, query_anchors = lo[useful], counts[useful], query_anchors[useful]
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        # Positions lo[i] .. lo[i] + counts[i] - 1 for every query hash, flattened.
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        positions = starts + np.arange(total)
+        shifts = anchors[positions].astype(np.int64) - np.repeat(query_anchors.astype(np.int64), counts)
+        return clips[positions].astype(np.int64), shifts
+
+    def query(self, hashes: np.ndarray, anchors: np.ndarray, limit: int = 1) -> List[Match]:
+        """
+        Best-matching clips for a fingerprint, most aligned hashes first.
+        """
+        if len(hashes) == 0:
+            return []
+        self.refresh()
+        found = [self._postings(self._hashes, self._clips, self._anchors, hashes, anchors)]
+        if self._delta_prints:
+            found.append(self._postings(*self._delta_arrays(), hashes, anchors))
+        clips = np.concatenate([c for c, _ in found])
+        shifts = np.concatenate([s for _, s in found])
+        live = ~self._removed[clips]
+        if not live.any():
+            return []
+        # One bin per (clip, time shift): a real match piles its hashes into a single bin.
+        keys, counts = np.unique((clips[live] << 17) | (shifts[live] + (1 << 16)), return_counts=True)
+        best: Dict[int, int] = {}
+        for i in np.argsort(counts)[::-1]:
+            clip_id = int(keys[i] >> 17)
+            if clip_id not in best:
+                best[clip_id] = int(counts[i])
+                if len(best) == limit:
+                    break
+        return [Match(self.path(c), c, n, n / len(hashes)) for c, n in best.items()]
+
+    def find_duplicate(self, hashes: np.ndarray, anchors: np.ndarray, min_score: float = 0.1, min_matches: int = 8) -> Optional[Match]:
+        matches = self.query(hashes, anchors, limit=1)
+        if matches and matches[0].score >= min_score and matches[0].matches >= min_matches:
+            return matches[0]
+        return None
+
+    # -- writing ------------------------------------------------------------------
+
+    def add(self, path: str, hashes: np.ndarray, anchors: np.ndarray, stamp: Stamp = (0, 0)) -> int:
+        """
+        Index (or re-index) one clip; logged to disk before returning.
+        """
+        self.add_many([(path, stamp, hashes, anchors)])
+        return self._id_map()[path]
+
+    def add_many(self, items: Iterable[Tuple[str, Stamp, np.ndarray, np.ndarray]]) -> int:
+        # Records are only written here; replaying them applies them in log order,
+        # interleaved correctly with other processes' records.
+        self.refresh()
+        added = 0
+        for path, stamp, hashes, anchors in items:
+            hashes = np.ascontiguousarray(hashes, dtype=np.uint32)
+            anchors = np.ascontiguousarray(anchors, dtype=np.uint16)
+            encoded = path.encode("utf-8")
+            header = _RECORD.pack(_ADD, len(encoded), len(hashes), stamp[0], stamp[1])
+            self._log.write(b"".join((header, encoded, hashes.tobytes(), anchors.tobytes())))
+            added += 1
+        self._replay_log()
+        return added
+
+    def _append(self, path: str, stamp: Stamp, hashes: np.ndarray, anchors: np.ndarray) -> None:
+        clip_id = self._base_count + len(self._delta_paths)
+        self._delta_paths.append(path)
+        self._delta_stamps.append(stamp)
+        self._delta_prints.append((hashes, anchors))
+        self._delta_sorted = None
+        if clip_id >= len(self._removed):
+            self._removed = np.concatenate([self._removed, np.zeros(max(len(self._removed), 1024), dtype=bool)])
+        if self._ids is not None:
+            self._ids[path] = clip_id
+
+    def remove(self, path: str) -> bool:
+        self.refresh()
+        if path not in self._id_map():
+            return False
+        encoded = path.encode("utf-8")
+        self._log.write(_RECORD.pack(_REMOVE, len(encoded), 0, 0, 0) + encoded)
+        self._replay_log()
+        return True
+
+    def _replay_log(self, truncate: bool = False) -> None:
+        # Applies the records after _log_offset. Only on open is a torn final record
+        # (from a crash) cut off; later, it may be another process's write in progress.
+        if not self._log_path.exists():
+            return
+        with self._log_path.open("rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            kind, path_len, n, size, mtime = _RECORD.unpack_from(data, pos)
+            end = pos + _RECORD.size + path_len + 6 * n
+            if end > len(data):
+                break  # torn final record from a crash; dropped
+            path = data[pos + _RECORD.size : pos + _RECORD.size + path_len].decode("utf-8")
+            body = pos + _RECORD.size + path_len
+            if kind == _ADD:
+                hashes = np.frombuffer(data, dtype=np.uint32, count=n, offset=body)
+                anchors = np.frombuffer(data, dtype=np.uint16, count=n, offset=body + 4 * n)
+                if path in self._id_map():
+                    self._removed[self._ids.pop(path)] = True
+                self._append(path, (size, mtime), hashes, anchors)
+            elif path in self._id_map():
+                self._removed[self._ids.pop(path)] = True
+            pos = end
+        self._log_offset += pos
+        if truncate and pos < len(data):
+            with self._log_path.open("r+b") as f:
+                f.truncate(self._log_offset)
+
+    def compact(self) -> str:
+        """
+        Fold the log (and drop removed clips) into a new generation. Returns its name.
+        """
+        self.refresh()
+        count = self._base_count + len(self._delta_paths)
+        keep = ~self._removed[:count]
+        new_ids = (np.cumsum(keep) - 1).astype(np.uint32)
+        base_h, base_c, base_a = self._hashes, self._clips, self._anchors
+        if not keep[: self._base_count].all():
+            alive = keep[base_c]
+            base_h, base_c, base_a = base_h[alive], base_c[alive], base_a[alive]
+        delta_h, delta_c, delta_a = self._delta_arrays()
+        if self._delta_prints and not keep[self._base_count :].all():
+            alive = keep[delta_c]
+            delta_h, delta_c, delta_a = delta_h[alive], delta_c[alive], delta_a[alive]
+        # Both runs are sorted, so the delta is slotted in rather than everything re-sorted.
+        slots = np.searchsorted(base_h, delta_h, side="right")
+        hashes = np.insert(np.asarray(base_h), slots, delta_h)
+        clips = new_ids[np.insert(np.asarray(base_c), slots, delta_c)]
+        anchors = np.insert(np.asarray(base_a), slots, delta_a)
+        stamps = np.concatenate([np.asarray(self._stamps), np.array(self._delta_stamps, dtype=np.int64).reshape(-1, 2)])[keep]
+        paths = [p for p, k in zip(self._paths() + self._delta_paths, keep) if k]
+
+        old = self.generation
+        generation = f"gen-{int(old.split('-')[1]) + 1:06d}"
+        self._write_generation(generation, hashes, clips, anchors, stamps, paths)
+        self._log.close()
+        # Records other processes append from here until they see the new CURRENT go
+        # down with the old generation; compact when writers are idle, or sync after.
+        _atomic_write(self.directory / "CURRENT", generation)
+        del base_h, base_c, base_a
+        self._open(generation)
+        shutil.rmtree(self.directory / old, ignore_errors=True)
+        return generation
+
+    def _write_generation(self, name, hashes, clips, anchors, stamps, paths: Sequence[str]) -> None:
+        tmp = self.directory / f"{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        np.save(tmp / "hashes.npy", hashes.astype(np.uint32, copy=False))
+        np.save(tmp / "clips.npy", clips.astype(np.uint32, copy=False))
+        np.save(tmp / "anchors.npy", anchors.astype(np.uint16, copy=False))
+        np.save(tmp / "stamps.npy", np.asarray(stamps, dtype=np.int64).reshape(-1, 2))
+        (tmp / "paths.txt").write_text("\n".join(paths), encoding="utf-8")
+        shutil.rmtree(self.directory / name, ignore_errors=True)
+        os.replace(tmp, self.directory / name)
+
+    def sync(
+        self,
+        root: Path,
+        fingerprint_file: Callable[[Path], Fingerprint],
+        prefix: str = "pending/",
+        map_fn: Callable = map,
+    ) -> Dict[str, int]:
+        """
+        Bring the index in line with the audio files under `root` (a local checkout of
+        the dataset's pending/ folder), indexed as prefix + relative path. Only new or
+        changed files (size / mtime) are fingerprinted; vanished ones are removed.
+        `map_fn` may be a process pool's map.
+        """
+        root = Path(root)
+        seen, todo, stamps = set(), [], []
+        for path in sorted(root.rglob("*")):
+            if path.suffix.lower() not in AUDIO_SUFFIXES or not path.is_file():
+                continue
+            name = prefix + path.relative_to(root).as_posix()
+            seen.add(name)
+            stat = path.stat()
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if self.stamp(name) != stamp:
+                todo.append((name, path))
+                stamps.append(stamp)
+        counts = {"added": 0, "updated": 0, "removed": 0, "failed": 0, "unchanged": len(seen) - len(todo)}
+        for (name, _), stamp, result in zip(todo, stamps, map_fn(_fingerprint_or_none, [fingerprint_file] * len(todo), [p for _, p in todo])):
+            if result is None:
+                counts["failed"] += 1
+                continue
+            counts["updated" if name in self else "added"] += 1
+            self.add_many([(name, stamp, *result)])
+        for name in [p for p in self._id_map() if p.startswith(prefix) and p not in seen]:
+            self.remove(name)
+            counts["removed"] += 1
+        return counts
+
+    def stats(self) -> Dict:
+        return {
+            "clips": len(self),
+            "hashes": int(len(self._hashes) + sum(len(h) for h, _ in self._delta_prints)),
+            "generation": self.generation,
+            "log_clips": len(self._delta_paths),
+        }
+
+
+def _fingerprint_or_none(fingerprint_file: Callable[[Path], Fingerprint], path: Path) -> Optional[Fingerprint]:
+    try:
+        return fingerprint_file(path)
+    except Exception:  # noqa: BLE001 -- one unreadable clip shouldn't stop a sync
+        return None
+
+
+def _empty_arrays():
+    return np.zeros(0, np.uint32), np.zeros(0, np.uint32), np.zeros(0, np.uint16), np.zeros((0, 2), np.int64)
+
+
+def _mtime_ns(path: Path) -> int:
+    return path.stat().st_mtime_ns
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
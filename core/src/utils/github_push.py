@@ -4,9 +4,15 @@ import re
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
 
-import requests
+from src.utils.metrics import stage
+
+# requests is imported where it is used, so the API and UI start without it.
+if TYPE_CHECKING:
+    import requests
+
+LABELS_HEADER = "filename,label,contributor,notes,confidence,predicted_label,created_utc\n"
 
 
 @dataclass
@@ -19,7 +25,7 @@ class PushResult:
         return {"status": self.status, "url": self.url, "message": self.message}
 
 
-def _require_env(name: str) -> str:
+def require_env(name: str) -> str:
     value = os.getenv(name)
     if not value or value == "<EMAIL>":
         raise EnvironmentError(f"Environment variable {name} is required for contributions.")
@@ -36,6 +42,8 @@ def _github_headers(token: str) -> dict:
 
 def _put_content(owner: str, repo: str, path: str, content_bytes: bytes, message: str, token: str, committer_email: str):
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
+    import requests
+
     payload = {
         "message": message,
         "content": base64.b64encode(content_bytes).decode("utf-8"),
@@ -55,6 +63,8 @@ def _append_labels_csv(
     token: str,
     committer_email: str,
 ):
+    import requests
+
     get_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
     headers = _github_headers(token)
     existing = requests.get(get_url, headers=headers, timeout=15)
@@ -66,8 +76,7 @@ def _append_labels_csv(
         new_content = content + row
         sha = existing.json().get("sha")
     elif existing.status_code == 404:
-        header = "filename,label,contributor,notes,confidence,predicted_label,created_utc\n"
-        new_content = header + row
+        new_content = LABELS_HEADER + row
     else:
         raise RuntimeError(f"Could not fetch labels.csv: {existing.status_code} {existing.text}")
 
@@ -84,12 +93,35 @@ def _append_labels_csv(
     return put.json()
 
 
-def _safe_filename(name: str) -> str:
+def safe_filename(name: str) -> str:
     name = name or "upload.wav"
     name = name.replace(" ", "_")
     return re.sub(r"[^A-Za-z0-9._-]", "", name)
 
 
+def labels_row(
+    pending_path: str,
+    provided_label: Optional[str],
+    contributor: Optional[str],
+    notes: Optional[str],
+    confidence: float,
+    predicted_label: str,
+    timestamp: str,
+) -> str:
+    row = ",".join(
+        [
+            pending_path,
+            provided_label or "",
+            contributor or "",
+            (notes or "").replace("\n", " "),
+            f"{confidence:.4f}",
+            predicted_label,
+            timestamp,
+        ]
+    )
+    return row + "\n"
+
+
 def push_pending_clip(
     file_path: Path,
     contributor: Optional[str],
@@ -99,48 +131,39 @@ def push_pending_clip(
     confidence: float,
     dataset_repo: Optional[str] = None,
 ) -> PushResult:
-    token = _require_env("GH_TOKEN")
-    owner = _require_env("GITHUB_OWNER")
-    committer_email = _require_env("COMMITTER_EMAIL")
+    token = require_env("GH_TOKEN")
+    owner = require_env("GITHUB_OWNER")
+    committer_email = require_env("COMMITTER_EMAIL")
     repo = dataset_repo or os.getenv("DATASET_REPO", "cheetahsense-dataset")
 
     timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    safe_name = f"{timestamp}_{_safe_filename(file_path.name)}"
+    safe_name = f"{timestamp}_{safe_filename(file_path.name)}"
     pending_path = f"pending/{safe_name}"
 
-    with file_path.open("rb") as f:
+    with stage("push.read"), file_path.open("rb") as f:
         content_bytes = f.read()
 
-    upload_resp = _put_content(
-        owner=owner,
-        repo=repo,
-        path=pending_path,
-        content_bytes=content_bytes,
-        message=f"Add pending clip {safe_name}",
-        token=token,
-        committer_email=committer_email,
-    )
+    with stage("push.clip"):
+        upload_resp = _put_content(
+            owner=owner,
+            repo=repo,
+            path=pending_path,
+            content_bytes=content_bytes,
+            message=f"Add pending clip {safe_name}",
+            token=token,
+            committer_email=committer_email,
+        )
 
-    row = ",".join(
-        [
-            pending_path,
-            provided_label or "",
-            contributor or "",
-            (notes or "").replace("\n", " "),
-            f"{confidence:.4f}",
-            predicted_label,
-            timestamp,
-        ]
-    )
-    row += "\n"
-    labels_resp = _append_labels_csv(
-        owner=owner,
-        repo=repo,
-        path="labels.csv",
-        row=row,
-        token=token,
-        committer_email=committer_email,
-    )
+    row = labels_row(pending_path, provided_label, contributor, notes, confidence, predicted_label, timestamp)
+    with stage("push.labels"):
+        labels_resp = _append_labels_csv(
+            owner=owner,
+            repo=repo,
+            path="labels.csv",
+            row=row,
+            token=token,
+            committer_email=committer_email,
+        )
 
     url = upload_resp.get("content", {}).get("html_url") or upload_resp.get("commit", {}).get("html_url")
     meta_url = labels_resp.get("content", {}).get("html_url") or labels_resp.get("commit", {}).get("html_url")
@@ -151,3 +174,138 @@ def push_pending_clip(
         url=combined_url,
         message="Contribution pushed to pending/ and labels.csv updated.",
     )
+
+
+@dataclass
+class PendingFile:
+    path: str
+    content: bytes
+
+
+def _retrying_session(token: str, retries: int = 5, backoff_factor: float = 0.5) -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Blob/tree/commit creation is content-addressed and the ref update is a
+    # compare-and-swap, so retrying POST/PATCH on transient errors is safe.
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST", "PATCH"}),
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(_github_headers(token))
+    return session
+
+
+class RefConflictError(RuntimeError):
+    pass
+
+
+class GitHubBatchClient:
+    """
+    Commits many files plus a labels.csv append as a single commit through the git
+    data API (blobs -> tree -> commit -> ref), over one pooled, retrying session.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        owner: str,
+        repo: str,
+        committer_email: str,
+        branch: Optional[str] = None,
+        api_url: Optional[str] = None,
+        timeout: float = 15.0,
+        retries: int = 5,
+        backoff_factor: float = 0.5,
+    ):
+        self.api_url = (api_url or os.getenv("GITHUB_API_URL", "https://api.github.com")).rstrip("/")
+        self.repo_url = f"{self.api_url}/repos/{owner}/{repo}"
+        self.committer_email = committer_email
+        self.branch = branch or os.getenv("DATASET_BRANCH")
+        self.timeout = timeout
+        self.session = _retrying_session(token, retries, backoff_factor)
+
+    @classmethod
+    def from_env(cls, dataset_repo: Optional[str] = None) -> "GitHubBatchClient":
+        return cls(
+            token=require_env("GH_TOKEN"),
+            owner=require_env("GITHUB_OWNER"),
+            repo=dataset_repo or os.getenv("DATASET_REPO", "cheetahsense-dataset"),
+            committer_email=require_env("COMMITTER_EMAIL"),
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> "requests.Response":
+        return self.session.request(method, f"{self.repo_url}{path}", timeout=self.timeout, **kwargs)
+
+    def _json(self, method: str, path: str, **kwargs) -> dict:
+        resp = self._request(method, path, **kwargs)
+        if not resp.ok:
+            raise RuntimeError(f"GitHub {method} {path} failed: {resp.status_code} {resp.text}")
+        return resp.json()
+
+    def _branch(self) -> str:
+        if self.branch is None:
+            self.branch = self._json("GET", "")["default_branch"]
+        return self.branch
+
+    def _read_labels(self, commit_sha: str) -> str:
+        resp = self._request("GET", "/contents/labels.csv", params={"ref": commit_sha})
+        if resp.status_code == 404:
+            return LABELS_HEADER
+        if not resp.ok:
+            raise RuntimeError(f"Could not fetch labels.csv: {resp.status_code} {resp.text}")
+        data = resp.json()
+        if data.get("content"):
+            content = base64.b64decode(data["content"]).decode("utf-8")
+        else:
+            # The contents API omits bodies over 1MB; fetch the blob instead.
+            blob = self._json("GET", f"/git/blobs/{data['sha']}")
+            content = base64.b64decode(blob["content"]).decode("utf-8")
+        return content if content.endswith("\n") else content + "\n"
+
+    def _blob(self, content: bytes) -> str:
+        payload = {"content": base64.b64encode(content).decode("utf-8"), "encoding": "base64"}
+        return self._json("POST", "/git/blobs", json=payload)["sha"]
+
+    def commit_batch(self, files: List[PendingFile], label_rows: List[str], message: str) -> str:
+        """
+        Returns the new commit's html_url (or sha). Raises RefConflictError if the branch
+        moved underneath us, in which case the caller should simply retry.
+        """
+        paths = [f.path for f in files]
+        if len(set(paths)) != len(paths) or "labels.csv" in paths:
+            # One tree entry per path: a repeated path would silently keep only its last clip.
+            repeated = sorted({p for p in paths if paths.count(p) > 1 or p == "labels.csv"})
+            raise ValueError(f"Batch repeats paths: {', '.join(repeated)}")
+        branch = self._branch()
+        head_sha = self._json("GET", f"/git/ref/heads/{branch}")["object"]["sha"]
+        base_tree = self._json("GET", f"/git/commits/{head_sha}")["tree"]["sha"]
+        labels = self._read_labels(head_sha) + "".join(label_rows)
+
+        tree = [{"path": f.path, "mode": "100644", "type": "blob", "sha": self._blob(f.content)} for f in files]
+        tree.append({"path": "labels.csv", "mode": "100644", "type": "blob", "sha": self._blob(labels.encode("utf-8"))})
+        tree_sha = self._json("POST", "/git/trees", json={"base_tree": base_tree, "tree": tree})["sha"]
+        commit = self._json(
+            "POST",
+            "/git/commits",
+            json={
+                "message": message,
+                "tree": tree_sha,
+                "parents": [head_sha],
+                "committer": {"name": "CheetahSense Bot", "email": self.committer_email},
+            },
+        )
+        resp = self._request("PATCH", f"/git/refs/heads/{branch}", json={"sha": commit["sha"], "force": False})
+        if resp.status_code == 422:
+            raise RefConflictError(f"Branch {branch} moved during commit: {resp.text}")
+        if not resp.ok:
+            raise RuntimeError(f"GitHub ref update failed: {resp.status_code} {resp.text}")
+        return commit.get("html_url") or commit["sha"]
@@ -0,0 +1,214 @@
+"""
+Per-stage latency histograms for the inference path, rendered in the Prometheus text
+format by /metrics.
+
+Code marks a stage with `with stage("audio.decode"):`. With METRICS_ENABLED=0 that is a
+shared no-op context manager; otherwise it costs two perf_counter calls and a bucket
+increment in a per-thread table. Observations made inside `collect_timings()` are also recorded for
+that request, which is how the Server-Timing header and process-pool workers report
+back.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Add a Server-Timing header with the stages of each HTTP request.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Seconds; from 50µs (a short FFT) to 10s (a GitHub push on a bad day).
+BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Timings = List[Tuple[str, float]]
+
+_now = time.perf_counter
+# Each thread counts into its own {stage: [bucket counts..., +Inf count, sum]} so the
+# hot path takes no lock; render_prometheus adds the threads' tables up.
+_local = threading.local()
+_tables: List[Dict[str, list]] = []
+_tables_lock = threading.Lock()
+_request_timings: ContextVar[Optional[Timings]] = ContextVar("request_timings", default=None)
+
+
+def set_enabled(enabled: bool) -> None:
+    global ENABLED
+    ENABLED = enabled
+
+
+def _thread_table() -> Dict[str, list]:
+    table: Dict[str, list] = {}
+    _local.table = table
+    with _tables_lock:
+        _tables.append(table)
+    return table
+
+
+def observe(name: str, seconds: float) -> None:
+    try:
+        table = _local.table
+    except AttributeError:
+        table = _thread_table()
+    row = table.get(name)
+    if row is None:
+        row = table[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+    row[bisect_left(BUCKETS, seconds)] += 1
+    row[-1] += seconds
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def replay(timings: Iterable[Tuple[str, float]]) -> None:
+    # Timings collected in another process (see pool._call_predictor_timed).
+    for name, seconds in timings:
+        observe(name, seconds)
+
+
+def attribute(timings: Iterable[Tuple[str, float]]) -> None:
+    # Stages already observed elsewhere (e.g. a shared batch) that this request also
+    # waited on: added to its timings, not to the histograms again.
+    current = _request_timings.get()
+    if current is not None:
+        current.extend(timings)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = _now()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, _now() - self.start)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    return _Stage(name) if ENABLED else _NO_STAGE
+
+
+def snapshot() -> Dict[str, Tuple[List[int], float, int]]:
+    """
+    stage -> (per-bucket counts with +Inf last, sum of seconds, count), summed over threads.
+    """
+    with _tables_lock:
+        tables = list(_tables)
+    merged: Dict[str, list] = {}
+    for table in tables:
+        for name, row in list(table.items()):
+            row = list(row)
+            total = merged.get(name)
+            merged[name] = row if total is None else [a + b for a, b in zip(total, row)]
+    return {name: (row[:-1], row[-1], sum(row[:-1])) for name, row in merged.items()}
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """
+    Record every stage observed in this context (and threads started with a copy of it)
+    into the yielded list as (name, seconds), in order.
+    """
+    timings: Timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings: Timings, total: float) -> str:
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+def render_prometheus(
+    gauges: Optional[Dict[str, float]] = None,
+    counters: Optional[Dict[str, float]] = None,
+    prefix: str = "cheetahsense",
+) -> str:
+    """
+    Stage histograms as `<prefix>_stage_seconds{stage=...}`, plus any `gauges` and
+    `counters` given (name -> value, without the prefix; counters get a `_total` suffix).
+    """
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent in each pipeline stage.",
+        f"# TYPE {prefix}_stage_seconds histogram",
+    ]
+    for name, (counts, total, count) in sorted(snapshot().items()):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {total!r}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {count}')
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {_format(value)}")
+    for name, value in (counters or {}).items():
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _tables_lock:
+        for table in _tables:
+            table.clear()
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects the stages of each HTTP request and, when
+    SERVER_TIMING is on, reports them in a Server-Timing response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING and ENABLED):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        with collect_timings() as timings:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    header = server_timing_header(timings, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,243 @@
+"""
+Pre-fork process supervisor: the parent binds the listening socket and does the
+expensive setup once, then forks workers that serve from the inherited socket and
+share the parent's memory (model, filter and FFT tables) copy-on-write.
+"""
+import gc
+import os
+import select
+import signal
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# serve(sock, slot, ready): runs in the worker until it exits; calls ready() once it is
+# accepting connections.
+ServeFn = Callable[[socket.socket, int, Callable[[], None]], None]
+
+
+@dataclass
+class _Worker:
+    slot: int
+    pid: int
+    ready_fd: int
+    started: float = field(default_factory=time.monotonic)
+    ready: bool = False
+    retiring: bool = False
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # An explicit IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted sockets whose
+    # proto says TCP, and without it every response waits out delayed ACKs (~40 ms).
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """
+    Keeps `workers` forked copies of `serve` running on one socket.
+
+    - `preload()` runs in the parent before the first fork.
+    - Every `check_interval` seconds the parent calls `reload()`; when it returns True
+      (e.g. the checkpoint changed and was loaded), workers are replaced one at a time:
+      the new worker must report ready before the old one gets SIGTERM and drains.
+      SIGHUP triggers the same rolling restart.
+    - Workers that die are replaced; SIGTERM / SIGINT stop all of them gracefully.
+    """
+
+    def __init__(
+        self,
+        serve: ServeFn,
+        sock: socket.socket,
+        workers: int = 1,
+        preload: Optional[Callable[[], None]] = None,
+        reload: Optional[Callable[[], bool]] = None,
+        check_interval: float = 2.0,
+        ready_timeout: float = 120.0,
+        graceful_timeout: float = 30.0,
+        log: Callable[[str], None] = print,
+    ):
+        self.serve = serve
+        self.sock = sock
+        self.workers = workers
+        self.preload = preload
+        self.reload = reload
+        self.check_interval = check_interval
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+        self.log = log
+        self.restarts = 0
+        self._children: Dict[int, _Worker] = {}
+        self._stopping = False
+        self._restart_requested = False
+        self._wakeup_r, self._wakeup_w = -1, -1
+
+    # -- children -----------------------------------------------------------------
+
+    def _spawn(self, slot: int) -> _Worker:
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # worker
+            code = 0
+            try:
+                os.close(ready_r)
+                os.close(self._wakeup_r)
+                os.close(self._wakeup_w)
+                signal.set_wakeup_fd(-1)
+                for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+                    signal.signal(sig, signal.SIG_DFL)
+
+                def ready():
+                    os.write(ready_w, b"1")
+                    os.close(ready_w)
+
+                self.serve(self.sock, slot, ready)
+            except BaseException as exc:  # noqa: BLE001 -- nothing may escape into the parent's loop
+                self.log(f"[prefork] worker {slot} failed: {exc!r}")
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        worker = _Worker(slot, pid, ready_r)
+        self._children[pid] = worker
+        return worker
+
+    def _read_ready(self, timeout: float) -> None:
+        waiting = {w.ready_fd: w for w in self._children.values() if not w.ready and w.ready_fd >= 0}
+        try:
+            readable, _, _ = select.select([self._wakeup_r, *waiting], [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            if fd == self._wakeup_r:
+                os.read(fd, 512)
+                continue
+            worker = waiting[fd]
+            worker.ready = os.read(fd, 1) == b"1"
+            os.close(fd)
+            worker.ready_fd = -1
+            if worker.ready:
+                self.log(f"[prefork] worker {worker.slot} (pid {worker.pid}) ready in {time.monotonic() - worker.started:.1f}s")
+
+    def _reap(self) -> List[_Worker]:
+        dead = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            worker = self._children.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd >= 0:
+                os.close(worker.ready_fd)
+            if not worker.retiring and not self._stopping:
+                self.log(f"[prefork] worker {worker.slot} (pid {worker.pid}) exited with status {status}")
+            dead.append(worker)
+        return dead
+
+    def _respawn_dead(self) -> None:
+        for worker in self._reap():
+            if worker.retiring or self._stopping:
+                continue
+            if time.monotonic() - worker.started < 1.0:
+                time.sleep(1.0)  # don't spin on a worker that dies at startup
+            self._spawn(worker.slot)
+
+    def _wait_ready(self, worker: _Worker) -> bool:
+        deadline = time.monotonic() + self.ready_timeout
+        while not worker.ready and worker.pid in self._children and not self._stopping:
+            if time.monotonic() > deadline:
+                return False
+            self._read_ready(0.1)
+            self._respawn_dead()
+        return worker.ready
+
+    def _terminate(self, workers: List[_Worker]) -> None:
+        for worker in workers:
+            worker.retiring = True
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while any(w.pid in self._children for w in workers) and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for worker in workers:
+            if worker.pid in self._children:
+                os.kill(worker.pid, signal.SIGKILL)
+                os.waitpid(worker.pid, 0)
+                self._children.pop(worker.pid, None)
+
+    def rolling_restart(self) -> None:
+        """
+        Replace each worker with a fresh fork of the (re)loaded parent, one at a time,
+        so capacity never drops by more than the worker being drained.
+        """
+        self.restarts += 1
+        gc.freeze()
+        for old in sorted(self._children.values(), key=lambda w: w.slot):
+            if self._stopping:
+                return
+            new = self._spawn(old.slot)
+            if not self._wait_ready(new):
+                self.log(f"[prefork] replacement for worker {old.slot} never became ready; keeping the old one")
+                self._terminate([new])
+                return
+            self._terminate([old])
+
+    # -- main loop ----------------------------------------------------------------
+
+    def _on_signal(self, signum, _frame) -> None:
+        if signum == signal.SIGHUP:
+            self._restart_requested = True
+        elif signum != signal.SIGCHLD:
+            self._stopping = True
+
+    def run(self) -> None:
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        if self.preload is not None:
+            start = time.perf_counter()
+            self.preload()
+            self.log(f"[prefork] preloaded in {time.perf_counter() - start:.1f}s")
+        # Objects created so far are never collected in the workers; without this, a GC
+        # pass there would write to (and so copy) every page holding a tracked object.
+        gc.freeze()
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self.log(f"[prefork] parent {os.getpid()} started {self.workers} workers on {self.sock.getsockname()[:2]}")
+
+        next_check = time.monotonic() + self.check_interval
+        try:
+            while not self._stopping:
+                self._read_ready(max(0.0, min(1.0, next_check - time.monotonic())))
+                self._respawn_dead()
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self.log("[prefork] SIGHUP: rolling restart")
+                    self.rolling_restart()
+                if self.reload is not None and time.monotonic() >= next_check:
+                    next_check = time.monotonic() + self.check_interval
+                    if self.reload():
+                        self.log("[prefork] reloaded; rolling restart")
+                        self.rolling_restart()
+        finally:
+            self._stopping = True
+            self._terminate(list(self._children.values()))
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
@@ -0,0 +1,71 @@
+"""
+Request body size limits enforced while the body streams in, before the multipart
+parser spools it to memory or disk.
+"""
+import json
+from typing import Dict
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that answers 413 for requests to a limited path whose body is over
+    its limit: immediately when Content-Length says so, otherwise as soon as the bytes
+    received so far cross it (chunked uploads). `limits` maps path -> max body bytes.
+    """
+
+    def __init__(self, app, limits: Dict[str, int], detail: str = "Request body too large."):
+        self.app = app
+        self.limits = limits
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send)
+                return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Once over the limit, whatever error the app makes of the aborted body is
+            # replaced by the 413 below.
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": self.detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
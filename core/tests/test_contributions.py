@@ -0,0 +1,293 @@
+import base64
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from src.features.fingerprint import fingerprint, fingerprint_file
+from src.utils.contribution_queue import ContributionQueue, ContributionWorker, queue_contribution
+from src.utils.fingerprint_index import FingerprintIndex
+from src.utils.github_push import GitHubBatchClient, PendingFile
+
+
+class FakeGitHub:
+    """Just enough of the git data API for GitHubBatchClient, kept in memory."""
+
+    def __init__(self):
+        self.objects = {}
+        self.trees = {"root": {}}
+        self.commits = {"c0": {"tree": "root", "parents": []}}
+        self.head = "c0"
+        self.ref_updates = 0
+        self.fail_next_posts = 0
+        self.lock = threading.Lock()
+
+    def _sha(self, kind, data):
+        return hashlib.sha1(kind.encode() + json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def files(self, commit=None):
+        return {path: self.objects[sha] for path, sha in self.trees[self.commits[commit or self.head]["tree"]].items()}
+
+    def handle(self, method, path, body):
+        parts = urlparse(path).path.split("/")[4:]  # after /repos/{owner}/{repo}
+        with self.lock:
+            if method == "POST" and self.fail_next_posts:
+                self.fail_next_posts -= 1
+                return 502, {"message": "bad gateway"}
+            if method == "GET" and parts == []:
+                return 200, {"default_branch": "main"}
+            if method == "GET" and parts[:3] == ["git", "ref", "heads"]:
+                return 200, {"object": {"sha": self.head}}
+            if method == "GET" and parts[:2] == ["git", "commits"]:
+                return 200, {"tree": {"sha": self.commits[parts[2]]["tree"]}}
+            if method == "GET" and parts == ["contents", "labels.csv"]:
+                ref = urlparse(path).query.split("=")[1]
+                content = self.files(ref).get("labels.csv")
+                if content is None:
+                    return 404, {"message": "Not Found"}
+                return 200, {"content": base64.b64encode(content).decode(), "sha": "x"}
+            if method == "POST" and parts == ["git", "blobs"]:
+                content = base64.b64decode(body["content"])
+                sha = hashlib.sha1(content).hexdigest()
+                self.objects[sha] = content
+                return 201, {"sha": sha}
+            if method == "POST" and parts == ["git", "trees"]:
+                tree = dict(self.trees[body["base_tree"]])
+                tree.update({entry["path"]: entry["sha"] for entry in body["tree"]})
+                sha = self._sha("tree", tree)
+                self.trees[sha] = tree
+                return 201, {"sha": sha}
+            if method == "POST" and parts == ["git", "commits"]:
+                sha = self._sha("commit", body)
+                self.commits[sha] = {"tree": body["tree"], "parents": body["parents"]}
+                return 201, {"sha": sha, "html_url": f"https://example.test/commit/{sha}"}
+            if method == "PATCH" and parts[:3] == ["git", "refs", "heads"]:
+                if self.commits[body["sha"]]["parents"] != [self.head]:
+                    return 422, {"message": "Update is not a fast forward"}
+                self.head = body["sha"]
+                self.ref_updates += 1
+                return 200, {"object": {"sha": self.head}}
+        return 404, {"message": f"unhandled {method} {path}"}
+
+
+@pytest.fixture
+def fake_github():
+    fake = FakeGitHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _dispatch(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, payload = fake.handle(self.command, self.path, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = _dispatch
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+
+
+def _client(fake):
+    return GitHubBatchClient("token", "owner", "dataset", "bot@example.test", api_url=fake.url, backoff_factor=0.01)
+
+
+def test_worker_flushes_queue_as_one_commit_per_batch(tmp_path, fake_github):
+    queue = ContributionQueue(tmp_path / "queue.sqlite3")
+    for i in range(5):
+        queue.enqueue(f"clip-{i}".encode(), f"clip {i}.wav", "tester", "resting", "a\nb", "hunting", 0.5)
+    assert queue.depth() == 5
+
+    worker = ContributionWorker(queue, client_factory=lambda: _client(fake_github), batch_size=3)
+    assert worker.flush_once() == 3
+    assert worker.flush_once() == 2
+    assert queue.depth() == 0 and worker.flushed == 5
+    assert fake_github.ref_updates == 2
+
+    files = fake_github.files()
+    labels = files["labels.csv"].decode().splitlines()
+    assert labels[0].startswith("filename,label")
+    assert len(labels) == 6
+    assert sum(path.startswith("pending/") for path in files) == 5
+    assert "a b" in labels[1]
+
+
+def test_same_named_clips_in_one_batch_keep_their_own_bytes(tmp_path, fake_github):
+    queue = ContributionQueue(tmp_path / "queue.sqlite3")
+    first = queue.enqueue(b"first", "clip.wav", None, "resting", None, "resting", 0.4)
+    second = queue.enqueue(b"second", "clip.wav", None, "hunting", None, "resting", 0.4)
+    assert queue.pending_path(first) != queue.pending_path(second)
+
+    worker = ContributionWorker(queue, client_factory=lambda: _client(fake_github))
+    assert worker.flush_once() == 2
+    files = fake_github.files()
+    assert files[queue.pending_path(first)] == b"first" and files[queue.pending_path(second)] == b"second"
+    labels = files["labels.csv"].decode()
+    assert f"{queue.pending_path(first)},resting" in labels and f"{queue.pending_path(second)},hunting" in labels
+
+    with pytest.raises(ValueError, match="repeats paths"):
+        _client(fake_github).commit_batch([PendingFile("pending/a.wav", b"1"), PendingFile("pending/a.wav", b"2")], [], "dup")
+
+
+def test_worker_retries_transient_errors_and_keeps_failed_batches(tmp_path, fake_github):
+    queue = ContributionQueue(tmp_path / "queue.sqlite3", max_attempts=1)
+    queue.enqueue(b"clip", "clip.wav", None, None, None, "resting", 0.4)
+    fake_github.fail_next_posts = 2  # absorbed by the session's retry policy
+    worker = ContributionWorker(queue, client_factory=lambda: _client(fake_github))
+    assert worker.flush_once() == 1
+
+    queue.enqueue(b"clip2", "clip2.wav", None, None, None, "resting", 0.4)
+    unreachable = lambda: GitHubBatchClient("t", "o", "r", "e", api_url="http://127.0.0.1:9", retries=0)  # noqa: E731
+    failing = ContributionWorker(queue, client_factory=unreachable)
+    with pytest.raises(Exception):
+        failing.flush_once()
+    assert queue.counts() == {"pushed": 1, "failed": 1}
+
+
+def test_overlapping_flushers_claim_disjoint_rows(tmp_path, fake_github):
+    # The old and new slot-0 workers of a rolling restart flush the same queue file.
+    old = ContributionQueue(tmp_path / "queue.sqlite3")
+    for i in range(4):
+        old.enqueue(f"clip-{i}".encode(), f"clip{i}.wav", None, None, None, "resting", 0.4)
+    claimed = old.next_batch(2)
+    assert [item.id for item in claimed] == [1, 2]
+
+    new = ContributionQueue(tmp_path / "queue.sqlite3")
+    assert new.depth() == 4  # claimed rows still count until pushed
+    worker = ContributionWorker(new, client_factory=lambda: _client(fake_github))
+    assert worker.flush_once() == 2
+    assert worker.flush_once() == 0
+    assert fake_github.ref_updates == 1
+    assert sorted(path for path in fake_github.files() if path.startswith("pending/")) == sorted(
+        new.pending_path(i) for i in (3, 4)
+    )
+
+    # A flusher that dies mid-batch leaves its claim behind; once the lease runs out
+    # the rows are claimed again rather than stranded.
+    stale = ContributionQueue(tmp_path / "queue.sqlite3", lease_seconds=0.0)
+    fifth = stale.enqueue(b"clip-4", "clip4.wav", None, None, None, "resting", 0.4)
+    assert [item.id for item in stale.next_batch(10)] == [fifth]
+    assert [item.id for item in new.next_batch(10)] == [fifth]  # rows 1-2 are still leased
+
+
+def _calls(seed, seconds=3, sr=16000):
+    rng = np.random.default_rng(seed)
+    wave = rng.normal(0, 0.02, sr * seconds)
+    t = np.arange(sr // 10) / sr
+    for start in rng.integers(0, len(wave) - len(t), 8 * seconds):
+        wave[start : start + len(t)] += np.sin(2 * np.pi * rng.uniform(300, 6000) * t) * np.hanning(len(t))
+    return (wave / np.abs(wave).max()).astype(np.float32)
+
+
+def test_fingerprint_index_finds_near_duplicates_across_log_and_compaction(tmp_path):
+    index = FingerprintIndex(tmp_path / "index")
+    for i in range(5):
+        index.add(f"pending/clip_{i}.wav", *fingerprint(_calls(i)))
+    noisy = _calls(3)[4000:] + np.random.default_rng(9).normal(0, 0.05, 44000).astype(np.float32)
+    match = index.find_duplicate(*fingerprint(noisy))
+    assert match is not None and match.path == "pending/clip_3.wav"
+    assert index.find_duplicate(*fingerprint(_calls(99))) is None
+
+    index.close()
+    index = FingerprintIndex(tmp_path / "index")  # replays the log
+    assert len(index) == 5 and index.find_duplicate(*fingerprint(_calls(3))).path == "pending/clip_3.wav"
+    index.remove("pending/clip_3.wav")
+    index.add("pending/clip_1.wav", *fingerprint(_calls(7)))  # re-indexed with new audio
+    generation = index.compact()
+    assert generation == "gen-000001" and index.stats()["log_clips"] == 0
+    assert not (tmp_path / "index" / "gen-000000").exists()
+
+    with (tmp_path / "index" / generation / "delta.log").open("ab") as log:
+        log.write(b"\x01torn")  # a crash mid-append
+    index.close()
+    index = FingerprintIndex(tmp_path / "index")
+    assert len(index) == 4 and "pending/clip_3.wav" not in index
+    assert index.find_duplicate(*fingerprint(_calls(3))) is None
+    assert index.find_duplicate(*fingerprint(_calls(7))).path == "pending/clip_1.wav"
+    assert index.find_duplicate(*fingerprint(_calls(4))).path == "pending/clip_4.wav"
+
+
+def test_fingerprint_index_sync_only_refingerprints_changed_clips(tmp_path):
+    pending = tmp_path / "pending"
+    (pending / "resting").mkdir(parents=True)
+    for i in range(3):
+        wavfile.write(pending / "resting" / f"clip_{i}.wav", 16000, _calls(i))
+    (pending / "resting" / "broken.wav").write_bytes(b"not audio")
+    (pending / "labels.csv").write_text("filename,label\n")
+    index = FingerprintIndex(tmp_path / "index")
+    calls = []
+
+    def counting_fingerprint_file(path):
+        calls.append(path.name)
+        return fingerprint_file(path)
+
+    counts = index.sync(pending, counting_fingerprint_file)
+    assert counts == {"added": 3, "updated": 0, "removed": 0, "failed": 1, "unchanged": 0}
+    assert "pending/resting/clip_0.wav" in index
+
+    calls.clear()
+    wavfile.write(pending / "resting" / "clip_1.wav", 16000, _calls(11))
+    (pending / "resting" / "clip_2.wav").unlink()
+    counts = index.sync(pending, counting_fingerprint_file)
+    assert counts == {"added": 0, "updated": 1, "removed": 1, "failed": 1, "unchanged": 1}
+    assert sorted(calls) == ["broken.wav", "clip_1.wav"]
+    assert index.find_duplicate(*fingerprint(_calls(11))).path == "pending/resting/clip_1.wav"
+
+
+def test_queue_contribution_skips_clips_already_contributed(tmp_path, monkeypatch):
+    for name in ("GH_TOKEN", "GITHUB_OWNER", "COMMITTER_EMAIL"):
+        monkeypatch.setenv(name, "x")
+    queue = ContributionQueue(tmp_path / "queue.sqlite3")
+    index = FingerprintIndex(tmp_path / "index")
+    args = dict(contributor=None, provided_label=None, notes=None, predicted_label="resting", confidence=0.4, fingerprints=index)
+
+    first = queue_contribution(queue, None, b"clip", "call.wav", fingerprint=fingerprint(_calls(0)), **args)
+    assert first.status == "queued" and len(index) == 1
+    again = queue_contribution(queue, None, b"clip", "call again.wav", fingerprint=fingerprint(0.5 * _calls(0)[800:]), **args)
+    assert again.status == "duplicate" and queue.depth() == 1
+    assert queue.pending_path(1) in again.message
+    other = queue_contribution(queue, None, b"clip", "other.wav", fingerprint=fingerprint(_calls(1)), **args)
+    assert other.status == "queued" and queue.depth() == 2
+
+
+def test_clip_whose_push_fails_is_dropped_from_the_fingerprint_index(tmp_path, monkeypatch):
+    for name in ("GH_TOKEN", "GITHUB_OWNER", "COMMITTER_EMAIL"):
+        monkeypatch.setenv(name, "x")
+    queue = ContributionQueue(tmp_path / "queue.sqlite3", max_attempts=1)
+    index = FingerprintIndex(tmp_path / "index")
+    args = dict(contributor=None, provided_label=None, notes=None, predicted_label="resting", confidence=0.4, fingerprints=index)
+    assert queue_contribution(queue, None, b"clip", "call.wav", fingerprint=fingerprint(_calls(0)), **args).status == "queued"
+
+    unreachable = lambda: GitHubBatchClient("t", "o", "r", "e", api_url="http://127.0.0.1:9", retries=0)  # noqa: E731
+    with pytest.raises(Exception):
+        ContributionWorker(queue, client_factory=unreachable, fingerprints=index).flush_once()
+    assert queue.counts() == {"failed": 1} and len(index) == 0
+    assert queue_contribution(queue, None, b"clip", "call.wav", fingerprint=fingerprint(_calls(0)), **args).status == "queued"
+
+
+def test_fingerprint_index_sees_other_processes_writes(tmp_path):
+    # Two handles on one directory stand in for two pre-forked API workers.
+    first, second = FingerprintIndex(tmp_path / "index"), FingerprintIndex(tmp_path / "index")
+    first.add("pending/a.wav", *fingerprint(_calls(0)))
+    second.add("pending/b.wav", *fingerprint(_calls(1)))
+    assert first.find_duplicate(*fingerprint(_calls(1))).path == "pending/b.wav"
+    second.remove("pending/a.wav")
+    assert first.find_duplicate(*fingerprint(_calls(0))) is None
+    first.compact()
+    assert second.find_duplicate(*fingerprint(_calls(1))).path == "pending/b.wav" and second.generation == first.generation
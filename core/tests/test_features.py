@@ -0,0 +1,113 @@
+import numpy as np
+from scipy.io import wavfile
+
+from src.features.audio_embeddings import (
+    StreamingFeatureAccumulator,
+    compute_features,
+    compute_features_framed,
+    compute_features_streaming,
+    frame_starts,
+)
+from src.features.fingerprint import fingerprint
+from src.features.spectral import EmbeddingAccumulator, EmbeddingConfig, extract_embedding, windowed_embeddings
+from src.preprocess.audio_preprocess import iter_audio_blocks, load_audio_mono, normalize_audio
+
+
+def test_streaming_features_match_whole_file(tmp_path):
+    sr = 16000
+    t = np.arange(sr * 8) / sr
+    wave = 0.5 * np.sin(2 * np.pi * 440 * t) + 0.3 * np.sin(2 * np.pi * 1500 * t)
+    path = tmp_path / "long.wav"
+    wavfile.write(path, sr, wave.astype(np.float32))
+
+    whole = compute_features(*reversed(load_audio_mono(path)))
+    streamed = compute_features_streaming(iter_audio_blocks(path, block_size=5000), sr)
+    assert np.isclose(streamed["rms"], whole["rms"], rtol=1e-5)
+    assert np.isclose(streamed["zero_cross_rate"], whole["zero_cross_rate"], rtol=1e-6)
+    assert np.isclose(streamed["spectral_centroid"], whole["spectral_centroid"], rtol=1e-4)
+
+
+def test_streaming_features_match_whole_file_on_noisy_audio(tmp_path):
+    rng = np.random.default_rng(0)
+    for sr in (16000, 44100):
+        t = np.arange(sr * 10) / sr
+        wave = 0.5 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.normal(size=len(t))
+        path = tmp_path / f"noisy_{sr}.wav"
+        wavfile.write(path, sr, wave.astype(np.float32))
+
+        whole = compute_features(*reversed(load_audio_mono(path)))
+        streamed = compute_features_streaming(iter_audio_blocks(path, block_size=5000), 16000)
+        assert np.isclose(streamed["rms"], whole["rms"], rtol=1e-5)
+        assert np.isclose(streamed["zero_cross_rate"], whole["zero_cross_rate"], rtol=1e-6)
+        assert np.isclose(streamed["spectral_centroid"], whole["spectral_centroid"], rtol=1e-4)
+
+
+def test_streaming_counts_zero_crossings_at_block_boundaries():
+    wave = np.array([0.5, -0.5] * 50, dtype=np.float32)
+    accumulator = StreamingFeatureAccumulator(16000)
+    for block in np.array_split(wave, 7):
+        accumulator.update(block)
+    result = accumulator.result()
+    expected = compute_features(normalize_audio(wave), 16000)
+    assert result["zero_cross_rate"] == expected["zero_cross_rate"]
+    assert np.isclose(result["rms"], expected["rms"], rtol=1e-6)
+
+
+def test_framed_features_match_per_window_compute_features():
+    wave = np.random.default_rng(0).normal(size=20000).astype(np.float32)
+    wave = normalize_audio(wave)
+    for window, hop in ((4000, 1500), (10000, 2500)):  # shorter and longer than a centroid frame
+        framed = compute_features_framed(wave, 16000, window, hop)
+        for i, start in enumerate(frame_starts(len(wave), window, hop)):
+            expected = compute_features(wave[start : start + window], 16000)
+            for key, value in expected.items():
+                assert np.isclose(framed[key][i], value, rtol=1e-5)
+
+
+def test_framed_embeddings_stream_and_window_consistently():
+    sr = 16000
+    t = np.arange(sr * 2) / sr
+    rng = np.random.default_rng(0)
+    wave = normalize_audio(np.sin(2 * np.pi * 440 * t) + 0.2 * rng.normal(size=len(t))).astype(np.float32)
+    for mode in ("logmel", "mfcc"):
+        config = EmbeddingConfig(mode=mode)
+        whole = extract_embedding(wave, sr, config)
+        assert whole.shape == (config.dim,)
+
+        # Un-normalized blocks: the peak shift is applied at the end.
+        accumulator = EmbeddingAccumulator(sr, config)
+        for block in np.array_split(wave * 0.25, 9):
+            accumulator.update(block)
+        assert np.allclose(accumulator.result(), whole, atol=1e-4)
+
+        window, hop = 8000, 3200  # multiples of config.hop, so windows share the clip's frame grid
+        windows = windowed_embeddings(wave, sr, config, window, hop)
+        for i, start in enumerate(frame_starts(len(wave), window, hop)):
+            assert np.allclose(windows[i], extract_embedding(wave[start : start + window], sr, config), atol=1e-4)
+
+    basic = extract_embedding(wave, sr, EmbeddingConfig())
+    assert basic.shape == (3,)
+
+
+def _bursts(rng, sr, seconds):
+    # Short random tones, like a string of calls: plenty of distinct spectral peaks.
+    wave = rng.normal(0, 0.02, sr * seconds)
+    t = np.arange(sr // 10) / sr
+    for start in rng.integers(0, len(wave) - len(t), 8 * seconds):
+        wave[start : start + len(t)] += np.sin(2 * np.pi * rng.uniform(300, 6000) * t) * np.hanning(len(t))
+    return wave.astype(np.float32)
+
+
+def test_fingerprint_survives_gain_and_trim_but_not_other_audio():
+    sr = 16000
+    rng = np.random.default_rng(0)
+    call, other = _bursts(rng, sr, 3), _bursts(rng, sr, 3)
+    hashes, anchors = fingerprint(call, sr)
+    assert hashes.dtype == np.uint32 and anchors.dtype == np.uint16 and len(hashes) == len(anchors) > 40
+
+    louder, _ = fingerprint(0.3 * call, sr)
+    assert np.isin(louder, hashes).mean() > 0.9
+    trimmed, _ = fingerprint(call[sr // 2 :], sr)
+    assert np.isin(trimmed, hashes).mean() > 0.3
+    unrelated, _ = fingerprint(other, sr)
+    assert np.isin(unrelated, hashes).mean() < 0.05
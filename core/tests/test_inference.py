@@ -1,13 +1,35 @@
+import asyncio
+import io
 import json
-import tempfile
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
 from pathlib import Path
 
 import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 from scipy.io import wavfile
 
-from app.fastapi_app import UPLOAD_PREFIX, app
+from app import fastapi_app
+from app.fastapi_app import app
+from src.features.audio_embeddings import compute_features, to_feature_vector
+from src.features.spectral import EmbeddingConfig
+from src.inference.batcher import MicroBatcher
+from src.inference.cache import ResultCache
+from src.inference.pool import InferencePool
 from src.inference.predictor import Predictor
+from src.inference.stream import StreamSession
+from src.inference.timeline import merge_events
+from src.models.checkpoint import load_binary, make_checkpoint, save_binary, save_json
+from src.models.ensemble import save_manifest
+from src.models.fusion_model import RuleBasedFusionModel, fit_stacking
+from src.preprocess.audio_preprocess import load_audio_mono
+from src.utils import metrics
+from src.utils.upload_limits import BodySizeLimitMiddleware
 
 
 def make_tone(tmp_path, freq=440.0, sr=16000, duration=0.5):
@@ -26,17 +48,493 @@ def test_predictor_output_schema(tmp_path):
     assert abs(sum(pred["probs"].values()) - 1.0) < 1e-4
 
 
-def test_fastapi_upload_deletes_temp_file(tmp_path):
+def test_fastapi_upload_reports_contribution(tmp_path):
     client = TestClient(app)
-    before = list(Path(tempfile.gettempdir()).glob(f"{UPLOAD_PREFIX}*"))
     path = make_tone(tmp_path, freq=220.0)
     with path.open("rb") as f:
         response = client.post("/upload", files={"file": ("tone.wav", f, "audio/wav")}, data={"contribute": "false"})
     assert response.status_code == 200
-    after = list(Path(tempfile.gettempdir()).glob(f"{UPLOAD_PREFIX}*"))
-    # Ensure no new lingering temp files remain with the prefix
-    assert len(after) == len(before)
 
     payload = json.loads(response.content.decode("utf-8"))
     assert "contribution" in payload
     assert payload["contribution"]["status"] in {"skipped", "error", "pushed"}
+
+
+def test_api_import_defers_heavy_dependencies():
+    # Fresh interpreter: scipy and requests load on first use (or warm-up), not on import.
+    code = "import sys, app.fastapi_app; print(sorted(m for m in ('scipy', 'requests') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=Path(__file__).parents[1])
+    assert out.stdout.strip() == "[]"
+
+
+def test_lazy_predictor_loads_on_warm_up(tmp_path):
+    checkpoint = tmp_path / "weights.json"
+    save_json(checkpoint, make_checkpoint(["a", "b"], np.ones((2, 3)), np.zeros(2)))
+    predictor = Predictor(checkpoint, lazy=True)
+    assert predictor._model is None
+    assert predictor.warm_up(sample_rates=(16000, 44100)) > 0
+    assert predictor._model is not None and predictor.labels == ["a", "b"]
+
+
+def test_ready_only_after_warm_up(monkeypatch):
+    monkeypatch.setattr(fastapi_app, "WARM_UP", False)
+    client = TestClient(app)
+    assert client.get("/ready").status_code == 503
+    with client:  # runs the lifespan startup
+        assert client.get("/ready").json() == {"ready": True}
+
+
+def test_prefork_server_shares_socket_and_restarts_on_checkpoint_change(tmp_path):
+    import requests
+
+    checkpoint = tmp_path / "weights.json"
+    save_json(checkpoint, make_checkpoint(["a", "b"], np.ones((2, 3)), np.zeros(2)))
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, "CHECKPOINT_PATH": str(checkpoint), "CONTRIB_QUEUE_PATH": str(tmp_path / "queue.sqlite3")}
+    cmd = [sys.executable, "-m", "app.serve", "--workers", "2", "--host", "127.0.0.1", "--port", str(port), "--check-interval", "0.2"]
+    proc = subprocess.Popen(cmd, env=env, cwd=Path(__file__).parents[1], stdout=subprocess.DEVNULL)
+
+    def workers(want_id=None, deadline=30.0):
+        seen, end = {}, time.time() + deadline
+        while time.time() < end and len(seen) < 2:
+            try:
+                health = requests.get(f"http://127.0.0.1:{port}/health", timeout=2).json()
+                if health["ready"] and health["checkpoint"]["id"] == (want_id or health["checkpoint"]["id"]):
+                    seen[health["pid"]] = health["checkpoint"]["id"]
+            except requests.RequestException:
+                time.sleep(0.1)
+        return seen
+
+    try:
+        first = workers()
+        assert len(first) == 2
+        save_json(checkpoint, make_checkpoint(["a", "b"], np.ones((2, 3)), np.ones(2)))
+        second = workers(want_id=Predictor(checkpoint).checkpoint_id)
+        assert len(second) == 2 and not set(first) & set(second)  # replaced, not reloaded in place
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
+
+
+def test_predict_batch_matches_single_file(tmp_path):
+    rng = np.random.default_rng(0)
+    labels = ["a", "b", "c"]
+    weights, bias = rng.normal(size=(3, 3)), rng.normal(size=3)
+    save_json(tmp_path / "weights.json", make_checkpoint(labels, weights, bias))
+    predictor = Predictor(tmp_path / "weights.json")
+    paths = []
+    for i, freq in enumerate([220.0, 440.0, 880.0, 1760.0]):
+        sub = tmp_path / str(i)
+        sub.mkdir()
+        paths.append(make_tone(sub, freq=freq))
+
+    batch = predictor.predict_batch(paths)
+    assert len(batch) == len(paths)
+    for path, pred in zip(paths, batch):
+        # Scored by hand, one clip at a time, outside the predictor.
+        sr, audio = load_audio_mono(path)
+        logits = weights @ to_feature_vector(compute_features(audio, sr)) + bias
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        assert pred["label"] == labels[int(np.argmax(probs))]
+        assert np.allclose([pred["probs"][label] for label in labels], probs, atol=1e-5)
+        assert np.isclose(pred["confidence"], probs.max(), atol=1e-5)
+
+
+def test_fastapi_upload_batch(tmp_path):
+    client = TestClient(app)
+    low = make_tone(tmp_path, freq=220.0)
+    sub = tmp_path / "b"
+    sub.mkdir()
+    high = make_tone(sub, freq=880.0)
+    with low.open("rb") as f1, high.open("rb") as f2:
+        response = client.post(
+            "/upload/batch",
+            files=[("files", ("low.wav", f1, "audio/wav")), ("files", ("high.wav", f2, "audio/wav"))],
+        )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["filename"] for r in results] == ["low.wav", "high.wav"]
+    for result in results:
+        assert abs(sum(result["probs"].values()) - 1.0) < 1e-4
+
+
+def test_fastapi_upload_returns_503_when_queue_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "result_cache", None)
+    monkeypatch.setattr(fastapi_app.inference_pool, "_in_flight", fastapi_app.inference_pool.capacity)
+    client = TestClient(app)
+    path = make_tone(tmp_path)
+    with path.open("rb") as f:
+        response = client.post("/upload", files={"file": ("tone.wav", f, "audio/wav")})
+    assert response.status_code == 503
+
+
+def test_fastapi_upload_rejects_oversized_and_undecodable_files(monkeypatch):
+    monkeypatch.setattr(fastapi_app, "result_cache", None)
+    client = TestClient(app)
+    response = client.post("/upload", files={"file": ("big.wav", b"\0" * (6 * 1024 * 1024), "audio/wav")})
+    assert response.status_code == 413
+    response = client.post("/upload", files={"file": ("notes.txt", b"not audio at all", "text/plain")})
+    assert response.status_code == 415
+
+
+def test_body_size_limit_stops_reading_a_chunked_body():
+    chunks = [b"x" * 1000] * 10
+    received, sent = [], []
+
+    async def app_(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+
+    async def receive():
+        received.append(1)
+        return {"type": "http.request", "body": chunks[len(received) - 1], "more_body": len(received) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = BodySizeLimitMiddleware(app_, {"/upload": 2500})
+    asyncio.run(middleware({"type": "http", "path": "/upload", "headers": []}, receive, send))
+    assert len(received) == 3
+    assert sent[0]["status"] == 413
+
+
+def test_upload_batcher_coalesces_requests_and_isolates_bad_clips(tmp_path):
+    low = make_tone(tmp_path, freq=220.0).read_bytes()
+    high = make_tone(tmp_path, freq=880.0).read_bytes()
+    sizes = []
+
+    async def score(payloads):
+        sizes.append(len(payloads))
+        return await fastapi_app._score_uploads(payloads)
+
+    async def run():
+        batcher = MicroBatcher(score, max_batch_size=8, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit(p) for p in (low, b"not a wav", high)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sizes == [3]
+    assert results[0]["probs"] == fastapi_app.predictor.predict_from_bytes(low)["probs"]
+    assert results[2]["probs"] == fastapi_app.predictor.predict_from_bytes(high)["probs"]
+    assert isinstance(results[1], Exception)
+
+
+def test_fastapi_metrics_and_server_timing(tmp_path, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "result_cache", None)
+    monkeypatch.setattr(metrics, "SERVER_TIMING", True)
+    client = TestClient(app)
+    path = make_tone(tmp_path, sr=44100)
+    with path.open("rb") as f:
+        response = client.post("/upload", files={"file": ("tone.wav", f, "audio/wav")})
+    assert response.status_code == 200
+    # Stages run on a pool thread but are still attributed to this request.
+    timing = response.headers["server-timing"]
+    for name in ("upload.read", "upload.inference", "audio.decode", "audio.resample", "features.fft", "predict.score", "total"):
+        assert f"{name};dur=" in timing
+
+    text = client.get("/metrics").text
+    assert "# TYPE cheetahsense_stage_seconds histogram" in text
+    assert 'cheetahsense_stage_seconds_bucket{stage="audio.decode",le="+Inf"}' in text
+    assert "cheetahsense_pool_in_flight 0" in text
+
+
+def test_metrics_stage_is_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    with metrics.collect_timings() as timings, metrics.stage("disabled.stage"):
+        pass
+    assert timings == []
+    assert "disabled.stage" not in metrics.render_prometheus()
+
+
+def test_process_pool_matches_inline(tmp_path):
+    payload = make_tone(tmp_path, freq=880.0).read_bytes()
+    predictor = Predictor()
+    pool = InferencePool(predictor, kind="process", workers=1)
+    try:
+        pooled = asyncio.run(pool.run("predict_from_bytes", payload))
+    finally:
+        pool.shutdown()
+    assert pooled["probs"] == predictor.predict_from_bytes(payload)["probs"]
+
+
+def test_merge_events_joins_adjacent_labels():
+    segments = [
+        {"start": 0.0, "end": 1.0, "label": "resting", "confidence": 0.8},
+        {"start": 0.5, "end": 1.5, "label": "resting", "confidence": 0.6},
+        {"start": 1.0, "end": 2.0, "label": "hunting", "confidence": 0.9},
+    ]
+    events = merge_events(segments)
+    assert [(e["start"], e["end"], e["label"]) for e in events] == [(0.0, 1.5, "resting"), (1.0, 2.0, "hunting")]
+    assert abs(events[0]["confidence"] - 0.7) < 1e-9
+
+
+def test_fastapi_timeline(tmp_path):
+    client = TestClient(app)
+    path = make_tone(tmp_path, duration=2.0)
+    with path.open("rb") as f:
+        response = client.post("/timeline", files={"file": ("tone.wav", f, "audio/wav")}, data={"window": "0.5", "hop": "0.25"})
+    assert response.status_code == 200
+    payload = response.json()
+    assert len(payload["segments"]) == 7
+    assert payload["events"][0]["start"] == 0.0
+    assert payload["events"][-1]["end"] == 2.0
+
+
+def test_result_cache_hits_and_invalidates_on_checkpoint_change(tmp_path):
+    checkpoint = tmp_path / "weights.json"
+    checkpoint.write_text("{}", encoding="utf-8")
+    cache = ResultCache(max_entries=2, disk_dir=tmp_path / "cache", watch_path=checkpoint)
+    predictor = Predictor(checkpoint_path=checkpoint, cache=cache)
+    path = make_tone(tmp_path)
+
+    first = predictor.predict_from_file(path)
+    second = predictor.predict_from_file(path)
+    assert first == second
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache._entries.clear()
+    predictor.predict_from_file(path)
+    assert cache.disk_hits == 1
+
+    checkpoint.write_text('{"bias": [0.0, 0.0, 0.0]}', encoding="utf-8")
+    predictor.predict_from_file(path)
+    assert cache.invalidations == 1
+    assert cache.misses == 2
+
+
+def test_result_cache_expires_entries():
+    cache = ResultCache(ttl_seconds=0.0)
+    cache.put("k", {"label": "resting"})
+    assert cache.get("k") is None
+
+
+def test_binary_checkpoint_round_trip_and_hot_reload(tmp_path):
+    path = tmp_path / "weights.ckpt"
+    labels = ["distress", "hunting", "resting"]
+    original = make_checkpoint(labels, np.eye(3), np.zeros(3), feature_mean=np.ones(3), feature_std=np.full(3, 2.0))
+    save_binary(path, original)
+
+    loaded = load_binary(path, verify=True)
+    assert loaded.labels == labels and loaded.content_hash == original.content_hash
+    assert np.array_equal(loaded.feature_std, original.feature_std)
+
+    json_path = tmp_path / "weights.json"
+    save_json(json_path, original)
+    assert Predictor(json_path).checkpoint_id == Predictor(path).checkpoint_id
+    inode = json_path.stat().st_ino
+    save_json(json_path, original)  # replaced by rename, never rewritten in place
+    assert json_path.stat().st_ino != inode and not list(tmp_path.glob("*.tmp"))
+
+    predictor = Predictor(path, watch_interval=0.0)
+    assert predictor.labels == labels
+    save_binary(path, make_checkpoint(["a", "b"], np.ones((2, 3)), np.zeros(2)))
+    assert predictor.labels == ["a", "b"]
+    assert set(predictor.predict_batch([np.ones(1600, dtype=np.float32)])[0]["probs"]) == {"a", "b"}
+
+
+def test_predictor_uses_checkpoint_feature_config(tmp_path):
+    config = EmbeddingConfig(mode="mfcc", n_mfcc=8)
+    path = tmp_path / "mfcc.ckpt"
+    rng = np.random.default_rng(0)
+    save_binary(path, make_checkpoint(["a", "b"], rng.normal(size=(2, config.dim)), np.zeros(2), features=config.to_dict()))
+    predictor = Predictor(path)
+    assert predictor.feature_configs == [config]
+
+    tone = make_tone(tmp_path, duration=1.0)
+    single = predictor.predict_from_file(tone)
+    assert set(single["features"]) == {"rms", "spectral_centroid", "zero_cross_rate"}
+    assert np.isclose(predictor.predict_streaming(tone, block_size=3000)["confidence"], single["confidence"], atol=1e-4)
+    assert len(predictor.predict_timeline(tone, window_seconds=0.25, hop_seconds=0.25)["segments"]) == 4
+
+    save_json(tmp_path / "bad.json", make_checkpoint(["a", "b"], np.ones((2, 3)), np.zeros(2), features=config.to_dict()))
+    with pytest.raises(ValueError):
+        Predictor(tmp_path / "bad.json")
+
+
+def test_ensemble_predictor_matches_fused_members(tmp_path):
+    rng = np.random.default_rng(0)
+    mfcc = EmbeddingConfig(mode="mfcc", n_mfcc=6)
+    labels = ["a", "b", "c"]
+    members = [
+        make_checkpoint(labels, rng.normal(size=(3, 3)), rng.normal(size=3), feature_mean=np.ones(3), feature_std=np.full(3, 2.0)),
+        make_checkpoint(["c", "a", "b"], rng.normal(size=(3, 3)), rng.normal(size=3)),
+        make_checkpoint(labels, rng.normal(size=(3, mfcc.dim)), rng.normal(size=3), features=mfcc.to_dict()),
+    ]
+    for i, checkpoint in enumerate(members):
+        save_json(tmp_path / f"m{i}.json", checkpoint)
+    names = [f"m{i}.json" for i in range(3)]
+    clips = [make_tone(tmp_path, freq=f).read_bytes() for f in (300.0, 900.0)]
+
+    per_member = np.array(
+        [[[p["probs"][label] for label in labels] for p in Predictor(tmp_path / name).predict_batch(clips)] for name in names]
+    )
+    for fusion in (RuleBasedFusionModel(3), RuleBasedFusionModel(3, "weighted", weights=[2, 1, 1]), RuleBasedFusionModel(3, "log_mean")):
+        save_manifest(tmp_path / "ensemble.json", names, fusion)
+        results = Predictor(tmp_path / "ensemble.json").predict_batch(clips)
+        got = np.array([[r["probs"][label] for label in labels] for r in results])
+        assert np.allclose(got, fusion.fuse_log_probs(np.log(per_member)), atol=1e-5)
+
+    fusion = fit_stacking(np.log(per_member), np.array([0, 1]), epochs=20, validation_split=0.0)
+    save_manifest(tmp_path / "ensemble.json", names, fusion)
+    predictor = Predictor(tmp_path / "ensemble.json", watch_interval=0.0)
+    assert predictor.model.num_members == 3 and len(predictor.feature_configs) == 2
+    before = predictor.checkpoint_id
+    save_json(tmp_path / "m1.json", make_checkpoint(labels, np.zeros((3, 3)), np.zeros(3)))
+    assert predictor.predict_batch(clips[:1]) and predictor.checkpoint_id != before
+
+
+def test_fusion_model_keeps_plain_mean():
+    probs = [np.array([0.7, 0.3]), np.array([0.1, 0.9])]
+    assert np.allclose(RuleBasedFusionModel(num_models=2).fuse(probs), [0.4, 0.6])
+    with pytest.raises(ValueError):
+        RuleBasedFusionModel(num_models=2).fuse([])
+    # Default weights average however many vectors arrive, as before weights existed.
+    three = probs + [np.array([0.4, 0.6])]
+    assert np.allclose(RuleBasedFusionModel().fuse(three), [0.4, 0.6])
+    with pytest.raises(ValueError, match="weights for 2 models, got 3"):
+        RuleBasedFusionModel(2, "weighted", weights=[1, 3]).fuse(three)
+
+
+def test_stream_session_drops_windows_when_consumer_lags():
+    session = StreamSession(sample_rate=100, window_seconds=1.0, hop_seconds=0.5, max_lag_hops=2)
+    assert not session.push(np.ones(60, dtype=np.float32))
+    assert session.push(np.ones(50, dtype=np.float32))
+    assert session.next_window()[0] == 0 and session.next_window() is None
+
+    ramp = np.arange(1000, dtype=np.float32)
+    session.push(ramp)  # far more than the ring holds; only the newest window is kept
+    index, window = session.next_window()
+    assert index == 20 and session.dropped == 19
+    assert np.allclose(window * ramp[-11], ramp[-110:-10])  # windows end on the hop grid
+
+
+def test_fastapi_stream_emits_prediction_per_hop():
+    sr = 16000
+    t = np.arange(int(sr * 1.6)) / sr
+    pcm = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    client = TestClient(app)
+    with client.websocket_connect("/stream?window=1.0&hop=0.25") as ws:
+        config = ws.receive_json()
+        assert config["type"] == "config" and config["hop"] == 0.25
+        for chunk in np.array_split(pcm, 16):
+            ws.send_bytes(chunk.tobytes())
+        # Windows end at 1.0, 1.25 and 1.5s; any the server skipped show up in "dropped".
+        predictions = [ws.receive_json()]
+        while predictions[-1]["index"] < 2:
+            predictions.append(ws.receive_json())
+        assert len(predictions) + predictions[-1]["dropped"] == 3
+    assert all(p["type"] == "prediction" and p["latency_ms"] >= 0 for p in predictions)
+    assert predictions[-1]["index"] == 2 and predictions[-1]["end"] == 1.5
+
+
+def test_fastapi_stream_at_44k_matches_upload_of_the_same_clip():
+    sr = 44100
+    rng = np.random.default_rng(0)
+    t = np.arange(sr) / sr
+    clip = (0.3 * np.sin(2 * np.pi * 1200 * t) + rng.normal(0, 0.05, sr)).astype(np.float32)
+    buffer = io.BytesIO()
+    wavfile.write(buffer, sr, clip)
+    client = TestClient(app)
+    uploaded = client.post("/upload", files={"file": ("clip.wav", buffer.getvalue(), "audio/wav")}).json()
+    with client.websocket_connect(f"/stream?sample_rate={sr}&encoding=f32le&window=1.0&hop=1.0") as ws:
+        ws.receive_json()
+        ws.send_bytes(clip.tobytes())
+        streamed = ws.receive_json()
+    assert streamed["label"] == uploaded["label"]
+    for label, prob in uploaded["probs"].items():
+        assert streamed["probs"][label] == pytest.approx(prob, abs=1e-4)
+
+
+def test_bulk_score_resumes_after_torn_write(tmp_path, monkeypatch):
+    from scripts import bulk_score
+
+    sr = 16000
+    t = np.arange(4000) / sr
+    for i in range(5):
+        wavfile.write(tmp_path / f"{i}.wav", sr, np.sin(2 * np.pi * (200 + 300 * i) * t).astype(np.float32))
+    (tmp_path / "broken.wav").write_bytes(b"not a wav")
+    output = tmp_path / "scores.csv"
+    argv = ["bulk_score", str(tmp_path), "--output", str(output), "--workers", "1", "--shard-size", "2"]
+    monkeypatch.setattr("sys.argv", argv)
+    bulk_score.main()
+    full = output.read_text().splitlines()
+    assert len(full) == 7 and sum("broken.wav" in line and "Error" in line for line in full) == 1
+
+    output.write_text("\n".join(full[:3]) + "\n" + full[3][:20])
+    bulk_score.main()
+    resumed = output.read_text().splitlines()
+    assert sorted(resumed) == sorted(full)
+
+
+def test_client_streams_retries_and_yields_results_as_they_complete(tmp_path):
+    import email.parser
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from src.client.api import ApiError, AsyncCheetahSenseClient, CheetahSenseClient
+
+    attempts, connections = {}, set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            assert "Content-Length" in self.headers and "Transfer-Encoding" not in self.headers
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            message = email.parser.BytesParser().parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+            parts = {p.get_param("name", header="content-disposition"): p for p in message.get_payload()}
+            name = parts["file"].get_filename()
+            connections.add(self.client_address)
+            attempts[name] = attempts.get(name, 0) + 1
+            if attempts[name] == 1:
+                status, reply = 503, {"detail": "busy"}
+            elif name == "bad.wav":
+                status, reply = 400, {"detail": "Could not decode"}
+            else:
+                status, reply = 200, {"label": name, "bytes": len(parts["file"].get_payload(decode=True)), "contribute": parts["contribute"].get_payload()}
+            data = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    for i in range(6):
+        (tmp_path / f"{i}.wav").write_bytes(os.urandom(1000 * (i + 1)))
+    (tmp_path / "bad.wav").write_bytes(b"not a wav")
+    (tmp_path / "notes.txt").write_text("skipped")
+    try:
+        with CheetahSenseClient(base, retries=2, backoff_factor=0) as client:
+            results = list(client.upload_directory(tmp_path, concurrency=2, contribute=True))
+            assert len(results) == 7 and sum(r.ok for r in results) == 6
+            for result in results:
+                assert result.attempts == 2
+                if result.ok:
+                    assert result.response["bytes"] == Path(result.source).stat().st_size
+                    assert result.response["contribute"] == "true"
+                else:
+                    assert isinstance(result.error, ApiError) and result.error.status == 400
+            assert len(connections) <= 2  # one kept-alive connection per in-flight upload
+
+        attempts.clear()
+        with CheetahSenseClient(base, retries=0) as client, pytest.raises(ApiError) as excinfo:
+            client.upload(tmp_path / "0.wav")
+        assert excinfo.value.status == 503
+
+        attempts.clear()
+
+        async def upload_async():
+            async with AsyncCheetahSenseClient(base, max_concurrency=3, backoff_factor=0) as client:
+                return [r async for r in client.upload_many(sorted(tmp_path.glob("[0-9].wav")))]
+
+        assert sorted(r.response["label"] for r in asyncio.run(upload_async())) == [f"{i}.wav" for i in range(6)]
+    finally:
+        server.shutdown()
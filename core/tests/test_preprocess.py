@@ -1,9 +1,15 @@
+import io
+import struct
 from pathlib import Path
 
 import numpy as np
+import pytest
+from scipy import signal
 from scipy.io import wavfile
 
-from src.preprocess.audio_preprocess import load_audio_mono, normalize_audio
+from src.preprocess.decode import AudioDecodeError, decode_audio
+from src.preprocess.audio_preprocess import iter_audio_blocks, load_audio_mono, load_audio_mono_from_bytes, normalize_audio
+from src.preprocess.resample import resample
 
 
 def test_load_audio_mono_resamples_and_normalizes(tmp_path):
@@ -23,3 +29,97 @@ def test_normalize_audio_handles_zero_vector():
     audio = np.zeros(10, dtype=np.float32)
     norm = normalize_audio(audio)
     assert np.allclose(norm, 0.0)
+
+
+def test_load_audio_mono_from_bytes_matches_file(tmp_path):
+    sr = 22050
+    t = np.linspace(0, 0.3, int(sr * 0.3), endpoint=False)
+    wave = 0.5 * np.sin(2 * np.pi * 330 * t)
+    path = tmp_path / "tone.wav"
+    wavfile.write(path, sr, wave.astype(np.float32))
+
+    file_sr, file_audio = load_audio_mono(path)
+    bytes_sr, bytes_audio = load_audio_mono_from_bytes(path.read_bytes())
+    assert bytes_sr == file_sr
+    assert np.array_equal(bytes_audio, file_audio)
+
+
+@pytest.mark.parametrize("dtype, scale, offset", [("int16", 32768, 0), ("int32", 2**31, 0), ("uint8", 128, 128), ("float32", 1, 0)])
+def test_decode_audio_downmixes_and_scales_pcm(tmp_path, dtype, scale, offset):
+    rng = np.random.default_rng(0)
+    wave = rng.uniform(-0.9, 0.9, size=(3000, 3))
+    pcm = (wave * (scale - 1) + offset).astype(dtype) if dtype != "float32" else wave.astype(dtype)
+    path = tmp_path / f"{dtype}.wav"
+    wavfile.write(path, 22050, pcm)
+
+    sr, audio = decode_audio(path)
+    assert sr == 22050 and audio.dtype == np.float32 and audio.flags.writeable
+    expected = ((pcm.astype(np.float64) - offset) / scale).mean(axis=1)
+    assert np.allclose(audio, expected, atol=1e-6)
+    # Bytes, BytesIO and the memory-mapped path all decode the same.
+    assert np.array_equal(decode_audio(path.read_bytes())[1], audio)
+    assert np.array_equal(decode_audio(io.BytesIO(path.read_bytes()))[1], audio)
+
+
+def test_decode_audio_falls_back_for_24_bit_and_rejects_non_audio(tmp_path):
+    # 24-bit PCM isn't parsed here; scipy's reader takes it.
+    samples = (np.sin(np.arange(800) * 0.05) * (2**23 - 1)).astype(np.int32)
+    raw = b"".join(int(v).to_bytes(4, "little", signed=True)[:3] for v in samples)
+    fmt = (1).to_bytes(2, "little") + (1).to_bytes(2, "little") + (8000).to_bytes(4, "little")
+    fmt += (8000 * 3).to_bytes(4, "little") + (3).to_bytes(2, "little") + (24).to_bytes(2, "little")
+    body = b"WAVE" + b"fmt " + len(fmt).to_bytes(4, "little") + fmt + b"data" + len(raw).to_bytes(4, "little") + raw
+    sr, audio = decode_audio(b"RIFF" + len(body).to_bytes(4, "little") + body)
+    assert sr == 8000
+    assert np.allclose(audio, samples / 2**23, atol=1e-6)
+
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"RIFF\x00\x00\x00\x00WAVEjunk")
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"definitely not audio")
+
+
+def _wav(fmt: bytes, data: bytes = b"") -> bytes:
+    chunks = b"fmt " + struct.pack("<I", 16) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"RIFF\x1c\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00",  # fmt chunk cut short
+        _wav(struct.pack("<HHIIHH", 1, 1, 0, 0, 2, 16), b"\x00\x01" * 8),  # sample_rate = 0
+        _wav(struct.pack("<HHIIHH", 1, 1, 16000, 32000, 0, 16), b"\x00\x01" * 8),  # block_align = 0
+        _wav(struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)),  # empty data chunk
+    ],
+    ids=["truncated-fmt", "zero-rate", "zero-block-align", "empty-data"],
+)
+def test_decode_audio_rejects_malformed_wav_headers(payload):
+    with pytest.raises(AudioDecodeError):
+        decode_audio(payload)
+
+
+def test_iter_audio_blocks_matches_whole_file_resample(tmp_path):
+    sr = 44100
+    wave = np.random.default_rng(0).normal(size=(int(sr * 1.3), 2)) * 0.1
+    path = tmp_path / "stereo.wav"
+    wavfile.write(path, sr, wave.astype(np.float32))
+
+    _, whole = load_audio_mono(path, target_sr=16000)
+    streamed = np.concatenate(list(iter_audio_blocks(path, target_sr=16000, block_size=4000)))
+    assert np.allclose(normalize_audio(streamed), whole)
+
+
+def test_resample_matches_resample_poly_and_fast_mode_keeps_length():
+    audio = np.random.default_rng(0).normal(size=44100).astype(np.float32)
+    high = resample(audio, 44100, 16000, quality="high")
+    assert high.dtype == np.float32
+    assert np.array_equal(high, signal.resample_poly(audio, 16000, 44100))
+    assert resample(audio, 44100, 16000, quality="fast").shape == high.shape
+
+
+def test_load_audio_mono_scales_int16_pcm(tmp_path):
+    path = tmp_path / "int16.wav"
+    wavfile.write(path, 16000, (np.ones(100) * 16384).astype(np.int16))
+    _, audio = load_audio_mono(path)
+    assert audio.dtype == np.float32
+    assert np.allclose(audio, 1.0)
@@ -0,0 +1,170 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from src.features.spectral import EmbeddingConfig
+from src.inference import predictor as predictor_module
+from src.inference.predictor import Predictor
+from src.models.softmax_regression import TrainResult, accuracy, fit_softmax_regression
+from src.train.feature_store import FeatureStore
+from src.train.sweep import confusion_matrix, cross_validate, per_class_metrics, stratified_folds
+from src.train.train import extract_features, extract_vector, load_dataset, prepare_features, save_checkpoint
+
+
+def make_clips(tmp_path, freqs, sr=16000, duration=0.3):
+    t = np.linspace(0, duration, int(sr * duration), endpoint=False)
+    paths = []
+    for freq in freqs:
+        path = tmp_path / f"tone_{int(freq)}.wav"
+        wavfile.write(path, sr, (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32))
+        paths.append(path)
+    return paths
+
+
+def test_extract_features_reuses_store_and_reextracts_changed_files(tmp_path):
+    paths = make_clips(tmp_path, [220.0, 440.0, 880.0])
+    store_dir = tmp_path / "store"
+
+    features, stats = extract_features(paths, 16000, store=FeatureStore(store_dir, {"sample_rate": 16000}), workers=2)
+    assert stats["cache_hits"] == 0
+    assert np.allclose(features[1], extract_vector(paths[1], 16000))
+
+    wavfile.write(paths[2], 16000, np.zeros(1600, dtype=np.float32))
+    store = FeatureStore(store_dir, {"sample_rate": 16000})
+    again, stats = extract_features(paths, 16000, store=store, workers=1)
+    assert (stats["cache_hits"], stats["extracted"]) == (2, 1)
+    assert np.allclose(again[:2], features[:2])
+    assert len(FeatureStore(store_dir, {"sample_rate": 16000})) == 3
+
+
+def test_prepare_features_trains_from_the_store_memmap(tmp_path):
+    paths = make_clips(tmp_path, [220.0, 240.0, 260.0, 280.0, 1800.0, 2000.0, 2200.0, 2400.0])
+    (tmp_path / "labels.csv").write_text("filename,label\n" + "".join(f"{p.name},{'low' if i < 4 else 'high'}\n" for i, p in enumerate(paths)))
+    config = {"data_dir": str(tmp_path), "sample_rate": 16000, "workers": 1, "feature_store": str(tmp_path / "store")}
+    # The store also holds a clip outside the dataset; training must not see it.
+    (tmp_path / "other").mkdir()
+    store = FeatureStore(tmp_path / "store", {"sample_rate": 16000, "features": EmbeddingConfig().to_dict()})
+    extract_features(make_clips(tmp_path / "other", [5000.0]), 16000, store=store, workers=1)
+
+    labels, features, targets, _, rows = prepare_features(config)
+    assert isinstance(features, np.memmap) and labels == ["high", "low"]
+    assert len(features) == 9 and 0 not in rows and targets[0] == -1
+    assert [targets[row] for row in rows] == [1] * 4 + [0] * 4
+
+    dense = np.stack([extract_vector(path, 16000) for path in paths])
+    assert np.allclose(features[rows], dense)
+    fit = dict(epochs=50, learning_rate=0.5, batch_size=2, validation_split=0.0)
+    mapped = fit_softmax_regression(features, targets, 2, rows=rows, **fit)
+    stacked = fit_softmax_regression(dense, np.asarray([targets[row] for row in rows]), 2, **fit)
+    assert np.allclose(mapped.weights, stacked.weights) and np.allclose(mapped.bias, stacked.bias)
+
+
+def test_feature_store_ignores_mismatched_meta(tmp_path):
+    path = make_clips(tmp_path, [440.0])[0]
+    store = FeatureStore(tmp_path / "store", {"sample_rate": 16000})
+    store.put(path, np.ones(3))
+    store.save()
+    assert FeatureStore(tmp_path / "store", {"sample_rate": 8000}).get(path) is None
+    assert FeatureStore(tmp_path / "store", {"sample_rate": 16000}).get(path) is not None
+
+
+def test_fit_softmax_regression_on_memmap_with_early_stopping(tmp_path):
+    rng = np.random.default_rng(0)
+    targets = rng.integers(0, 3, 3000)
+    centers = np.array([[0.0, 0.0, 0.0], [2.0, 0.02, 0.0], [0.0, 0.04, 200.0]])
+    features = (centers[targets] + rng.normal(size=(3000, 3)) * [1.0, 0.01, 100.0]).astype(np.float32)
+    np.save(tmp_path / "x.npy", features)
+    mapped = np.load(tmp_path / "x.npy", mmap_mode="r")
+
+    result = fit_softmax_regression(mapped, targets, 3, epochs=200, learning_rate=0.5, batch_size=128, patience=3)
+    assert result.weights.shape == (3, 3) and result.bias.shape == (3,)
+    assert len(result.history) < 200
+    # Standardization is folded into the weights, so they apply to raw features.
+    assert accuracy(features, targets, result.weights, result.bias) > 0.85
+
+
+def test_synthetic_generator_is_loadable_and_reproducible(tmp_path):
+    script = Path(__file__).parents[1] / "scripts" / "generate_synthetic_data.py"
+    options = ["--labels", "low:300:5", "high:1200", "--per-label", "3", "--duration", "0.1", "0.3", "--sample-rates", "8000", "22050",
+               "--channels", "1", "2", "--dtypes", "int16", "float32", "uint8", "--harmonics", "2", "--chirp", "0.2", "--batch-size", "3"]
+    for out, workers in (("a", "1"), ("b", "2")):
+        subprocess.run([sys.executable, script, *options, "--output-dir", tmp_path / out, "--workers", workers], check=True, capture_output=True)
+
+    samples = load_dataset(tmp_path / "a")
+    assert [label for _, label in samples] == ["low"] * 5 + ["high"] * 3
+    features, _ = extract_features([path for path, _ in samples], 16000, workers=1)
+    assert features.shape == (8, 3) and np.all(np.isfinite(features))
+    # Same audio whichever worker wrote each batch.
+    for path, _ in samples:
+        assert path.read_bytes() == (tmp_path / "b" / path.relative_to(tmp_path / "a")).read_bytes()
+
+
+def test_cross_validate_ranks_trials_identically_on_a_pool(tmp_path):
+    rng = np.random.default_rng(0)
+    targets = np.repeat([0, 1, 2], [60, 40, 20])
+    features = (np.eye(3)[targets] * 3 + rng.normal(size=(120, 3))).astype(np.float32)
+    folds = stratified_folds(targets, 4)
+    assert all(np.ptp(np.bincount(folds[targets == c])) <= 1 for c in range(3))
+
+    trials = [{"epochs": 30, "learning_rate": 0.5, "l2": l2, "batch_size": 0} for l2 in (0.0, 10.0)]
+    inline = cross_validate(features, targets, 3, trials, folds=4, workers=1, work_dir=tmp_path)
+    pooled = cross_validate(features, targets, 3, trials, folds=4, workers=2)
+    assert [r.params["l2"] for r in inline] == [0.0, 10.0]
+    assert np.array_equal(inline[0].confusion, pooled[0].confusion)
+    assert inline[0].confusion.sum() == 120 and inline[0].macro_f1 > 0.8
+
+    precision, recall, f1 = per_class_metrics(confusion_matrix(np.array([0, 0, 1, 1]), np.array([0, 1, 1, 1]), 3))
+    assert np.allclose(precision, [1.0, 2 / 3, 0.0]) and np.allclose(recall, [0.5, 1.0, 0.0])
+    assert np.allclose(f1, [2 / 3, 0.8, 0.0])
+
+
+def _use_default_checkpoint_dir(monkeypatch, directory):
+    json_path = directory / "trained_weights.json"
+    monkeypatch.delenv("CHECKPOINT_PATH", raising=False)
+    monkeypatch.setattr(predictor_module, "DEFAULT_CHECKPOINT_PATH", json_path)
+    monkeypatch.setattr(predictor_module, "DEFAULT_BINARY_CHECKPOINT_PATH", json_path.with_suffix(".ckpt"))
+    return json_path
+
+
+def test_retraining_as_json_replaces_an_older_binary_checkpoint(tmp_path, monkeypatch):
+    path = _use_default_checkpoint_dir(monkeypatch, tmp_path)
+    basic = EmbeddingConfig()
+    save_checkpoint(["a", "b"], TrainResult(np.ones((2, 3)), np.zeros(2), 0), basic, "binary", path)
+    serving = Predictor(watch_interval=0)
+    assert serving.labels == ["a", "b"] and serving.checkpoint_path.suffix == ".ckpt"
+
+    time.sleep(0.01)  # distinct mtimes
+    save_checkpoint(["x", "y"], TrainResult(np.ones((2, 3)), np.zeros(2), 0), basic, "json", path)
+    assert Predictor().labels == ["x", "y"]
+    assert serving.labels == ["x", "y"] and serving.checkpoint_path == path
+
+
+def test_sweep_promote_replaces_the_checkpoint_predictor_serves(tmp_path, monkeypatch):
+    from src.train import sweep
+
+    data = tmp_path / "data"
+    data.mkdir()
+    freqs = [200.0, 250.0, 300.0, 2000.0, 2500.0, 3000.0]
+    paths = make_clips(data, freqs)
+    rows = [f"{p.name},{'low' if f < 1000 else 'high'}" for p, f in zip(paths, freqs)]
+    (data / "labels.csv").write_text("filename,label\n" + "\n".join(rows) + "\n")
+    config = {
+        "sample_rate": 16000, "data_dir": str(data), "features": {"mode": "basic"}, "epochs": 20, "learning_rate": 0.5,
+        "batch_size": 0, "l2": 0.0, "validation_split": 0.0, "seed": 0, "workers": 1, "checkpoint_format": "json",
+        "sweep": {"space": {"l2": [0.0, 0.01]}},
+    }
+    monkeypatch.setattr(sweep, "load_config", lambda: config)
+    monkeypatch.setattr(sweep, "CHECKPOINT_DIR", tmp_path)
+    path = _use_default_checkpoint_dir(monkeypatch, tmp_path)
+    save_checkpoint(["a", "b"], TrainResult(np.ones((2, 3)), np.zeros(2), 0), EmbeddingConfig(), "binary", path)
+    assert Predictor().labels == ["a", "b"]
+
+    time.sleep(0.01)  # distinct mtimes
+    argv = ["sweep", "--folds", "2", "--workers", "1", "--output", str(tmp_path / "sweep"), "--promote"]
+    monkeypatch.setattr("sys.argv", argv)
+    sweep.main()
+    assert Predictor().labels == ["high", "low"]